@@ -1,12 +1,8 @@
+import uuid
 import streamlit as st
-import sqlite3
-import bcrypt
-import json
-import pandas as pd
-import yfinance as yf
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+import base_datos
+import seguridad
+import trazas
 
 # Configuración de la página
 st.set_page_config(
@@ -42,51 +38,26 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# Conexión a la base de datos SQLite
-conn = sqlite3.connect("users.db")
-c = conn.cursor()
-
-# Crear tablas si no existen
-c.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        first_name TEXT,
-        last_name TEXT,
-        email TEXT UNIQUE,
-        phone TEXT,
-        password TEXT
-    )
-''')
-c.execute('''
-    CREATE TABLE IF NOT EXISTS cliente_data (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER,
-        edad INTEGER,
-        ingreso_mensual REAL,
-        ocupacion TEXT,
-        objetivo TEXT,
-        nivel_riesgo TEXT,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-''')
-conn.commit()
+# Preparar el esquema de la base de datos (solo la primera vez por proceso)
+base_datos.migrar()
+
+# Calibrar el costo de bcrypt al arrancar el proceso
+seguridad.costo_actual()
 
 # Función para registrar un usuario
 def register_user(first_name, last_name, email, phone, password):
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-    try:
-        c.execute('INSERT INTO users (first_name, last_name, email, phone, password) VALUES (?, ?, ?, ?, ?)',
-                  (first_name.strip(), last_name.strip(), email.strip(), phone.strip(), hashed_password))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
+    hashed_password = seguridad.hashear(password)
+    return base_datos.crear_usuario(first_name.strip(), last_name.strip(), email.strip(), phone.strip(), hashed_password)
 
 # Función para autenticar usuario
 def authenticate_user(email, password):
-    c.execute('SELECT * FROM users WHERE email = ?', (email.strip(),))
-    user = c.fetchone()
-    if user and bcrypt.checkpw(password.encode('utf-8'), user[5].encode('utf-8')):
+    with trazas.tramo("autenticar"):
+        user = base_datos.obtener_usuario_por_email(email.strip())
+        valido = user is not None and seguridad.verificar(password, user.password)
+    if valido:
+        # Actualizar el hash si se creó con un costo menor al vigente
+        if seguridad.necesita_rehash(user.password):
+            seguridad.rehash_en_segundo_plano(password, lambda nuevo_hash: base_datos.actualizar_password(user.id, nuevo_hash))
         return user
     return None
 
@@ -97,6 +68,13 @@ if "view" not in st.session_state:
 if "user" not in st.session_state:
     st.session_state.user = None
 
+# Trazas: identificador de la sesión y de esta ejecución del script (sin efecto si TRAZAS no está activo).
+# Con TRAZAS_PERFIL configurado, ?perfil=1 en la URL captura esta ejecución con cProfile.
+if "id_sesion" not in st.session_state:
+    st.session_state.id_sesion = uuid.uuid4().hex[:12]
+trazas.iniciar_solicitud(st.session_state.id_sesion, perfilar=st.query_params.get("perfil") == "1",
+                         vista=st.session_state.view, opcion=st.session_state.get("menu_option"))
+
 # Vista de inicio de sesión
 if st.session_state.view == "login":
     st.image("allianz-1.svg", use_container_width=True, caption=None)
@@ -106,7 +84,11 @@ if st.session_state.view == "login":
     password = st.text_input("Contraseña", type="password", key="login_password", placeholder="••••••••")
 
     if st.button("Iniciar Sesión"):
-        user = authenticate_user(email, password)
+        try:
+            user = authenticate_user(email, password)
+        except seguridad.ServicioSaturado:
+            st.error("El servicio está ocupado en este momento. Por favor, intenta de nuevo en unos segundos.")
+            st.stop()
         if user:
             st.session_state.user = user
             st.session_state.view = "menu"
@@ -128,7 +110,12 @@ elif st.session_state.view == "register":
     password = st.text_input("Contraseña", type="password", key="register_password", placeholder="••••••••")
 
     if st.button("Registrarse"):
-        if register_user(first_name, last_name, email, phone, password):
+        try:
+            registrado = register_user(first_name, last_name, email, phone, password)
+        except seguridad.ServicioSaturado:
+            st.error("El servicio está ocupado en este momento. Por favor, intenta de nuevo en unos segundos.")
+            st.stop()
+        if registrado:
             st.success("Registro exitoso. Ahora puedes iniciar sesión.")
             st.session_state.view = "login"
         else:
@@ -150,6 +137,11 @@ elif st.session_state.view == "menu":
 # Guardar la opción seleccionada en la sesión
     st.session_state.menu_option = menu_option
 
+    # Al salir de Proyección se abandona su cálculo (se cancela si ninguna otra sesión lo espera)
+    if menu_option != "Proyección" and "trabajo_proyeccion" in st.session_state:
+        import trabajos
+        trabajos.cancelar(st.session_state.pop("trabajo_proyeccion"))
+
     # Vista Inicio
     if menu_option == "Inicio":
         st.title("Página de Inicio")
@@ -187,8 +179,7 @@ elif st.session_state.view == "menu":
     elif menu_option == "Datos del Cliente":
         st.title("Gestión de Datos del Cliente")
         user_id = st.session_state.user[0]
-        c.execute('SELECT * FROM cliente_data WHERE user_id = ?', (user_id,))
-        cliente_data = c.fetchone()
+        cliente_data = base_datos.obtener_cliente(user_id)
 
         if cliente_data:
             st.markdown("### Datos actuales:")
@@ -205,26 +196,21 @@ elif st.session_state.view == "menu":
         nivel_riesgo = st.selectbox("Nivel de Riesgo:", ["Bajo", "Moderado", "Alto"], index=["Bajo", "Moderado", "Alto"].index(cliente_data[6]) if cliente_data else 0)
 
         if st.button("Guardar Datos"):
-            if cliente_data:
-                c.execute('''
-                    UPDATE cliente_data SET edad = ?, ingreso_mensual = ?, ocupacion = ?, objetivo = ?, nivel_riesgo = ? WHERE user_id = ?
-                ''', (edad, ingreso_mensual, ocupacion, objetivo, nivel_riesgo, user_id))
-            else:
-                c.execute('''
-                    INSERT INTO cliente_data (user_id, edad, ingreso_mensual, ocupacion, objetivo, nivel_riesgo)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (user_id, edad, ingreso_mensual, ocupacion, objetivo, nivel_riesgo))
-            conn.commit()
+            base_datos.guardar_cliente(user_id, edad, ingreso_mensual, ocupacion, objetivo, nivel_riesgo)
             st.success("Datos guardados correctamente.")
 
 #DATOS DE PÓLIZA
     elif menu_option == "Datos de Póliza":
         st.title("Gestión de Datos de Póliza")
 
+    # Póliza guardada en una sesión anterior: sus valores se usan como punto de partida
+        poliza = base_datos.obtener_poliza(st.session_state.user[0])
+
     # Monto inicial de inversión
         inversion_inicial = st.number_input(
             "Monto inicial de inversión (en USD):",
             min_value=100000.0,
+            value=max(poliza.inversion_inicial, 100000.0) if poliza else 100000.0,
             step=5000.0
     )
 
@@ -233,42 +219,151 @@ elif st.session_state.view == "menu":
             "Plazo de inversión (en años):",
             min_value=5,
             max_value=30,
-            value=5
+            value=poliza.plazo_inversion if poliza else 5
     )
 
     # Selección de ETFs
         st.markdown("### Selección de ETFs para tu portafolio")
+        import json
+        import numpy as np
+        import pandas as pd
+        import catalogo
+        # El catálogo se comparte entre sesiones y solo se vuelve a leer si cambia el archivo
         try:
-            with open('valid_etfs.json', 'r') as f:
-                valid_etfs = json.load(f)
+            catalogo_etfs = catalogo.obtener()
         except FileNotFoundError:
             st.error("El archivo 'valid_etfs.json' no se encontró.")
-            valid_etfs = []
+            catalogo_etfs = catalogo.Catalogo([])
         except json.JSONDecodeError:
             st.error("El archivo 'valid_etfs.json' tiene un formato inválido.")
-            valid_etfs = []
+            catalogo_etfs = catalogo.Catalogo([])
+        valid_etfs = catalogo_etfs.etfs
 
 
 
     # Si hay ETFs válidos, permitir su selección
         if valid_etfs:
-        # Concatenar símbolo y nombre
-            etf_options = [{"label": f"{etf['symbol']}: {etf['name']}", "symbol": etf['symbol'], "name": etf['name']} for etf in valid_etfs]
-        
+        # Precargar una sola vez la selección y las ponderaciones de la póliza guardada (si siguen en el catálogo)
+            if poliza and not st.session_state.get("poliza_precargada"):
+                guardados = catalogo_etfs.por_simbolos(poliza.ponderaciones)
+                st.session_state.seleccion_etfs = [etf["label"] for etf in guardados]
+                for i, etf in enumerate(guardados):
+                    st.session_state[f"peso_{i}_{etf['symbol']}"] = poliza.ponderaciones[etf["symbol"]]
+                st.session_state.poliza_precargada = True
+
+        # Portafolio recomendado para el nivel de riesgo del cliente (precalculado en segundo plano)
+            import portafolios_modelo
+            cliente = base_datos.obtener_cliente(st.session_state.user[0])
+            if cliente and cliente.nivel_riesgo:
+                plazo_modelo = portafolios_modelo.plazo_precalculado(plazo_inversion)
+                modelo = base_datos.obtener_portafolio_modelo(cliente.nivel_riesgo, plazo_modelo)
+                if modelo:
+                    with st.expander(f"Portafolio recomendado para tu perfil ({cliente.nivel_riesgo}, {plazo_modelo} años)"):
+                        for simbolo, peso in modelo.pesos.items():
+                            st.write(f"- {simbolo}: {peso}%")
+                        st.write(f"**Rendimiento esperado:** {modelo.rendimiento * 100:.2f}% anual, "
+                                 f"**Volatilidad:** {modelo.volatilidad * 100:.2f}%, **Sharpe:** {modelo.sharpe:.2f}")
+                        st.write(f"**Valor proyectado a {plazo_modelo} años (mediana):** ${inversion_inicial * modelo.multiplo_mediano:,.2f} "
+                                 f"(entre ${inversion_inicial * modelo.multiplo_percentil_5:,.2f} y "
+                                 f"${inversion_inicial * modelo.multiplo_percentil_95:,.2f} con 90% de probabilidad)")
+                        if st.button("Usar portafolio recomendado"):
+                            # Precargar la selección y las ponderaciones antes de crear los campos
+                            recomendados = catalogo_etfs.por_simbolos(modelo.pesos)
+                            st.session_state.seleccion_etfs = [etf["label"] for etf in recomendados]
+                            for i, etf in enumerate(recomendados):
+                                st.session_state[f"peso_{i}_{etf['symbol']}"] = modelo.pesos[etf["symbol"]]
+
+        # Búsqueda por prefijo de símbolo o nombre; las opciones son los resultados más lo ya seleccionado
+            busqueda = st.text_input("Buscar ETF por símbolo o nombre:")
+            if busqueda:
+                opciones = list(dict.fromkeys(st.session_state.get("seleccion_etfs", []) +
+                                              [etf["label"] for etf in catalogo_etfs.buscar(busqueda)]))
+            else:
+                opciones = catalogo_etfs.etiquetas
+
         # Multiselección con el formato combinado
             selected_labels = st.multiselect(
                 "Selecciona los ETFs para tu portafolio:",
-                options=[etf["label"] for etf in etf_options]
+                options=opciones,
+                key="seleccion_etfs"
         )
 
-        # Filtrar los ETFs seleccionados basados en la etiqueta
-            selected_etfs = [etf for etf in etf_options if etf["label"] in selected_labels]
+        # ETFs seleccionados en el orden del catálogo
+            selected_etfs = catalogo_etfs.seleccion(selected_labels)
 
         # Asignación de ponderaciones si se seleccionaron ETFs
             ponderaciones = {}  # Inicializar ponderaciones
 
             if selected_etfs:
                 st.markdown("### Asignación de Ponderaciones (%)")
+                simbolos_seleccionados = [etf["symbol"] for etf in selected_etfs]
+
+    # Sugerencia de ponderaciones con el optimizador de media-varianza
+                if len(selected_etfs) > 1:
+                    with st.expander("Sugerir ponderaciones con la frontera eficiente"):
+                        objetivo_optimizacion = st.selectbox(
+                            "Objetivo:",
+                            ["Máximo Sharpe", "Mínima varianza", "Volatilidad objetivo"]
+                        )
+                        tope_por_etf = st.slider(
+                            "Peso máximo por ETF (%):",
+                            min_value=int(np.ceil(100 / len(selected_etfs) / 5) * 5),
+                            max_value=100,
+                            value=100,
+                            step=5
+                        )
+                        volatilidad_deseada = st.slider("Volatilidad anual objetivo (%):", min_value=1, max_value=40, value=10) \
+                            if objetivo_optimizacion == "Volatilidad objetivo" else None
+
+                        if st.button("Calcular sugerencia"):
+                            import datos_mercado
+                            import estadisticas
+                            import optimizador
+
+                            rendimientos_opt = estadisticas.rendimientos_diarios(
+                                datos_mercado.obtener_precios(simbolos_seleccionados, '1y'))
+                            media_opt = estadisticas.estadisticas_activos(rendimientos_opt)["avg_annual_return"].to_numpy()
+                            covarianza_opt = estadisticas.estadisticas_portafolio(
+                                rendimientos_opt, estadisticas.vector_pesos({}, simbolos_seleccionados))["covarianza"].to_numpy()
+                            tope = tope_por_etf / 100
+
+                            # Arrancar desde la frontera anterior (por símbolo) para que recalcular sea casi inmediato
+                            anterior = st.session_state.get("frontera_eficiente")
+                            pesos_iniciales = None
+                            if anterior:
+                                pesos_iniciales = np.array([[fila.get(s, 0.0) for s in simbolos_seleccionados] for fila in anterior["pesos"]])
+                            frontera = optimizador.frontera_eficiente(media_opt, covarianza_opt, tope=tope,
+                                                                      pesos_iniciales=pesos_iniciales)
+
+                            # Cada objetivo parte de la frontera recién calculada en lugar de resolver otra desde cero
+                            if objetivo_optimizacion == "Mínima varianza":
+                                pesos_sugeridos = optimizador.minima_varianza(media_opt, covarianza_opt, tope,
+                                                                              frontera["pesos"][0])
+                            elif objetivo_optimizacion == "Máximo Sharpe":
+                                pesos_sugeridos = optimizador.maximo_sharpe(media_opt, covarianza_opt, tope,
+                                                                            frontera=frontera)
+                            else:
+                                pesos_sugeridos = optimizador.volatilidad_objetivo(media_opt, covarianza_opt, volatilidad_deseada / 100,
+                                                                                   tope, frontera=frontera)
+
+                            st.session_state.frontera_eficiente = {
+                                "simbolos": simbolos_seleccionados,
+                                "pesos": [dict(zip(simbolos_seleccionados, fila)) for fila in frontera["pesos"]],
+                                "volatilidades": frontera["volatilidades"] * 100,
+                                "rendimientos": frontera["rendimientos"] * 100
+                            }
+                            # Precargar los campos de ponderación con la sugerencia (múltiplos de 5 que suman 100)
+                            for i, (simbolo, peso) in enumerate(zip(simbolos_seleccionados, optimizador.redondear_pesos(pesos_sugeridos))):
+                                st.session_state[f"peso_{i}_{simbolo}"] = int(peso)
+
+                        frontera_guardada = st.session_state.get("frontera_eficiente")
+                        if frontera_guardada and frontera_guardada["simbolos"] == simbolos_seleccionados:
+                            st.markdown("**Frontera eficiente** (rendimiento vs volatilidad anual, %)")
+                            st.line_chart(pd.DataFrame({
+                                "Volatilidad (%)": frontera_guardada["volatilidades"],
+                                "Rendimiento (%)": frontera_guardada["rendimientos"]
+                            }), x="Volatilidad (%)", y="Rendimiento (%)")
+
                 cols = st.columns(len(selected_etfs))
 
     # Crear sliders para cada ETF seleccionado
@@ -307,13 +402,15 @@ elif st.session_state.view == "menu":
                 for etf in selected_etfs:
                     etf_symbol = etf["symbol"]  # Extraer el símbolo
                     etf_name = etf["name"]  # Extraer el nombre
-                    etf_data = next((item for item in valid_etfs if item['symbol'] == etf_symbol), None)
+                    etf_data = catalogo_etfs.por_simbolo.get(etf_symbol)
 
                     if etf_data:
                         # Crear un expander para mostrar información adicional
                         with st.expander(f"Más información sobre {etf_symbol}: {etf_name}"):
                             st.write(f"**Símbolo:** {etf_data['symbol']}")
                             st.write(f"**Nombre:** {etf_data['name']}")
+                            if etf_data['description']:
+                                st.write(f"**Descripción:** {etf_data['description']}")
                             # Agregar un enlace para consultar detalles en Yahoo Finance
                             st.markdown("Consulta más detalles financieros en Yahoo Finance: "
                                         f"[{etf_data['symbol']}](https://finance.yahoo.com/quote/{etf_data['symbol']})")
@@ -322,14 +419,20 @@ elif st.session_state.view == "menu":
         st.markdown("### Selección del período de análisis para los ETFs")
         periodo_etfs = st.selectbox(
             "Selecciona el período de análisis:",
-            ['1mo', '3mo', '6mo', '1y', '5y']
+            ['1mo', '3mo', '6mo', '1y', '5y'],
+            index=['1mo', '3mo', '6mo', '1y', '5y'].index(poliza.periodo) if poliza else 0
         )
 
         # Botón para guardar datos y redirigir
         if st.button("Guardar Datos de Póliza"):
             if valid_etfs and selected_etfs and total_ponderacion == 100:
-                # Guardar los datos en el estado de la sesión
+                # Guardar la póliza en la base de datos (descarta la proyección anterior) y en la sesión
+                poliza_id = base_datos.guardar_poliza(
+                    st.session_state.user[0], inversion_inicial, plazo_inversion, periodo_etfs,
+                    selected_etfs, st.session_state.ponderaciones
+                )
                 st.session_state.datos_poliza = {
+                    "poliza_id": poliza_id,
                     "inversion_inicial": inversion_inicial,
                     "plazo_inversion": plazo_inversion,
                     "etfs": selected_etfs,
@@ -353,6 +456,19 @@ elif st.session_state.view == "menu":
     elif menu_option == "Proyección":
         st.title("Proyección de Inversiones")
 
+    # Si la sesión no tiene póliza, usar la guardada en la base de datos
+        if "datos_poliza" not in st.session_state:
+            poliza = base_datos.obtener_poliza(st.session_state.user[0])
+            if poliza:
+                st.session_state.datos_poliza = {
+                    "poliza_id": poliza.id,
+                    "inversion_inicial": poliza.inversion_inicial,
+                    "plazo_inversion": poliza.plazo_inversion,
+                    "etfs": poliza.etfs,
+                    "ponderaciones": poliza.ponderaciones,
+                    "periodo": poliza.periodo
+                }
+
     # Verificar si hay datos guardados en la sesión
         if "datos_poliza" in st.session_state:
             datos = st.session_state.datos_poliza
@@ -372,163 +488,163 @@ elif st.session_state.view == "menu":
        # Cálculo de rentabilidad y gráficos
             st.markdown("### Cálculos de Proyección")
 
-
-        # Parámetros del cliente
-            periodo = datos["periodo"]  # Período seleccionado en Datos de Póliza ('1mo', '3mo', '6mo', etc.)
-            
         # Extraer los símbolos de los ETFs seleccionados
-            if "etfs" in datos and isinstance(datos["etfs"], list):  # Verifica que 'etfs' sea una lista
-                etfs_seleccionados = [etf["symbol"] for etf in datos["etfs"]]  # Extraer símbolos
-                ponderaciones = datos["ponderaciones"]  # Ponderaciones de cada ETF
-                st.write(f"ETFs seleccionados: {etfs_seleccionados}")
-            else:
-                st.error("No se encontraron ETFs seleccionados o el formato es incorrecto.")
-        
-    # Función para calcular rentabilidad, volatilidad y Sharpe Ratio
-        def calcular_estadisticas(simbolo, periodo):
-            try:
-        # Descargar datos del ETF
-                data = yf.download(simbolo, period=periodo)
-        
-        # Calcular retorno diario
-                data['daily_return'] = data['Close'].pct_change()
-        
-        # Calcular métricas
-                avg_annual_return = data['daily_return'].mean() * 252  # Rendimiento promedio anual
-                annual_volatility = data['daily_return'].std() * (252 ** 0.5)  # Volatilidad anual
-                sharpe_ratio = avg_annual_return / annual_volatility if annual_volatility != 0 else 0  # Ratio de Sharpe
-        
-        # Devolver las estadísticas
-                return {
-                    "avg_annual_return": avg_annual_return,
-                    "annual_volatility": annual_volatility,
-                    "sharpe_ratio": sharpe_ratio
-        }
-            except Exception as e:
-                st.error(f"Error al procesar datos de {simbolo}: {e}")
-                return {
-                    "avg_annual_return": 0,
-                    "annual_volatility": 0,
-                    "sharpe_ratio": 0
-        }
-            
-            # Calcular estadísticas para cada ETF seleccionado
-        estadisticas_etfs = {
-            symbol: calcular_estadisticas(symbol, periodo)
-            for symbol in etfs_seleccionados
-}
-
-
-# Calcular estadísticas ponderadas del portafolio
-        rendimiento_portafolio = sum(
-            estadisticas_etfs[symbol]["avg_annual_return"] * ponderaciones[symbol] / 100
-            for symbol in estadisticas_etfs
-)
-        volatilidad_portafolio = sum(
-            estadisticas_etfs[symbol]["annual_volatility"] * ponderaciones[symbol] / 100
-            for symbol in estadisticas_etfs
-)
-        sharpe_portafolio = rendimiento_portafolio / volatilidad_portafolio if volatilidad_portafolio != 0 else 0
+            etfs_seleccionados = [etf["symbol"] for etf in datos["etfs"]]
+            st.write(f"ETFs seleccionados: {etfs_seleccionados}")
+
+        # Las librerías de cálculo y gráficas se cargan solo cuando se abre esta vista
+            import numpy as np
+            import pandas as pd
+            import cache_resultados
+            import graficas
+            import proyeccion
+            import trabajos
+
+        # La proyección guardada de la póliza se reutiliza mientras no cambien los datos de mercado ni la póliza
+            version_datos = proyeccion.version_proyeccion(etfs_seleccionados)
+            resultado = proyeccion.instantanea(datos["poliza_id"], version_datos)
+
+        # Si no la hay, el cálculo corre como trabajo en segundo plano y las gráficas quedan renderizadas antes de
+        # mostrar la página. El trabajo solo calcula; cada sesión guarda después la instantánea de su propia póliza.
+            def calcular_proyeccion(trabajo, simbolos, ponderaciones, periodo, inversion, plazo, version):
+                with trazas.perfil("proyeccion"), trazas.tramo("proyeccion.trabajo", simbolos=len(simbolos)):
+                    resultado = proyeccion.proyectar_version(simbolos, ponderaciones, periodo, inversion, plazo,
+                                                             version, progreso=trabajo.reportar)
+                    trabajo.reportar("Generando gráficas", 0.9)
+                    for clave_png, construir in graficas.graficas_proyeccion(resultado).values():
+                        graficas.grafica_png(clave_png, construir)
+                    trabajo.reportar("Gráficas listas", 1.0)
+                return resultado
+
+            if resultado is None:
+                # Sesiones que piden la misma proyección con los mismos datos comparten un solo trabajo
+                argumentos = (etfs_seleccionados, datos["ponderaciones"], datos["periodo"],
+                              datos["inversion_inicial"], datos["plazo_inversion"], version_datos)
+                clave_trabajo = cache_resultados.clave_canonica("trabajo_proyeccion", *argumentos)
+                trabajo = st.session_state.get("trabajo_proyeccion")
+                if trabajo is None or trabajo.clave != clave_trabajo or trabajo.estado == trabajos.CANCELADO:
+                    if trabajo is not None:
+                        trabajos.cancelar(trabajo)
+                    trabajo = trabajos.enviar(clave_trabajo, calcular_proyeccion, *argumentos)
+                    st.session_state.trabajo_proyeccion = trabajo
+
+                # Mientras corre, solo el fragmento de progreso se vuelve a ejecutar; al terminar pide una ejecución
+                # completa de la página, que ya encuentra el resultado (el hilo del script nunca queda bloqueado)
+                if not trabajo.terminado:
+                    @st.fragment(run_every=0.5)
+                    def progreso_proyeccion():
+                        if trabajo.terminado:
+                            st.rerun()
+                        st.progress(trabajo.progreso, text=trabajo.etapa or "En espera")
+
+                    progreso_proyeccion()
+                    st.stop()
+                if trabajo.estado == trabajos.ERROR:
+                    st.session_state.pop("trabajo_proyeccion")
+                    st.error(f"No se pudo calcular la proyección: {trabajo.error}")
+                    st.stop()
+                resultado = trabajo.resultado
+                proyeccion.guardar_instantanea(datos["poliza_id"], version_datos, resultado)
+
+            for simbolo in resultado.simbolos_sin_datos:
+                st.error(f"Error al procesar datos de {simbolo}: no hay precios disponibles")
 
         # Mostrar estadísticas de cada ETF
-        st.markdown("### Estadísticas de los ETFs Seleccionados")
-        for symbol, stats in estadisticas_etfs.items():
-            st.write(f"**{symbol}:**")
-            st.write(f"- Rendimiento Promedio Anual: {stats['avg_annual_return'] * 100:.2f}%")
-            st.write(f"- Volatilidad Anual: {stats['annual_volatility'] * 100:.2f}%")
-            st.write(f"- Ratio de Sharpe: {stats['sharpe_ratio']:.2f}")
-
-# Mostrar estadísticas del portafolio
-        st.markdown("### Estadísticas del Portafolio Total")
-        st.write(f"**Rendimiento Promedio Anual:** {rendimiento_portafolio * 100:.2f}%")
-        st.write(f"**Volatilidad Anual:** {volatilidad_portafolio * 100:.2f}%")
-        st.write(f"**Ratio de Sharpe:** {sharpe_portafolio:.2f}")
-
-# Calcular el valor del portafolio a lo largo del tiempo
-        valores_portafolio = datos["inversion_inicial"] * (1 + rendimiento_portafolio) ** np.arange(1, datos["plazo_inversion"] + 1)
-
-# Calcular los picos y drawdowns
-        picos = np.maximum.accumulate(valores_portafolio)  # Máximos acumulados
-        drawdowns = (valores_portafolio - picos) / picos  # Diferencia entre el valor actual y el pico, normalizada
-        drawdown_maximo = drawdowns.min()  # El drawdown máximo
+            estadisticas_etfs = resultado.estadisticas_etfs.to_dict("index")
+            st.markdown("### Estadísticas de los ETFs Seleccionados")
+            for symbol, stats in estadisticas_etfs.items():
+                st.write(f"**{symbol}:**")
+                st.write(f"- Rendimiento Promedio Anual: {stats['avg_annual_return'] * 100:.2f}%")
+                st.write(f"- Volatilidad Anual: {stats['annual_volatility'] * 100:.2f}%")
+                st.write(f"- Ratio de Sharpe: {stats['sharpe_ratio']:.2f}")
+
+        # Mostrar estadísticas del portafolio (volatilidad con la matriz de covarianza, √wᵀΣw)
+            st.markdown("### Estadísticas del Portafolio Total")
+            st.write(f"**Rendimiento Promedio Anual:** {resultado.rendimiento * 100:.2f}%")
+            st.write(f"**Volatilidad Anual:** {resultado.volatilidad * 100:.2f}%")
+            st.write(f"**Ratio de Sharpe:** {resultado.sharpe:.2f}")
+
+        # Valor del portafolio simulado (Monte Carlo) y drawdown máximo de las trayectorias
+            simulada = resultado.simulacion
+            valores_portafolio = simulada["percentiles"][50]
+            drawdown_maximo = np.median(simulada["drawdowns_maximos"])
+            drawdown_pesimista = np.percentile(simulada["drawdowns_maximos"], 95)
+
+            st.markdown(f"**Valor Final Esperado (mediana):** ${valores_portafolio[-1]:,.2f}")
+            st.markdown(f"**Probabilidad de terminar por debajo de la inversión inicial:** {simulada['probabilidad_perdida'] * 100:.2f}%")
+            st.markdown(f"**Drawdown Máximo:** {-drawdown_maximo * 100:.2f}% (mediana), {-drawdown_pesimista * 100:.2f}% (escenario pesimista 95%)")
+
+        # Métricas de riesgo móviles sobre la serie diaria real del portafolio
+            st.markdown("### Riesgo Histórico del Portafolio")
+            st.markdown(f"**Drawdown Máximo Histórico ({resultado.periodo}):** {resultado.drawdown_historico * 100:.2f}%")
+            st.markdown(f"Volatilidad anualizada y drawdown en ventanas móviles de {proyeccion.VENTANA_MOVIL} días hábiles; "
+                        f"beta contra {proyeccion.BENCHMARK}.")
+            st.line_chart(resultado.metricas_moviles[["volatilidad", "drawdown"]] * 100)
+            st.line_chart(resultado.metricas_moviles[["sharpe", "beta"]])
+
+        # Valor en riesgo y pérdida esperada en la cola (pérdidas en USD sobre la inversión inicial)
+            st.markdown("### Valor en Riesgo (VaR) y Pérdida Esperada (CVaR)")
+            st.markdown(f"Pérdida máxima esperada con la confianza indicada y promedio de las pérdidas que la superan, "
+                        f"estimadas con los rendimientos de {proyeccion.PERIODO_CORRELACION}.")
+            tabla_riesgo = resultado.valor_en_riesgo.copy()
+            tabla_riesgo["var"] = tabla_riesgo["var"] * resultado.inversion_inicial
+            tabla_riesgo["cvar"] = tabla_riesgo["cvar"] * resultado.inversion_inicial
+            tabla_riesgo["nivel"] = (tabla_riesgo["nivel"] * 100).map("{:.0f}%".format)
+            st.dataframe(tabla_riesgo.rename(columns={
+                "metodo": "Método",
+                "horizonte": "Horizonte (días)",
+                "nivel": "Confianza",
+                "var": "VaR (USD)",
+                "cvar": "CVaR (USD)"
+            }).round(2), hide_index=True)
+
+        # Backtest: cómo se habría comportado la mezcla con cada calendario de rebalanceo
+            st.markdown("### Desempeño Histórico del Portafolio")
+            st.markdown(f"Valor de la inversión inicial en el periodo {resultado.periodo} según el rebalanceo, "
+                        f"con un costo de transacción de {proyeccion.COSTO_TRANSACCION * 100:.2f}% por monto negociado.")
+            st.line_chart(resultado.backtest["valores"])
+            metricas_backtest = resultado.backtest["metricas"].copy()
+            columnas_porcentaje = ["rendimiento_anual", "volatilidad", "drawdown_maximo", "rotacion_anual"]
+            metricas_backtest[columnas_porcentaje] = metricas_backtest[columnas_porcentaje] * 100
+            st.dataframe(metricas_backtest.rename(columns={
+                "rendimiento_anual": "Rendimiento anual (%)",
+                "volatilidad": "Volatilidad (%)",
+                "sharpe": "Sharpe",
+                "drawdown_maximo": "Drawdown máximo (%)",
+                "rotacion_anual": "Rotación anual (%)",
+                "costos": "Costos (USD)",
+                "rebalanceos": "Rebalanceos"
+            }).round(2))
+
+        # Gráficas: se renderizan una sola vez por combinación de portafolio y versión de datos
+            modo_interactivo = st.toggle("Gráficas interactivas", value=False)
+            piezas_graficas = graficas.graficas_proyeccion(resultado)
+
+        # Graficar el abanico de proyección
+            if modo_interactivo:
+                st.markdown("#### Proyección del Valor del Portafolio")
+                st.line_chart(pd.DataFrame(
+                    {f"Percentil {p}": valores for p, valores in simulada["percentiles"].items()},
+                    index=pd.Index(simulada["anios"], name="Año")
+                ))
+            else:
+                st.image(graficas.grafica_png(*piezas_graficas["proyeccion"]))
 
-# Mostrar el Drawdown máximo
-        st.markdown(f"**Drawdown Máximo:** {drawdown_maximo * 100:.2f}%")
+        # Crear el heatmap de la matriz de correlación
+            st.image(graficas.grafica_png(*piezas_graficas["correlacion"]))
 
+        # Crear la gráfica de riesgo vs rendimiento
+            st.image(graficas.grafica_png(*piezas_graficas["riesgo_rendimiento"]))
 
-# Obtener los símbolos de los ETFs seleccionados
-        if "datos_poliza" in st.session_state:
-            datos_poliza = st.session_state["datos_poliza"]
-            etfs_seleccionados = [etf["symbol"] for etf in datos_poliza["etfs"]]
+        # Graficar rendimientos acumulados del periodo seleccionado por el cliente
+            if modo_interactivo:
+                st.markdown("#### Rendimientos Acumulados de los ETFs Seleccionados")
+                st.line_chart(resultado.rendimientos_acumulados)
+            else:
+                st.image(graficas.grafica_png(*piezas_graficas["rendimientos_acumulados"]))
         else:
             st.error("No se encontraron datos de póliza. Regresa a la pestaña 'Datos de Póliza' para completarlos.")
 
-
-# Descargar datos históricos de cierre ajustado
-        precios = yf.download(etfs_seleccionados, period="1y")["Adj Close"]
-
-# Calcular rendimientos diarios
-        rendimientos_diarios = precios.pct_change()
-
-# Calcular matriz de correlación
-        matriz_correlacion = rendimientos_diarios.corr()
-
-# Crear el heatmap
-        fig, ax = plt.subplots(figsize=(8, 6))
-        sns.heatmap(matriz_correlacion, annot=True, cmap="coolwarm", ax=ax, fmt=".2f", linewidths=0.5)
-        ax.set_title("Matriz de Correlación entre ETFs")
-        plt.xticks(rotation=45, ha='right')
-        plt.yticks(rotation=0)
-        st.pyplot(fig)
-
-
-# Preparar datos para la gráfica
-        rendimientos = [estadisticas_etfs[symbol]["avg_annual_return"] * 100 for symbol in estadisticas_etfs]
-        volatilidades = [estadisticas_etfs[symbol]["annual_volatility"] * 100 for symbol in estadisticas_etfs]
-        etfs = list(estadisticas_etfs.keys())
-
-# Agregar los datos del portafolio total
-        rendimientos.append(rendimiento_portafolio * 100)
-        volatilidades.append(volatilidad_portafolio * 100)
-        etfs.append("Portafolio Total")
-
-# Crear la gráfica de puntos
-        plt.figure(figsize=(10, 6))
-        plt.scatter(volatilidades, rendimientos, color='blue', s=100)  # Gráfica de puntos
-        for i, etf in enumerate(etfs):  # Etiquetas de los puntos
-            plt.text(volatilidades[i], rendimientos[i], etf, fontsize=9, ha='right')
-
-# Configurar la gráfica
-        plt.title("Gráfica de Riesgo vs Rendimiento")
-        plt.xlabel("Volatilidad Anual (%)")
-        plt.ylabel("Rendimiento Promedio Anual (%)")
-        plt.grid(alpha=0.3)
-        st.pyplot(plt)
-
-# Utilizar el periodo seleccionado por el cliente
-        periodo_cliente = datos["periodo"]  # Esto debería venir de los datos ingresados por el cliente
-
-# Descargar datos históricos de los ETFs seleccionados
-        precios_historicos = yf.download(etfs_seleccionados, period=periodo_cliente)["Adj Close"]
-
-# Calcular rendimientos diarios
-        rendimientos_diarios = precios_historicos.pct_change()
-
-# Calcular rendimientos acumulados
-        rendimientos_acumulados = (1 + rendimientos_diarios).cumprod()
-
-# Graficar rendimientos acumulados
-        plt.figure(figsize=(12, 6))
-        for ticker in rendimientos_acumulados.columns:
-            plt.plot(rendimientos_acumulados.index, rendimientos_acumulados[ticker], label=ticker)
-
-        plt.title("Rendimientos Acumulados de los ETFs Seleccionados", fontsize=14)
-        plt.xlabel("Fecha", fontsize=12)
-        plt.ylabel("Rendimiento Acumulado", fontsize=12)
-        plt.legend(title="ETFs", fontsize=10)
-        plt.grid(alpha=0.3)
-        st.pyplot(plt)
-
 # Pestaña de Preguntas Frecuentes
     if menu_option == "Preguntas Frecuentes":
         st.title("Preguntas Frecuentes")
@@ -604,3 +720,6 @@ elif st.session_state.view == "menu":
             # Configurar una bandera para redirigir al inicio
             st.session_state.view = "Inicio"
             st.success("Has cerrado sesión exitosamente")
+
+# Cerrar la solicitud en las trazas (duración total y perfil, si se pidió)
+trazas.terminar_solicitud()
@@ -2,9 +2,13 @@
 # Primero abre la terminal y ejecuta los siguientes comandos para instalar las librerías necesarias:
 # pip install yfinance pandas
 
-import yfinance as yf
 import json
-import pandas as pd
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import proveedores
 
 # Lista inicial de ETFs en JSON
 etfs_json = '''
@@ -48,33 +52,130 @@ etfs_json = '''
 # Cargar JSON
 etfs = json.loads(etfs_json)
 
-# Función para verificar si el símbolo es válido en Yahoo Finance
-def verify_etf_symbols(etfs):
-    valid_etfs = []
-    for etf in etfs:
-        symbol = etf["symbol"]
-        ticker = yf.Ticker(symbol)
+# Archivo de salida, vigencia de cada verificación y límites de la validación concurrente
+ARCHIVO_VALIDOS = 'valid_etfs.json'
+DIAS_VIGENCIA = 7
+MAX_WORKERS = 8
+TIMEOUT_SEGUNDOS = 10
+REINTENTOS = 2
+
+# Símbolos que no pasaron la verificación, con la fecha y el motivo. Un símbolo sin datos (MOTIVO_INVALIDO) no se
+# vuelve a consultar hasta que pasen DIAS_REVISION_INVALIDOS; un error del proveedor (MOTIVO_ERROR) se reintenta
+# en la siguiente corrida.
+ARCHIVO_FALLIDOS = 'failed_etfs.json'
+DIAS_REVISION_INVALIDOS = 30
+MOTIVO_INVALIDO = "invalid"
+MOTIVO_ERROR = "provider_error"
+
+
+# Proveedor por defecto: un símbolo es válido si el proveedor de datos (Yahoo Finance, o una grabación
+# según PROVEEDOR_DATOS) devuelve datos del último día
+def verificar_con_proveedor(symbol, timeout):
+    data = proveedores.obtener().historial(symbol, period="1d", timeout=timeout)
+    return not data.empty
+
+
+# Función para verificar un símbolo con reintentos; devuelve True/False, o None si no se pudo verificar
+def verify_etf_symbol(etf, proveedor=verificar_con_proveedor, timeout=TIMEOUT_SEGUNDOS, reintentos=REINTENTOS):
+    symbol = etf["symbol"]
+    for intento in range(reintentos + 1):
         try:
-            # Intentamos descargar un rango pequeño de datos para verificar si el símbolo es válido
-            data = ticker.history(period="1d")
-            if not data.empty:
-                valid_etfs.append(etf)
+            return proveedor(symbol, timeout)
+        except Exception as e:
+            print(f"Error with symbol: {symbol} ({etf['name']}), attempt {intento + 1}, Error: {str(e)}")
+            if intento < reintentos:
+                time.sleep(2 ** intento)
+    return None
+
+
+# Función para cargar las verificaciones previas (o los fallos previos con ARCHIVO_FALLIDOS): {símbolo: entrada}
+def cargar_verificados(archivo=ARCHIVO_VALIDOS):
+    try:
+        with open(archivo, 'r') as f:
+            return {etf["symbol"]: etf for etf in json.load(f)}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+# Indica si una entrada previa sigue vigente y no necesita volver a verificarse
+def esta_vigente(entrada, ahora, dias_vigencia=DIAS_VIGENCIA, campo="verified_at"):
+    fecha = entrada.get(campo) if entrada else None
+    if not fecha:
+        return False
+    return ahora - datetime.fromisoformat(fecha) < timedelta(days=dias_vigencia)
+
+
+# Indica si un símbolo se marcó como inválido hace poco y todavía no toca revisarlo
+def invalido_vigente(fallo, ahora, dias_revision=DIAS_REVISION_INVALIDOS):
+    return bool(fallo) and fallo.get("reason") == MOTIVO_INVALIDO and \
+        esta_vigente(fallo, ahora, dias_revision, campo="checked_at")
+
+
+# Función para verificar si los símbolos son válidos en Yahoo Finance.
+# Solo se consultan los símbolos nuevos o con verificación vencida, en paralelo con un número acotado de hilos;
+# los marcados como inválidos se omiten hasta que toque revisarlos. Devuelve (válidos, fallidos).
+def verify_etf_symbols(etfs, proveedor=verificar_con_proveedor, verificados=None, max_workers=MAX_WORKERS,
+                       timeout=TIMEOUT_SEGUNDOS, reintentos=REINTENTOS, dias_vigencia=DIAS_VIGENCIA,
+                       fallidos=None, dias_revision=DIAS_REVISION_INVALIDOS):
+    verificados = verificados or {}
+    fallidos = fallidos or {}
+    ahora = datetime.now(timezone.utc)
+
+    resultados = {}
+    nuevos_fallos = {}
+    pendientes = []
+    for etf in etfs:
+        previo = verificados.get(etf["symbol"])
+        if esta_vigente(previo, ahora, dias_vigencia):
+            resultados[etf["symbol"]] = {**etf, "verified_at": previo["verified_at"]}
+        elif invalido_vigente(fallidos.get(etf["symbol"]), ahora, dias_revision):
+            nuevos_fallos[etf["symbol"]] = fallidos[etf["symbol"]]
+        else:
+            pendientes.append(etf)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = {executor.submit(verify_etf_symbol, etf, proveedor, timeout, reintentos): etf for etf in pendientes}
+        for futuro in as_completed(futuros):
+            etf = futuros[futuro]
+            symbol = etf["symbol"]
+            valido = futuro.result()
+            momento = datetime.now(timezone.utc).isoformat()
+            if valido:
+                resultados[symbol] = {**etf, "verified_at": momento}
                 print(f"Valid symbol: {symbol} ({etf['name']})")
+            elif valido is None:
+                # Falla del proveedor: se reintenta en la próxima corrida, conservando la verificación anterior si la hay
+                nuevos_fallos[symbol] = {**etf, "checked_at": momento, "reason": MOTIVO_ERROR}
+                if symbol in verificados:
+                    resultados[symbol] = verificados[symbol]
+                print(f"Could not verify symbol: {symbol} ({etf['name']}), will retry on the next run")
             else:
+                nuevos_fallos[symbol] = {**etf, "checked_at": momento, "reason": MOTIVO_INVALIDO}
                 print(f"Invalid symbol: {symbol} ({etf['name']})")
-        except Exception as e:
-            print(f"Error with symbol: {symbol} ({etf['name']}), Error: {str(e)}")
-    
-    return valid_etfs
 
-# Verificar símbolos
-valid_etfs = verify_etf_symbols(etfs)
+    # Mantener el orden del catálogo original
+    return ([resultados[etf["symbol"]] for etf in etfs if etf["symbol"] in resultados],
+            [nuevos_fallos[etf["symbol"]] for etf in etfs if etf["symbol"] in nuevos_fallos])
+
+
+# Función para guardar la lista de ETFs válidos (o de fallidos con ARCHIVO_FALLIDOS) de forma atómica
+def guardar_validos(valid_etfs, archivo=ARCHIVO_VALIDOS):
+    temporal = f"{archivo}.tmp"
+    with open(temporal, 'w') as f:
+        json.dump(valid_etfs, f, indent=4)
+    os.replace(temporal, archivo)
+
+
+if __name__ == "__main__":
+    # Verificar símbolos
+    valid_etfs, failed_etfs = verify_etf_symbols(etfs, verificados=cargar_verificados(),
+                                                 fallidos=cargar_verificados(ARCHIVO_FALLIDOS))
 
-# Guardar en un nuevo archivo JSON solo los símbolos válidos
-with open('valid_etfs.json', 'w') as f:
-    json.dump(valid_etfs, f, indent=4)
+    # Guardar en el archivo JSON solo los símbolos válidos, y aparte los fallidos con su motivo
+    guardar_validos(valid_etfs)
+    guardar_validos(failed_etfs, ARCHIVO_FALLIDOS)
 
-print("\nValid symbols saved to 'valid_etfs.json'")
+    print(f"\nValid symbols saved to '{ARCHIVO_VALIDOS}'")
 
 # Paso 4: Ejecutar el script
 # Una vez que hayas instalado las librerías necesarias, guarda este código en un archivo llamado 'verificar_etfs.py'.
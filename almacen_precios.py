@@ -0,0 +1,296 @@
+import json
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import proveedores
+
+# Carpeta del almacén de precios: un dataset Parquet particionado por símbolo (symbol=XXX/)
+RUTA_ALMACEN = "datos_precios"
+
+# Fecha inicial de la historia cuando un símbolo aún no está en el almacén
+FECHA_INICIO = '2013-10-22'
+
+COLUMNAS_PRECIOS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+# Barras guardadas que se vuelven a descargar en cada actualización (corrigen cierres parciales y revisiones),
+# días naturales que se leen para encontrarlas y tolerancia relativa para detectar un cambio de ajuste
+SOLAPE_BARRAS = 5
+DIAS_LECTURA_SOLAPE = 21
+TOLERANCIA_AJUSTE = 1e-6
+
+# Cada escritura agrega un archivo con sus barras y un sello de escritura; al leer, de una misma fecha gana la
+# barra más reciente. Con más de MAX_ARCHIVOS_PARTICION archivos la partición se compacta en uno solo; los
+# archivos reemplazados se anotan en ARCHIVO_OBSOLETOS (el prefijo "_" hace que el dataset lo ignore) y se borran
+# en una escritura posterior, pasados GRACIA_BORRADO_SEGUNDOS, para no romper las lecturas que ya los listaron
+COLUMNA_ESCRITURA = '_escritura'
+MAX_ARCHIVOS_PARTICION = 32
+ARCHIVO_OBSOLETOS = "_obsoletos.json"
+GRACIA_BORRADO_SEGUNDOS = 10 * 60
+
+# Intentos de lectura cuando un archivo desaparece entre que se lista el dataset y se lee
+INTENTOS_LECTURA = 3
+
+_PARTICION = ds.partitioning(pa.schema([('symbol', pa.string())]), flavor='hive')
+
+# Esquema fijo del dataset: los archivos escritos antes del sello de escritura lo leen como nulo
+_ESQUEMA = pa.schema([('Date', pa.timestamp('ns'))] + [(c, pa.float64()) for c in COLUMNAS_PRECIOS] +
+                     [(COLUMNA_ESCRITURA, pa.int64()), ('symbol', pa.string())])
+
+
+# Función para abrir el dataset completo (None si el almacén está vacío)
+def _abrir_dataset(ruta):
+    if not os.path.isdir(ruta):
+        return None
+    return ds.dataset(ruta, format='parquet', partitioning=_PARTICION, schema=_ESQUEMA)
+
+
+# Función para leer una tabla del dataset; si una compactación borró un archivo ya listado, se vuelve a listar
+def _leer_tabla(ruta, columnas, filtro):
+    for intento in range(INTENTOS_LECTURA):
+        dataset = _abrir_dataset(ruta)
+        if dataset is None:
+            return None
+        try:
+            return dataset.to_table(columns=columnas, filter=filtro)
+        except FileNotFoundError:
+            if intento == INTENTOS_LECTURA - 1:
+                raise
+
+
+# Función para obtener la última fecha guardada de cada símbolo
+def ultimas_fechas(simbolos=None, ruta=RUTA_ALMACEN):
+    filtro = ds.field('symbol').isin(list(simbolos)) if simbolos is not None else None
+    tabla = _leer_tabla(ruta, ['symbol', 'Date'], filtro)
+    if tabla is None or tabla.num_rows == 0:
+        return {}
+    fechas = tabla.group_by('symbol').aggregate([('Date', 'max')]).to_pandas()
+    return {fila.symbol: pd.Timestamp(fila.Date_max) for fila in fechas.itertuples()}
+
+
+# Archivos Parquet de la partición de un símbolo, en orden
+def _archivos(carpeta):
+    if not os.path.isdir(carpeta):
+        return []
+    return sorted(nombre for nombre in os.listdir(carpeta)
+                  if nombre.endswith('.parquet') and not nombre.startswith(('_', '.')))
+
+
+# Función para obtener la revisión de cada símbolo guardado: cambia con cada escritura de su partición
+# (solo lista los archivos, no los lee)
+def revisiones(simbolos, ruta=RUTA_ALMACEN):
+    resultado = {}
+    for simbolo in simbolos:
+        archivos = _archivos(os.path.join(ruta, f"symbol={simbolo}"))
+        if archivos:
+            resultado[simbolo] = ",".join(archivos)
+    return resultado
+
+
+# Función para guardar en el almacén las barras descargadas de un símbolo. Se escriben en un archivo nuevo de la
+# partición (escritura atómica) que, al leer, prevalece sobre las barras guardadas de las mismas fechas, así que
+# una barra parcial o una historia reajustada se corrigen al volver a descargarlas sin reescribir toda la
+# historia. Devuelve cuántas barras son posteriores a ultima_fecha; si nada cambió, no se escribe.
+def guardar(simbolo, frame, ruta=RUTA_ALMACEN, ultima_fecha=None):
+    frame = frame.dropna(how='all')
+    if frame.empty:
+        return 0
+
+    frame = frame.reindex(columns=COLUMNAS_PRECIOS).astype('float64')
+    frame.index = pd.DatetimeIndex(frame.index).tz_localize(None).rename('Date')
+    frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+    nuevas = int((frame.index > ultima_fecha).sum()) if ultima_fecha is not None else len(frame)
+
+    carpeta = os.path.join(ruta, f"symbol={simbolo}")
+    anteriores = _archivos(carpeta)
+    if anteriores and nuevas == 0:
+        guardado = leer([simbolo], ruta, desde=frame.index.min()).get(simbolo)
+        if guardado is not None and guardado.index.equals(frame.index) and \
+                np.array_equal(guardado[COLUMNAS_PRECIOS].to_numpy(), frame.to_numpy(), equal_nan=True):
+            return 0
+
+    _escribir(carpeta, frame)
+    # Los archivos cuyas fechas quedan dentro de las recién escritas (una historia reajustada) ya no aportan nada
+    obsoletos = _cargar_obsoletos(carpeta)
+    vigentes = [nombre for nombre in anteriores if nombre not in obsoletos]
+    desde, hasta = f"{frame.index.min():%Y%m%d}", f"{frame.index.max():%Y%m%d}"
+    cubiertos = [nombre for nombre in vigentes if desde <= nombre[5:13] and nombre[14:22] <= hasta]
+    if cubiertos:
+        _marcar_obsoletos(carpeta, cubiertos)
+    elif len(vigentes) + 1 > MAX_ARCHIVOS_PARTICION:
+        _compactar(simbolo, ruta)
+    _borrar_obsoletos(carpeta)
+    return nuevas
+
+
+# Escribe las barras en un archivo nuevo de la partición con el sello de escritura actual
+def _escribir(carpeta, frame):
+    tabla = pa.Table.from_pandas(frame.reset_index(), preserve_index=False)
+    tabla = tabla.append_column(COLUMNA_ESCRITURA, pa.array(np.full(len(tabla), time.time_ns()), pa.int64()))
+    os.makedirs(carpeta, exist_ok=True)
+    # El sufijo aleatorio hace que cada escritura cambie la revisión del símbolo
+    nombre = f"part-{frame.index.min():%Y%m%d}-{frame.index.max():%Y%m%d}-{uuid.uuid4().hex[:8]}.parquet"
+    temporal = os.path.join(carpeta, f".{uuid.uuid4().hex}.tmp")
+    pq.write_table(tabla, temporal)
+    os.replace(temporal, os.path.join(carpeta, nombre))
+
+
+# Junta la partición de un símbolo en un solo archivo; los archivos reemplazados se borran más tarde
+def _compactar(simbolo, ruta):
+    carpeta = os.path.join(ruta, f"symbol={simbolo}")
+    anteriores = _archivos(carpeta)
+    guardado = leer([simbolo], ruta).get(simbolo)
+    if guardado is None:
+        return
+    _escribir(carpeta, guardado[COLUMNAS_PRECIOS])
+    _marcar_obsoletos(carpeta, anteriores)
+
+
+# Anota archivos reemplazados de la partición para borrarlos pasado el tiempo de gracia
+def _marcar_obsoletos(carpeta, nombres):
+    obsoletos = _cargar_obsoletos(carpeta)
+    ahora = time.time()
+    for nombre in nombres:
+        obsoletos.setdefault(nombre, ahora)
+    _guardar_obsoletos(carpeta, obsoletos)
+
+
+# Archivos reemplazados de la partición: {nombre: momento en que se reemplazó}
+def _cargar_obsoletos(carpeta):
+    try:
+        with open(os.path.join(carpeta, ARCHIVO_OBSOLETOS), 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _guardar_obsoletos(carpeta, obsoletos):
+    archivo = os.path.join(carpeta, ARCHIVO_OBSOLETOS)
+    temporal = os.path.join(carpeta, f".{uuid.uuid4().hex}.tmp")
+    with open(temporal, 'w') as f:
+        json.dump(obsoletos, f, indent=4)
+    os.replace(temporal, archivo)
+
+
+# Borra los archivos reemplazados que ya cumplieron el tiempo de gracia
+def _borrar_obsoletos(carpeta, ahora=None):
+    obsoletos = _cargar_obsoletos(carpeta)
+    if not obsoletos:
+        return
+    ahora = ahora if ahora is not None else time.time()
+    vencidos = [nombre for nombre, marcado in obsoletos.items() if ahora - marcado >= GRACIA_BORRADO_SEGUNDOS]
+    for nombre in vencidos:
+        try:
+            os.remove(os.path.join(carpeta, nombre))
+        except FileNotFoundError:
+            pass
+        del obsoletos[nombre]
+    if vencidos:
+        _guardar_obsoletos(carpeta, obsoletos)
+
+
+# Separa la descarga conjunta de yfinance en un DataFrame por símbolo
+def separar_por_simbolo(data, simbolos):
+    frames = {}
+    if data is None or data.empty:
+        return frames
+    if not isinstance(data.columns, pd.MultiIndex):
+        # Con un solo símbolo algunas versiones de yfinance no devuelven MultiIndex
+        data = pd.concat({simbolos[0]: data}, axis=1).swaplevel(0, 1, axis=1)
+    for simbolo in simbolos:
+        if simbolo not in data.columns.get_level_values(1):
+            continue
+        frame = data.xs(simbolo, axis=1, level=1).dropna(how='all')
+        if not frame.empty:
+            frames[simbolo] = frame
+    return frames
+
+
+# Indica si cambió el ajuste (Adj Close / Close) de las barras que ya estaban guardadas: hubo un dividendo o
+# un split y toda la historia ajustada del símbolo quedó desactualizada
+def _cambio_ajuste(guardado, descargado):
+    fechas = guardado.index.intersection(descargado.index)
+    if fechas.empty:
+        return False
+    antes = guardado.loc[fechas, 'Adj Close'] / guardado.loc[fechas, 'Close']
+    despues = descargado.loc[fechas, 'Adj Close'] / descargado.loc[fechas, 'Close']
+    return not np.allclose(antes.to_numpy(), despues.to_numpy(), rtol=TOLERANCIA_AJUSTE, equal_nan=True)
+
+
+# Función para actualizar el almacén. Se vuelven a pedir al proveedor las últimas SOLAPE_BARRAS barras guardadas
+# de cada símbolo junto con las nuevas, para corregir la última barra si se guardó a mitad de la sesión; si en ese
+# solape cambió el ajuste por dividendos o splits, se vuelve a descargar la historia completa del símbolo.
+def actualizar(simbolos, ruta=RUTA_ALMACEN, descargar=None, fecha_inicio=FECHA_INICIO, fecha_fin=None):
+    if descargar is None:
+        # Proveedor del proceso: Yahoo en vivo, o el grabador/reproductor según PROVEEDOR_DATOS
+        descargar = proveedores.obtener().descargar
+    simbolos = list(dict.fromkeys(simbolos))
+    ultimas = ultimas_fechas(simbolos, ruta)
+    solapes = {}
+    if ultimas:
+        desde = min(ultimas.values()) - pd.Timedelta(days=DIAS_LECTURA_SOLAPE)
+        recientes = leer(list(ultimas), ruta, desde=desde, columnas=['Close', 'Adj Close'])
+        solapes = {simbolo: frame.tail(SOLAPE_BARRAS) for simbolo, frame in recientes.items()}
+
+    # Agrupar los símbolos que comparten fecha de inicio para pedirlos en una sola llamada
+    grupos = {}
+    for simbolo in simbolos:
+        solape = solapes.get(simbolo)
+        inicio = solape.index.min().strftime('%Y-%m-%d') if solape is not None and not solape.empty else fecha_inicio
+        grupos.setdefault(inicio, []).append(simbolo)
+
+    filas_nuevas = {}
+    reajustados = []
+    for inicio, grupo in grupos.items():
+        if fecha_fin is not None and inicio >= fecha_fin:
+            filas_nuevas.update(dict.fromkeys(grupo, 0))
+            continue
+        data = descargar(grupo, start=inicio, end=fecha_fin, auto_adjust=False, progress=False)
+        frames = separar_por_simbolo(data, grupo)
+        for simbolo in grupo:
+            if simbolo in solapes and simbolo in frames and _cambio_ajuste(solapes[simbolo], frames[simbolo]):
+                reajustados.append(simbolo)
+            elif simbolo in frames:
+                filas_nuevas[simbolo] = guardar(simbolo, frames[simbolo], ruta, ultimas.get(simbolo))
+            else:
+                filas_nuevas[simbolo] = 0
+
+    if reajustados:
+        frames = separar_por_simbolo(
+            descargar(reajustados, start=fecha_inicio, end=fecha_fin, auto_adjust=False, progress=False), reajustados)
+        for simbolo in reajustados:
+            filas_nuevas[simbolo] = guardar(simbolo, frames[simbolo], ruta, ultimas.get(simbolo)) if simbolo in frames else 0
+    return filas_nuevas
+
+
+# Función para leer del almacén los precios de varios símbolos: {símbolo: DataFrame OHLCV}
+def leer(simbolos, ruta=RUTA_ALMACEN, desde=None, columnas=None):
+    filtro = ds.field('symbol').isin(list(simbolos))
+    if desde is not None:
+        filtro = filtro & (ds.field('Date') >= pa.scalar(pd.Timestamp(desde), type=pa.timestamp('ns')))
+    columnas = list(columnas) if columnas is not None else COLUMNAS_PRECIOS
+    tabla = _leer_tabla(ruta, ['symbol', 'Date', COLUMNA_ESCRITURA] + columnas, filtro)
+    if tabla is None or tabla.num_rows == 0:
+        return {}
+
+    frame = tabla.to_pandas()
+    frame[COLUMNA_ESCRITURA] = frame[COLUMNA_ESCRITURA].fillna(0)
+    frames = {}
+    for simbolo, grupo in frame.groupby('symbol', sort=False):
+        # De cada fecha queda la barra escrita al último
+        grupo = grupo.sort_values(['Date', COLUMNA_ESCRITURA], kind='stable')
+        grupo = grupo.drop(columns=['symbol', COLUMNA_ESCRITURA]).set_index('Date')
+        frames[simbolo] = grupo[~grupo.index.duplicated(keep='last')]
+    return frames
+
+
+# Función para leer una matriz de precios (fechas x símbolos) de un solo campo
+def leer_precios(simbolos, campo='Adj Close', ruta=RUTA_ALMACEN, desde=None):
+    frames = leer(simbolos, ruta, desde, columnas=[campo])
+    return pd.DataFrame({s: frames[s][campo] for s in simbolos if s in frames}, columns=list(simbolos))
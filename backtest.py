@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+import estadisticas
+
+# Calendarios de rebalanceo disponibles
+REBALANCEOS = ['ninguno', 'mensual', 'trimestral', 'umbral']
+
+# Desviación máxima (fracción) de cualquier peso respecto a su objetivo antes de rebalancear con 'umbral'
+UMBRAL = 0.05
+
+# Periodo de pandas con el que cambia cada calendario
+_FRECUENCIAS = {'mensual': 'M', 'trimestral': 'Q'}
+
+
+# Función para marcar los días en que se rebalancea con un calendario: el último día hábil de cada mes o trimestre
+def dias_rebalanceo(fechas, rebalanceo):
+    if rebalanceo not in REBALANCEOS:
+        raise ValueError(f"Rebalanceo desconocido: {rebalanceo}; usa uno de {REBALANCEOS}")
+    marcas = np.zeros(len(fechas), dtype=bool)
+    if rebalanceo in _FRECUENCIAS and len(fechas) > 1:
+        periodos = pd.DatetimeIndex(fechas).to_period(_FRECUENCIAS[rebalanceo])
+        marcas[:-1] = periodos[1:] != periodos[:-1]
+    return marcas
+
+
+# Función para calcular las métricas realizadas de una o varias curvas de valor (fechas x variantes)
+def metricas_realizadas(valores):
+    valores = np.asarray(valores, dtype=float)
+    rendimientos = valores[1:] / valores[:-1] - 1
+    anios = max(len(rendimientos), 1) / estadisticas.DIAS_HABILES
+
+    rendimiento_anual = (valores[-1] / valores[0]) ** (1 / anios) - 1
+    volatilidad = np.zeros(valores.shape[1])
+    sharpe = np.zeros(valores.shape[1])
+    if len(rendimientos) > 1:
+        volatilidad = rendimientos.std(axis=0, ddof=1) * np.sqrt(estadisticas.DIAS_HABILES)
+        np.divide(rendimientos.mean(axis=0) * estadisticas.DIAS_HABILES, volatilidad, out=sharpe, where=volatilidad > 0)
+    drawdown_maximo = (valores / np.maximum.accumulate(valores, axis=0) - 1).min(axis=0)
+    return {"rendimiento_anual": rendimiento_anual, "volatilidad": volatilidad,
+            "sharpe": sharpe, "drawdown_maximo": drawdown_maximo}
+
+
+# Función para simular históricamente uno o varios portafolios con rebalanceo periódico y costos de transacción.
+# precios es fechas x símbolos; pesos es (n,) o (k, n) en fracciones; rebalanceo es un calendario o una lista
+# con uno por variante. Todas las variantes avanzan juntas, un día a la vez, como una sola matriz (k, n).
+# costo_transaccion es la fracción del monto negociado que se pierde en cada rebalanceo.
+def evaluar(precios, pesos, rebalanceo='mensual', costo_transaccion=0.0, umbral=UMBRAL,
+            inversion_inicial=1.0, nombres=None):
+    rendimientos = precios.pct_change(fill_method=None).iloc[1:]
+    matriz = np.nan_to_num(rendimientos.to_numpy(dtype=float))
+    objetivo = np.atleast_2d(np.asarray(pesos, dtype=float))
+
+    calendarios = [rebalanceo] if isinstance(rebalanceo, str) else list(rebalanceo)
+    k = max(len(objetivo), len(calendarios))
+    objetivo = np.broadcast_to(objetivo, (k, objetivo.shape[1]))
+    calendarios = calendarios * k if len(calendarios) == 1 else calendarios
+    if len(calendarios) != k:
+        raise ValueError("Se necesita un rebalanceo por variante o uno solo para todas")
+
+    # Un calendario por variante (días x variantes), calculado una vez por calendario distinto
+    marcas = {c: dias_rebalanceo(rendimientos.index, c) for c in set(calendarios)}
+    calendario = np.column_stack([marcas[c] for c in calendarios]) if len(matriz) else np.zeros((0, k), dtype=bool)
+    por_umbral = np.array([c == 'umbral' for c in calendarios])
+
+    tenencias = objetivo * inversion_inicial
+    valores = np.empty((len(matriz) + 1, k))
+    valores[0] = inversion_inicial
+    negociado = np.zeros(k)
+    costos = np.zeros(k)
+    n_rebalanceos = np.zeros(k, dtype=int)
+
+    for t in range(len(matriz)):
+        tenencias = tenencias * (1 + matriz[t])
+        valor = tenencias.sum(axis=1)
+        rebalancear = calendario[t].copy()
+        if por_umbral.any():
+            desviacion = np.abs(tenencias / np.where(valor > 0, valor, 1)[:, None] - objetivo).max(axis=1)
+            rebalancear |= por_umbral & (desviacion > umbral)
+
+        if rebalancear.any():
+            operado = np.abs(objetivo * valor[:, None] - tenencias).sum(axis=1) * rebalancear
+            costo = operado * costo_transaccion
+            valor = valor - costo
+            tenencias = np.where(rebalancear[:, None], objetivo * valor[:, None], tenencias)
+            negociado += np.divide(operado, valor, out=np.zeros(k), where=valor > 0) / 2
+            costos += costo
+            n_rebalanceos += rebalancear
+        valores[t + 1] = valor
+
+    indice = precios.index[:1].append(rendimientos.index)
+    columnas = list(nombres) if nombres is not None else list(range(k))
+    metricas = pd.DataFrame(metricas_realizadas(valores), index=columnas)
+    anios = max(len(matriz), 1) / estadisticas.DIAS_HABILES
+    metricas["rotacion_anual"] = negociado / anios
+    metricas["costos"] = costos
+    metricas["rebalanceos"] = n_rebalanceos
+
+    return {
+        "valores": pd.DataFrame(valores, index=indice, columns=columnas),
+        "pesos_finales": tenencias / np.where(valores[-1] > 0, valores[-1], 1)[:, None],
+        "metricas": metricas
+    }
@@ -0,0 +1,414 @@
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+import trazas
+
+# Ruta de la base de datos y tamaño máximo del pool de conexiones por archivo
+RUTA_BD = "users.db"
+TAMANO_POOL = 8
+
+# Milisegundos que una conexión espera un bloqueo antes de fallar
+BUSY_TIMEOUT_MS = 5000
+
+
+class Usuario(NamedTuple):
+    id: int
+    first_name: str
+    last_name: str
+    email: str
+    phone: str
+    password: str
+
+
+class PortafolioModelo(NamedTuple):
+    nivel_riesgo: str
+    plazo: int
+    version_datos: str
+    pesos: dict
+    rendimiento: float
+    volatilidad: float
+    sharpe: float
+    multiplo_mediano: float
+    multiplo_percentil_5: float
+    multiplo_percentil_95: float
+    drawdown_mediano: float
+    actualizado: str
+
+
+class Poliza(NamedTuple):
+    id: int
+    user_id: int
+    inversion_inicial: float
+    plazo_inversion: int
+    periodo: str
+    actualizado: str
+    etfs: list
+    ponderaciones: dict
+
+
+class ProyeccionGuardada(NamedTuple):
+    poliza_id: int
+    version_datos: str
+    resultado: bytes
+    calculado: str
+
+
+class Cliente(NamedTuple):
+    id: int
+    user_id: int
+    edad: int
+    ingreso_mensual: float
+    ocupacion: str
+    objetivo: str
+    nivel_riesgo: str
+
+
+# Migraciones del esquema en orden; PRAGMA user_version guarda cuántas se han aplicado
+MIGRACIONES = [
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name TEXT,
+        last_name TEXT,
+        email TEXT UNIQUE,
+        phone TEXT,
+        password TEXT
+    );
+    CREATE TABLE IF NOT EXISTS cliente_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        edad INTEGER,
+        ingreso_mensual REAL,
+        ocupacion TEXT,
+        objetivo TEXT,
+        nivel_riesgo TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+    ''',
+    # Un solo registro de datos por usuario (se conserva el más reciente) con índice único sobre user_id
+    '''
+    DELETE FROM cliente_data
+    WHERE id NOT IN (SELECT MAX(id) FROM cliente_data GROUP BY user_id);
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_cliente_data_user_id ON cliente_data (user_id);
+    ''',
+    # Portafolios modelo precalculados por nivel de riesgo y plazo
+    '''
+    CREATE TABLE IF NOT EXISTS portafolios_modelo (
+        nivel_riesgo TEXT NOT NULL,
+        plazo INTEGER NOT NULL,
+        version_datos TEXT,
+        pesos TEXT,
+        rendimiento REAL,
+        volatilidad REAL,
+        sharpe REAL,
+        multiplo_mediano REAL,
+        multiplo_percentil_5 REAL,
+        multiplo_percentil_95 REAL,
+        drawdown_mediano REAL,
+        actualizado TEXT,
+        PRIMARY KEY (nivel_riesgo, plazo)
+    );
+    ''',
+    # Póliza guardada de cada usuario, sus ponderaciones y la última proyección calculada (por versión de datos)
+    '''
+    CREATE TABLE IF NOT EXISTS polizas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL UNIQUE,
+        inversion_inicial REAL,
+        plazo_inversion INTEGER,
+        periodo TEXT,
+        actualizado TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+    CREATE TABLE IF NOT EXISTS poliza_ponderaciones (
+        poliza_id INTEGER NOT NULL,
+        orden INTEGER NOT NULL,
+        simbolo TEXT NOT NULL,
+        nombre TEXT,
+        ponderacion INTEGER,
+        PRIMARY KEY (poliza_id, simbolo),
+        FOREIGN KEY (poliza_id) REFERENCES polizas (id) ON DELETE CASCADE
+    );
+    CREATE TABLE IF NOT EXISTS proyecciones (
+        poliza_id INTEGER PRIMARY KEY,
+        version_datos TEXT NOT NULL,
+        resultado BLOB NOT NULL,
+        calculado TEXT,
+        FOREIGN KEY (poliza_id) REFERENCES polizas (id) ON DELETE CASCADE
+    );
+    ''',
+]
+
+# Consultas de los repositorios (sqlite3 reutiliza la sentencia preparada de cada una por conexión)
+SQL_INSERTAR_USUARIO = 'INSERT INTO users (first_name, last_name, email, phone, password) VALUES (?, ?, ?, ?, ?)'
+SQL_ACTUALIZAR_PASSWORD = 'UPDATE users SET password = ? WHERE id = ?'
+SQL_USUARIO_POR_EMAIL = 'SELECT id, first_name, last_name, email, phone, password FROM users WHERE email = ?'
+SQL_CLIENTE_POR_USUARIO = '''
+    SELECT id, user_id, edad, ingreso_mensual, ocupacion, objetivo, nivel_riesgo
+    FROM cliente_data WHERE user_id = ?
+'''
+SQL_GUARDAR_CLIENTE = '''
+    INSERT INTO cliente_data (user_id, edad, ingreso_mensual, ocupacion, objetivo, nivel_riesgo)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        edad = excluded.edad, ingreso_mensual = excluded.ingreso_mensual, ocupacion = excluded.ocupacion,
+        objetivo = excluded.objetivo, nivel_riesgo = excluded.nivel_riesgo
+'''
+# Sin contraseña (NULL) se conserva el hash guardado; un usuario nuevo sin contraseña no se crea
+SQL_UPSERT_USUARIO = '''
+    INSERT INTO users (first_name, last_name, email, phone, password)
+    SELECT ?1, ?2, ?3, ?4, ?5 WHERE ?5 IS NOT NULL OR EXISTS (SELECT 1 FROM users WHERE email = ?3)
+    ON CONFLICT (email) DO UPDATE SET
+        first_name = excluded.first_name, last_name = excluded.last_name,
+        phone = excluded.phone, password = COALESCE(excluded.password, users.password)
+'''
+SQL_UPSERT_CLIENTE_POR_EMAIL = '''
+    INSERT INTO cliente_data (user_id, edad, ingreso_mensual, ocupacion, objetivo, nivel_riesgo)
+    SELECT id, ?, ?, ?, ?, ? FROM users WHERE email = ?
+    ON CONFLICT (user_id) DO UPDATE SET
+        edad = excluded.edad, ingreso_mensual = excluded.ingreso_mensual, ocupacion = excluded.ocupacion,
+        objetivo = excluded.objetivo, nivel_riesgo = excluded.nivel_riesgo
+'''
+SQL_EXPORTAR = '''
+    SELECT u.first_name, u.last_name, u.email, u.phone, u.password,
+           c.edad, c.ingreso_mensual, c.ocupacion, c.objetivo, c.nivel_riesgo
+    FROM users u LEFT JOIN cliente_data c ON c.user_id = u.id
+    ORDER BY u.id
+'''
+SQL_GUARDAR_PORTAFOLIO_MODELO = '''
+    INSERT OR REPLACE INTO portafolios_modelo
+    (nivel_riesgo, plazo, version_datos, pesos, rendimiento, volatilidad, sharpe,
+     multiplo_mediano, multiplo_percentil_5, multiplo_percentil_95, drawdown_mediano, actualizado)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_PORTAFOLIO_MODELO = '''
+    SELECT nivel_riesgo, plazo, version_datos, pesos, rendimiento, volatilidad, sharpe,
+           multiplo_mediano, multiplo_percentil_5, multiplo_percentil_95, drawdown_mediano, actualizado
+    FROM portafolios_modelo WHERE nivel_riesgo = ? AND plazo = ?
+'''
+SQL_GUARDAR_POLIZA = '''
+    INSERT INTO polizas (user_id, inversion_inicial, plazo_inversion, periodo, actualizado)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        inversion_inicial = excluded.inversion_inicial, plazo_inversion = excluded.plazo_inversion,
+        periodo = excluded.periodo, actualizado = excluded.actualizado
+    RETURNING id
+'''
+SQL_BORRAR_PONDERACIONES = 'DELETE FROM poliza_ponderaciones WHERE poliza_id = ?'
+SQL_INSERTAR_PONDERACION = '''
+    INSERT INTO poliza_ponderaciones (poliza_id, orden, simbolo, nombre, ponderacion) VALUES (?, ?, ?, ?, ?)
+'''
+SQL_POLIZA_POR_USUARIO = '''
+    SELECT id, user_id, inversion_inicial, plazo_inversion, periodo, actualizado
+    FROM polizas WHERE user_id = ?
+'''
+SQL_PONDERACIONES_POLIZA = '''
+    SELECT simbolo, nombre, ponderacion FROM poliza_ponderaciones WHERE poliza_id = ? ORDER BY orden
+'''
+SQL_BORRAR_PROYECCION = 'DELETE FROM proyecciones WHERE poliza_id = ?'
+SQL_GUARDAR_PROYECCION = '''
+    INSERT OR REPLACE INTO proyecciones (poliza_id, version_datos, resultado, calculado) VALUES (?, ?, ?, ?)
+'''
+SQL_PROYECCION = 'SELECT poliza_id, version_datos, resultado, calculado FROM proyecciones WHERE poliza_id = ?'
+
+# Columnas del formato de importación/exportación masiva
+COLUMNAS_USUARIO = ['first_name', 'last_name', 'email', 'phone', 'password']
+COLUMNAS_CLIENTE = ['edad', 'ingreso_mensual', 'ocupacion', 'objetivo', 'nivel_riesgo']
+
+_pools = {}
+_migradas = set()
+_lock = threading.Lock()
+
+
+# Función para abrir una conexión nueva con WAL y tiempo de espera ante bloqueos
+def _abrir_conexion(ruta):
+    conexion = sqlite3.connect(ruta, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               cached_statements=128)
+    conexion.execute('PRAGMA journal_mode = WAL')
+    conexion.execute('PRAGMA synchronous = NORMAL')
+    conexion.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conexion.execute('PRAGMA foreign_keys = ON')
+    return conexion
+
+
+# Función para tomar prestada una conexión del pool; cada conexión la usa un solo hilo a la vez
+@contextmanager
+def conexion(ruta=RUTA_BD):
+    with _lock:
+        pool = _pools.setdefault(ruta, queue.LifoQueue(maxsize=TAMANO_POOL))
+    try:
+        con = pool.get_nowait()
+    except queue.Empty:
+        con = _abrir_conexion(ruta)
+    try:
+        with trazas.tramo("sqlite", base=ruta):
+            yield con
+    finally:
+        if con.in_transaction:
+            con.rollback()
+        try:
+            pool.put_nowait(con)
+        except queue.Full:
+            con.close()
+
+
+# Función para aplicar las migraciones pendientes; solo trabaja la primera vez por archivo y proceso
+def migrar(ruta=RUTA_BD):
+    with _lock:
+        if ruta in _migradas:
+            return
+        con = _abrir_conexion(ruta)
+        try:
+            version = con.execute('PRAGMA user_version').fetchone()[0]
+            for numero, script in enumerate(MIGRACIONES[version:], start=version + 1):
+                con.executescript(f'BEGIN;\n{script}\nPRAGMA user_version = {numero};\nCOMMIT;')
+        finally:
+            con.close()
+        _migradas.add(ruta)
+
+
+# Repositorio de usuarios
+
+# Función para crear un usuario; devuelve False si el correo ya existe
+def crear_usuario(first_name, last_name, email, phone, password_hash, ruta=RUTA_BD):
+    with conexion(ruta) as con:
+        try:
+            with con:
+                con.execute(SQL_INSERTAR_USUARIO, (first_name, last_name, email, phone, password_hash))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+
+# Función para buscar un usuario por correo electrónico
+def obtener_usuario_por_email(email, ruta=RUTA_BD) -> Optional[Usuario]:
+    with conexion(ruta) as con:
+        fila = con.execute(SQL_USUARIO_POR_EMAIL, (email,)).fetchone()
+    return Usuario(*fila) if fila else None
+
+
+# Función para reemplazar el hash de contraseña de un usuario
+def actualizar_password(user_id, password_hash, ruta=RUTA_BD):
+    with conexion(ruta) as con:
+        with con:
+            con.execute(SQL_ACTUALIZAR_PASSWORD, (password_hash, user_id))
+
+
+# Repositorio de datos del cliente
+
+# Función para obtener los datos financieros de un usuario
+def obtener_cliente(user_id, ruta=RUTA_BD) -> Optional[Cliente]:
+    with conexion(ruta) as con:
+        fila = con.execute(SQL_CLIENTE_POR_USUARIO, (user_id,)).fetchone()
+    return Cliente(*fila) if fila else None
+
+
+# Función para guardar (actualizar o insertar) los datos financieros de un usuario
+def guardar_cliente(user_id, edad, ingreso_mensual, ocupacion, objetivo, nivel_riesgo, ruta=RUTA_BD):
+    with conexion(ruta) as con:
+        with con:
+            con.execute(SQL_GUARDAR_CLIENTE, (user_id, edad, ingreso_mensual, ocupacion, objetivo, nivel_riesgo))
+
+
+# Repositorio de portafolios modelo
+
+# Función para reemplazar en una sola transacción la tabla de portafolios modelo (lista de PortafolioModelo)
+def guardar_portafolios_modelo(portafolios, ruta=RUTA_BD):
+    filas = [p._replace(pesos=json.dumps(p.pesos)) for p in portafolios]
+    with conexion(ruta) as con:
+        with con:
+            con.executemany(SQL_GUARDAR_PORTAFOLIO_MODELO, filas)
+
+
+# Función para obtener el portafolio modelo de un nivel de riesgo y plazo
+def obtener_portafolio_modelo(nivel_riesgo, plazo, ruta=RUTA_BD) -> Optional[PortafolioModelo]:
+    with conexion(ruta) as con:
+        fila = con.execute(SQL_PORTAFOLIO_MODELO, (nivel_riesgo, plazo)).fetchone()
+    if not fila:
+        return None
+    portafolio = PortafolioModelo(*fila)
+    return portafolio._replace(pesos=json.loads(portafolio.pesos))
+
+
+# Repositorio de pólizas
+
+# Función para guardar (actualizar o insertar) la póliza de un usuario con sus ponderaciones.
+# etfs es la lista de dicts con "symbol" y "name" en el orden elegido y ponderaciones {símbolo: porcentaje}.
+# Al editar la póliza se descarta la proyección guardada. Devuelve el id de la póliza.
+def guardar_poliza(user_id, inversion_inicial, plazo_inversion, periodo, etfs, ponderaciones, ruta=RUTA_BD):
+    actualizado = datetime.now(timezone.utc).isoformat()
+    with conexion(ruta) as con:
+        with con:
+            poliza_id = con.execute(SQL_GUARDAR_POLIZA,
+                                    (user_id, inversion_inicial, plazo_inversion, periodo, actualizado)).fetchone()[0]
+            con.execute(SQL_BORRAR_PONDERACIONES, (poliza_id,))
+            con.executemany(SQL_INSERTAR_PONDERACION, [
+                (poliza_id, orden, etf["symbol"], etf["name"], ponderaciones.get(etf["symbol"], 0))
+                for orden, etf in enumerate(etfs)
+            ])
+            con.execute(SQL_BORRAR_PROYECCION, (poliza_id,))
+    return poliza_id
+
+
+# Función para obtener la póliza guardada de un usuario
+def obtener_poliza(user_id, ruta=RUTA_BD) -> Optional[Poliza]:
+    with conexion(ruta) as con:
+        fila = con.execute(SQL_POLIZA_POR_USUARIO, (user_id,)).fetchone()
+        if not fila:
+            return None
+        ponderaciones = con.execute(SQL_PONDERACIONES_POLIZA, (fila[0],)).fetchall()
+    return Poliza(*fila,
+                  etfs=[{"symbol": simbolo, "name": nombre} for simbolo, nombre, _ in ponderaciones],
+                  ponderaciones={simbolo: ponderacion for simbolo, _, ponderacion in ponderaciones})
+
+
+# Función para guardar la proyección calculada de una póliza (resultado ya serializado) con su versión de datos
+def guardar_proyeccion(poliza_id, version_datos, resultado, ruta=RUTA_BD):
+    with conexion(ruta) as con:
+        with con:
+            con.execute(SQL_GUARDAR_PROYECCION,
+                        (poliza_id, version_datos, resultado, datetime.now(timezone.utc).isoformat()))
+
+
+# Función para obtener la última proyección guardada de una póliza
+def obtener_proyeccion(poliza_id, ruta=RUTA_BD) -> Optional[ProyeccionGuardada]:
+    with conexion(ruta) as con:
+        fila = con.execute(SQL_PROYECCION, (poliza_id,)).fetchone()
+    return ProyeccionGuardada(*fila) if fila else None
+
+
+# Carga masiva
+
+# Función para insertar o actualizar un lote de usuarios y sus datos de cliente en una sola transacción.
+# Cada fila es un dict con COLUMNAS_USUARIO (password ya como hash, o None para conservar la guardada) y,
+# opcionalmente, COLUMNAS_CLIENTE. Devuelve cuántos usuarios se insertaron o actualizaron.
+def importar_lote(filas, ruta=RUTA_BD):
+    usuarios = [tuple(fila.get(c) for c in COLUMNAS_USUARIO) for fila in filas]
+    clientes = [
+        tuple(fila.get(c) for c in COLUMNAS_CLIENTE) + (fila['email'],)
+        for fila in filas
+        if any(fila.get(c) is not None for c in COLUMNAS_CLIENTE)
+    ]
+    with conexion(ruta) as con:
+        with con:
+            cambios = con.total_changes
+            con.executemany(SQL_UPSERT_USUARIO, usuarios)
+            cambios = con.total_changes - cambios
+            con.executemany(SQL_UPSERT_CLIENTE_POR_EMAIL, clientes)
+    return cambios
+
+
+# Función para leer usuarios y datos de cliente en lotes de tuplas (COLUMNAS_USUARIO + COLUMNAS_CLIENTE)
+def exportar_lotes(tamano_lote=10_000, ruta=RUTA_BD):
+    with conexion(ruta) as con:
+        cursor = con.execute(SQL_EXPORTAR)
+        while True:
+            filas = cursor.fetchmany(tamano_lote)
+            if not filas:
+                break
+            yield filas
@@ -0,0 +1,261 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import backtest
+import estadisticas
+import graficas
+import optimizador
+import riesgo_movil
+import simulacion
+import valor_riesgo
+
+# Días hábiles de cada historia que se mide
+HISTORIAS = {'1mo': 21, '6mo': 126, '1y': 252, '5y': 1260, '20y': 5040}
+
+# Parámetros por defecto de la corrida completa y de la rápida (--rapido)
+UNIVERSOS = [5, 50, 500]
+HISTORIAS_DEFECTO = ['1mo', '1y', '5y', '20y']
+LOTES = [1, 100]
+REPETICIONES = 3
+RAPIDO = {"universos": [5, 50], "historias": ['1y', '5y'], "lotes": [1, 100], "repeticiones": 1}
+
+# Límites de tamaño para las etapas que no escalan a catálogos grandes (como en la aplicación)
+MAX_SIMBOLOS_FRONTERA = 50
+MAX_SIMBOLOS_GRAFICAS = 20
+
+# Aumento relativo del tiempo a partir del cual una etapa se marca como regresión, y diferencia mínima
+# (segundos) para considerarla; por debajo de ella domina el ruido de la medición
+TOLERANCIA = 0.25
+DIFERENCIA_MINIMA_S = 0.005
+
+# Presupuesto (segundos, tiempo mínimo) del optimizador de "Datos de Póliza" con un catálogo de 30 ETFs:
+# la frontera completa y el máximo Sharpe deben responder en milisegundos
+SIMBOLOS_OPTIMIZADOR = 30
+PRESUPUESTO_OPTIMIZADOR_S = {"optimizador_frontera": 0.25, "optimizador_maximo_sharpe": 0.25}
+
+SEMILLA = 12345
+
+
+# Función para generar precios sintéticos reproducibles (fechas x símbolos): caminatas geométricas con un
+# factor de mercado común y volatilidades distintas; una parte de los símbolos empieza a cotizar más tarde
+def generar_precios(n_simbolos, n_dias, semilla=SEMILLA):
+    generador = np.random.default_rng([semilla, n_simbolos, n_dias])
+    betas = generador.uniform(0.2, 1.5, n_simbolos)
+    volatilidades = generador.uniform(0.005, 0.02, n_simbolos)
+    mercado = generador.normal(0.0003, 0.01, (n_dias, 1))
+    rendimientos = mercado * betas + generador.normal(0, 1, (n_dias, n_simbolos)) * volatilidades
+    precios = 100 * np.exp(np.cumsum(rendimientos, axis=0))
+
+    tardios = generador.choice(n_simbolos, size=n_simbolos // 10, replace=False)
+    for j in tardios:
+        precios[:generador.integers(1, max(n_dias // 2, 2)), j] = np.nan
+
+    fechas = pd.bdate_range(end='2024-12-31', periods=n_dias)
+    return pd.DataFrame(precios, index=fechas, columns=[f"SIM{j:04d}" for j in range(n_simbolos)])
+
+
+# Función para generar un lote de pesos aleatorios (lote x símbolos) que suman 1
+def generar_pesos(n_simbolos, lote, semilla=SEMILLA):
+    return np.random.default_rng([semilla, n_simbolos, lote]).dirichlet(np.ones(n_simbolos), lote)
+
+
+# Mide una función varias veces y devuelve los tiempos en segundos
+def _medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+# Función para obtener las etapas del cálculo de Proyección para unos precios y pesos, como {etapa: función}.
+# Las que dependen del lote de pesos se miden con cada tamaño de lote; las demás, una vez por universo e historia.
+def etapas(precios, pesos):
+    rendimientos = estadisticas.rendimientos_diarios(precios)
+    n_simbolos = precios.shape[1]
+    media = estadisticas.estadisticas_activos(rendimientos)["avg_annual_return"].to_numpy()
+    covarianza = estadisticas.estadisticas_portafolio(rendimientos, pesos[0])["covarianza"].to_numpy()
+
+    independientes = {
+        "rendimientos_diarios": lambda: estadisticas.rendimientos_diarios(precios),
+        "estadisticas_activos": lambda: estadisticas.estadisticas_activos(rendimientos),
+        "correlacion": lambda: estadisticas.matriz_correlacion(rendimientos),
+        "drawdown_movil": lambda: riesgo_movil.procesar_historia(rendimientos.fillna(0)),
+        "simulacion": lambda: simulacion.simular_proyeccion(media, covarianza, pesos[0], 100_000, 10, semilla=0,
+                                                            procesos=1),
+    }
+    if n_simbolos <= MAX_SIMBOLOS_FRONTERA:
+        frontera = optimizador.frontera_eficiente(media, covarianza)
+        independientes["frontera_eficiente"] = lambda: optimizador.frontera_eficiente(media, covarianza)
+        independientes["maximo_sharpe"] = lambda: optimizador.maximo_sharpe(media, covarianza, frontera=frontera)
+    if n_simbolos <= MAX_SIMBOLOS_GRAFICAS:
+        matriz_correlacion = estadisticas.matriz_correlacion(rendimientos)
+        acumulados = (1 + precios.pct_change(fill_method=None)).cumprod()
+        independientes["grafica_correlacion"] = lambda: graficas.a_png(graficas.figura_correlacion(matriz_correlacion))
+        independientes["grafica_rendimientos"] = lambda: graficas.a_png(graficas.figura_rendimientos_acumulados(acumulados))
+
+    por_lote = {
+        "estadisticas_portafolio": lambda: estadisticas.estadisticas_portafolio(rendimientos, pesos),
+        "valor_riesgo": lambda: valor_riesgo.calcular(rendimientos, pesos, metodos=['historico', 'parametrico']),
+        "backtest": lambda: backtest.evaluar(precios, pesos, 'mensual', 0.001),
+    }
+    return independientes, por_lote
+
+
+# Función para ejecutar la batería completa y devolver los resultados (lista de dicts por etapa y parámetros)
+def ejecutar(universos=UNIVERSOS, historias=HISTORIAS_DEFECTO, lotes=LOTES, repeticiones=REPETICIONES,
+             semilla=SEMILLA, mostrar=print):
+    resultados = []
+    for n_simbolos in universos:
+        for historia in historias:
+            n_dias = HISTORIAS[historia]
+            precios = generar_precios(n_simbolos, n_dias, semilla)
+            for lote in lotes:
+                independientes, por_lote = etapas(precios, generar_pesos(n_simbolos, lote, semilla))
+                medidas = dict(por_lote) if lote != lotes[0] else {**independientes, **por_lote}
+                for etapa, funcion in medidas.items():
+                    tiempos = _medir(funcion, repeticiones)
+                    resultado = {
+                        "etapa": etapa,
+                        "simbolos": n_simbolos,
+                        "historia": historia,
+                        "lote": lote if etapa in por_lote else None,
+                        "mediana_s": statistics.median(tiempos),
+                        "minimo_s": min(tiempos),
+                        "repeticiones": repeticiones
+                    }
+                    resultados.append(resultado)
+                    if mostrar:
+                        mostrar(f"{etapa:<24} {n_simbolos:>4} símbolos {historia:>4} "
+                                f"lote {str(resultado['lote'] or '-'):>5}: {resultado['mediana_s'] * 1000:10.2f} ms")
+    return resultados
+
+
+# Función para medir el optimizador como lo usa "Datos de Póliza" (un año de historia, tope de 30% por ETF):
+# frontera en frío y máximo Sharpe sobre esa frontera. Devuelve filas como las de ejecutar, con "presupuesto_s".
+def medir_optimizador(n_simbolos=SIMBOLOS_OPTIMIZADOR, repeticiones=REPETICIONES, semilla=SEMILLA):
+    precios = generar_precios(n_simbolos, HISTORIAS['1y'], semilla)
+    rendimientos = estadisticas.rendimientos_diarios(precios)
+    media = estadisticas.estadisticas_activos(rendimientos)["avg_annual_return"].to_numpy()
+    covarianza = estadisticas.estadisticas_portafolio(rendimientos, np.ones(n_simbolos) / n_simbolos)["covarianza"].to_numpy()
+    tope = max(0.3, 1 / n_simbolos)
+    frontera = optimizador.frontera_eficiente(media, covarianza, tope=tope)
+
+    medidas = {
+        "optimizador_frontera": lambda: optimizador.frontera_eficiente(media, covarianza, tope=tope),
+        "optimizador_maximo_sharpe": lambda: optimizador.maximo_sharpe(media, covarianza, tope, frontera=frontera),
+    }
+    resultados = []
+    for etapa, funcion in medidas.items():
+        tiempos = _medir(funcion, repeticiones)
+        resultados.append({
+            "etapa": etapa,
+            "simbolos": n_simbolos,
+            "historia": '1y',
+            "lote": None,
+            "mediana_s": statistics.median(tiempos),
+            "minimo_s": min(tiempos),
+            "repeticiones": repeticiones,
+            "presupuesto_s": PRESUPUESTO_OPTIMIZADOR_S[etapa]
+        })
+    return resultados
+
+
+# Identifica una medición para compararla con la línea base
+def _llave(resultado):
+    return resultado["etapa"], resultado["simbolos"], resultado["historia"], resultado["lote"]
+
+
+# Función para comparar unos resultados con una línea base; devuelve una fila por medición común
+# con la razón de tiempos mínimos (actual / base) y si se considera regresión
+def comparar(resultados, base, tolerancia=TOLERANCIA, diferencia_minima=DIFERENCIA_MINIMA_S):
+    base_por_llave = {_llave(r): r for r in base}
+    comparacion = []
+    for resultado in resultados:
+        anterior = base_por_llave.get(_llave(resultado))
+        if anterior is None or anterior["minimo_s"] <= 0:
+            continue
+        razon = resultado["minimo_s"] / anterior["minimo_s"]
+        comparacion.append({
+            "etapa": resultado["etapa"],
+            "simbolos": resultado["simbolos"],
+            "historia": resultado["historia"],
+            "lote": resultado["lote"],
+            "base_s": anterior["minimo_s"],
+            "actual_s": resultado["minimo_s"],
+            "razon": razon,
+            "regresion": razon > 1 + tolerancia and resultado["minimo_s"] - anterior["minimo_s"] > diferencia_minima
+        })
+    return comparacion
+
+
+# Uso: python benchmark_proyeccion.py --salida bench.json [--comparar base.json] [--rapido]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide las etapas del cálculo de Proyección con datos sintéticos.")
+    parser.add_argument("--simbolos", type=int, nargs="+", default=UNIVERSOS, help="Tamaños del universo")
+    parser.add_argument("--historias", nargs="+", default=HISTORIAS_DEFECTO, choices=list(HISTORIAS),
+                        help="Longitudes de historia")
+    parser.add_argument("--lotes", type=int, nargs="+", default=LOTES, help="Tamaños del lote de pesos")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES, help="Repeticiones de cada medición")
+    parser.add_argument("--semilla", type=int, default=SEMILLA, help="Semilla de los datos sintéticos")
+    parser.add_argument("--rapido", action="store_true", help="Corrida corta (ignora tamaños y repeticiones)")
+    parser.add_argument("--salida", default=None, help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", default=None, help="Archivo JSON de línea base con el cual comparar")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA,
+                        help="Aumento relativo permitido antes de marcar una regresión")
+    args = parser.parse_args(argv)
+
+    parametros = dict(RAPIDO) if args.rapido else {
+        "universos": args.simbolos, "historias": args.historias, "lotes": args.lotes, "repeticiones": args.repeticiones
+    }
+    resultados = ejecutar(semilla=args.semilla, **parametros)
+
+    codigo = 0
+    for resultado in medir_optimizador(repeticiones=parametros["repeticiones"], semilla=args.semilla):
+        resultados.append(resultado)
+        excedido = resultado["minimo_s"] > resultado["presupuesto_s"]
+        print(f"{resultado['etapa']:<24} {resultado['simbolos']:>4} símbolos: {resultado['minimo_s'] * 1000:10.2f} ms "
+              f"(presupuesto {resultado['presupuesto_s'] * 1000:.0f} ms){' EXCEDIDO' if excedido else ''}")
+        codigo = 1 if excedido else codigo
+    reporte = {
+        "metadatos": {
+            "fecha": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "plataforma": platform.platform(),
+            "procesador": platform.processor() or platform.machine(),
+            "semilla": args.semilla,
+            **parametros
+        },
+        "resultados": resultados
+    }
+
+    if args.comparar:
+        with open(args.comparar, 'r') as f:
+            base = json.load(f)["resultados"]
+        reporte["comparacion"] = comparar(resultados, base, args.tolerancia)
+        regresiones = [c for c in reporte["comparacion"] if c["regresion"]]
+        for c in regresiones:
+            print(f"REGRESIÓN {c['etapa']} ({c['simbolos']} símbolos, {c['historia']}, lote {c['lote']}): "
+                  f"{c['base_s'] * 1000:.2f} ms -> {c['actual_s'] * 1000:.2f} ms (x{c['razon']:.2f})")
+        print(f"{len(reporte['comparacion'])} mediciones comparadas, {len(regresiones)} regresiones")
+        codigo = 1 if regresiones else codigo
+
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(reporte, f, indent=4)
+    return codigo
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import pickle
+import threading
+import time
+from collections import Counter
+
+from cachetools import LRUCache
+
+import base_datos
+import trazas
+
+# Archivo SQLite compartido por todos los procesos de Streamlit (nivel en disco)
+RUTA_CACHE = "cache_resultados.db"
+
+# Presupuestos de memoria y disco (bytes serializados) y vigencia por defecto de cada resultado (segundos)
+MAX_BYTES_MEMORIA = 128 * 1024 * 1024
+MAX_BYTES_DISCO = 1024 * 1024 * 1024
+TTL_SEGUNDOS = 24 * 60 * 60
+
+SQL_CREAR = '''
+    CREATE TABLE IF NOT EXISTS resultados (
+        clave TEXT PRIMARY KEY,
+        valor BLOB NOT NULL,
+        tamano INTEGER NOT NULL,
+        expira REAL NOT NULL,
+        ultimo_acceso REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_resultados_ultimo_acceso ON resultados (ultimo_acceso);
+'''
+SQL_LEER = 'SELECT valor, expira FROM resultados WHERE clave = ?'
+SQL_TOCAR = 'UPDATE resultados SET ultimo_acceso = ? WHERE clave = ?'
+SQL_ESCRIBIR = '''
+    INSERT OR REPLACE INTO resultados (clave, valor, tamano, expira, ultimo_acceso) VALUES (?, ?, ?, ?, ?)
+'''
+SQL_BORRAR_VENCIDOS = 'DELETE FROM resultados WHERE expira <= ?'
+SQL_TAMANO_TOTAL = 'SELECT COALESCE(SUM(tamano), 0) FROM resultados'
+SQL_MENOS_USADOS = 'SELECT clave, tamano FROM resultados ORDER BY ultimo_acceso'
+SQL_BORRAR = 'DELETE FROM resultados WHERE clave = ?'
+
+# Nivel en memoria: (objeto, tamaño serializado, expiración); se expulsan los menos usados al exceder el presupuesto
+_memoria = LRUCache(maxsize=MAX_BYTES_MEMORIA, getsizeof=lambda entrada: entrada[1])
+_contadores = Counter()
+_lock = threading.Lock()
+_locks_claves = {}
+_preparadas = set()
+
+
+# Función para construir la clave canónica de un cálculo de portafolio: el mismo portafolio produce la misma
+# clave sin importar el orden de los símbolos o si los pesos vienen como 70 o 70.0
+def clave_canonica(tipo, simbolos, ponderaciones, periodo, version_datos, *extra):
+    contenido = {
+        "tipo": tipo,
+        "simbolos": sorted(simbolos),
+        "ponderaciones": sorted((s, round(float(p), 6)) for s, p in ponderaciones.items()),
+        "periodo": periodo,
+        "version_datos": version_datos,
+        "extra": [float(x) if isinstance(x, (int, float)) else x for x in extra]
+    }
+    return hashlib.sha256(json.dumps(contenido, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+# Crea la tabla del nivel en disco la primera vez que el proceso usa el archivo
+def _preparar(ruta):
+    if ruta in _preparadas:
+        return
+    with base_datos.conexion(ruta) as con:
+        con.executescript(SQL_CREAR)
+    _preparadas.add(ruta)
+
+
+# Función para buscar un resultado (memoria y luego disco); devuelve None si no está o ya venció
+def obtener(clave, ruta=RUTA_CACHE):
+    ahora = time.time()
+    with _lock:
+        entrada = _memoria.get(clave)
+        if entrada is not None and entrada[2] > ahora:
+            _contadores["aciertos_memoria"] += 1
+            return entrada[0]
+
+    _preparar(ruta)
+    with base_datos.conexion(ruta) as con:
+        fila = con.execute(SQL_LEER, (clave,)).fetchone()
+        if fila is not None and fila[1] > ahora:
+            with con:
+                con.execute(SQL_TOCAR, (ahora, clave))
+    try:
+        valor = pickle.loads(fila[0]) if fila is not None and fila[1] > ahora else None
+    except Exception:
+        # Resultado escrito con un formato anterior: se trata como ausente
+        valor = None
+    if valor is None:
+        with _lock:
+            _contadores["fallos"] += 1
+        return None
+
+    with _lock:
+        _memoria[clave] = (valor, len(fila[0]), fila[1])
+        _contadores["aciertos_disco"] += 1
+    return valor
+
+
+# Expulsa del disco los resultados vencidos y, si se excede el presupuesto, los menos usados
+def _expulsar(con, ahora, max_bytes):
+    vencidos = con.execute(SQL_BORRAR_VENCIDOS, (ahora,)).rowcount
+    exceso = con.execute(SQL_TAMANO_TOTAL).fetchone()[0] - max_bytes
+    expulsados = []
+    if exceso > 0:
+        for clave, tamano in con.execute(SQL_MENOS_USADOS):
+            expulsados.append((clave,))
+            exceso -= tamano
+            if exceso <= 0:
+                break
+        con.executemany(SQL_BORRAR, expulsados)
+    return vencidos + len(expulsados)
+
+
+# Función para guardar un resultado en ambos niveles
+def guardar(clave, valor, ttl=TTL_SEGUNDOS, ruta=RUTA_CACHE, max_bytes_disco=MAX_BYTES_DISCO):
+    datos = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+    ahora = time.time()
+    with _lock:
+        _memoria[clave] = (valor, len(datos), ahora + ttl)
+
+    _preparar(ruta)
+    with base_datos.conexion(ruta) as con:
+        with con:
+            con.execute(SQL_ESCRIBIR, (clave, datos, len(datos), ahora + ttl, ahora))
+            expulsados = _expulsar(con, ahora, max_bytes_disco)
+    with _lock:
+        _contadores["escrituras"] += 1
+        _contadores["expulsiones_disco"] += expulsados
+
+
+# Función para obtener un resultado o calcularlo y guardarlo. Dentro del proceso, una sola
+# llamada calcula cada clave a la vez; las demás esperan y reciben el mismo resultado.
+def obtener_o_calcular(clave, calcular, ttl=TTL_SEGUNDOS, ruta=RUTA_CACHE):
+    valor = obtener(clave, ruta)
+    if valor is not None:
+        return valor
+
+    with _lock:
+        lock_clave = _locks_claves.setdefault(clave, threading.Lock())
+    with lock_clave:
+        with _lock:
+            entrada = _memoria.get(clave)
+        if entrada is not None and entrada[2] > time.time():
+            valor = entrada[0]
+        else:
+            valor = calcular()
+            guardar(clave, valor, ttl, ruta)
+    with _lock:
+        _locks_claves.pop(clave, None)
+    return valor
+
+
+# Función para consultar los contadores de aciertos, fallos, escrituras y expulsiones del proceso
+def contadores():
+    with _lock:
+        resultado = dict(_contadores)
+        resultado["bytes_memoria"] = int(_memoria.currsize)
+    total = resultado.get("aciertos_memoria", 0) + resultado.get("aciertos_disco", 0) + resultado.get("fallos", 0)
+    resultado["tasa_aciertos"] = 1 - resultado.get("fallos", 0) / total if total else 0.0
+    return resultado
+
+
+# Función para vaciar el nivel en memoria y los contadores (el nivel en disco se vacía borrando el archivo)
+def limpiar():
+    with _lock:
+        _memoria.clear()
+        _contadores.clear()
+
+
+trazas.registrar_fuente("cache_resultados", contadores)
@@ -0,0 +1,97 @@
+import bisect
+import json
+import os
+import threading
+import unicodedata
+
+# Catálogo de ETFs verificados (lo genera ETFs.py) y descripciones de cada ETF
+ARCHIVO_VALIDOS = 'valid_etfs.json'
+ARCHIVO_DESCRIPCIONES = 'descripciones_etfs.json'
+
+# Resultados máximos de una búsqueda por prefijo
+LIMITE_BUSQUEDA = 50
+
+_cargados = {}
+_lock = threading.Lock()
+
+
+# Función para normalizar un texto de búsqueda (minúsculas y sin acentos)
+def normalizar(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto.lower()) if not unicodedata.combining(c))
+
+
+# Función para leer una lista de ETFs desde un archivo JSON
+def leer_lista(archivo):
+    with open(archivo, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Catálogo de ETFs con índices por símbolo y por etiqueta ("SÍMBOLO: Nombre") y búsqueda por prefijo.
+# Cada ETF es un dict con symbol, name, label y description (vacía si no hay descripción).
+class Catalogo:
+
+    def __init__(self, validos, descripciones=()):
+        textos = {etf["symbol"]: etf.get("description", "") for etf in descripciones}
+        self.etfs = [
+            {"symbol": etf["symbol"], "name": etf["name"], "label": f"{etf['symbol']}: {etf['name']}",
+             "description": etf.get("description") or textos.get(etf["symbol"], "")}
+            for etf in validos
+        ]
+        self.por_simbolo = {etf["symbol"]: etf for etf in self.etfs}
+        self.por_etiqueta = {etf["label"]: etf for etf in self.etfs}
+        self.posicion = {etf["symbol"]: i for i, etf in enumerate(self.etfs)}
+        self.etiquetas = [etf["label"] for etf in self.etfs]
+        self.simbolos = [etf["symbol"] for etf in self.etfs]
+
+        # Índice ordenado de prefijos: símbolo, nombre completo y cada palabra del nombre
+        entradas = set()
+        for i, etf in enumerate(self.etfs):
+            nombre = normalizar(etf["name"])
+            entradas.add((normalizar(etf["symbol"]), i))
+            entradas.add((nombre, i))
+            entradas.update((palabra, i) for palabra in nombre.split())
+        entradas = sorted(entradas)
+        self._claves = [clave for clave, _ in entradas]
+        self._posiciones = [i for _, i in entradas]
+
+    def __len__(self):
+        return len(self.etfs)
+
+    # Función para obtener los ETFs de unos símbolos en el orden del catálogo (se ignoran los que no están)
+    def por_simbolos(self, simbolos):
+        return [self.etfs[i] for i in sorted(self.posicion[s] for s in set(simbolos) if s in self.posicion)]
+
+    # Función para obtener los ETFs de unas etiquetas en el orden del catálogo
+    def seleccion(self, etiquetas):
+        return self.por_simbolos(self.por_etiqueta[e]["symbol"] for e in etiquetas if e in self.por_etiqueta)
+
+    # Función para buscar ETFs cuyo símbolo, nombre o alguna palabra del nombre empiece con el prefijo
+    def buscar(self, prefijo, limite=LIMITE_BUSQUEDA):
+        prefijo = normalizar(prefijo.strip())
+        if not prefijo:
+            return self.etfs[:limite]
+        encontrados = {}
+        inicio = bisect.bisect_left(self._claves, prefijo)
+        for clave, i in zip(self._claves[inicio:], self._posiciones[inicio:]):
+            if not clave.startswith(prefijo) or len(encontrados) >= limite:
+                break
+            encontrados.setdefault(i, None)
+        return [self.etfs[i] for i in sorted(encontrados)]
+
+
+# Función para obtener el catálogo compartido; solo se vuelve a leer si cambia la fecha de modificación
+# de alguno de los archivos (el de descripciones es opcional)
+def obtener(archivo_validos=ARCHIVO_VALIDOS, archivo_descripciones=ARCHIVO_DESCRIPCIONES):
+    version = (os.stat(archivo_validos).st_mtime_ns,
+               os.stat(archivo_descripciones).st_mtime_ns if os.path.exists(archivo_descripciones) else None)
+    clave = (archivo_validos, archivo_descripciones)
+    with _lock:
+        cargado = _cargados.get(clave)
+        if cargado is not None and cargado[0] == version:
+            return cargado[1]
+
+    descripciones = leer_lista(archivo_descripciones) if version[1] is not None else []
+    catalogo = Catalogo(leer_lista(archivo_validos), descripciones)
+    with _lock:
+        _cargados[clave] = (version, catalogo)
+    return catalogo
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import threading
+
+import pandas as pd
+from cachetools import TTLCache
+
+import almacen_precios
+import trazas
+
+# Periodos de análisis soportados, ordenados del más corto al más largo
+PERIODOS = ['1mo', '3mo', '6mo', '1y', '5y']
+
+DURACION_PERIODOS = {
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '5y': pd.DateOffset(years=5),
+}
+
+# Tiempo de vida de cada entrada (segundos) y presupuesto de memoria del caché (bytes)
+TTL_SEGUNDOS = 15 * 60
+MAX_BYTES_CACHE = 256 * 1024 * 1024
+
+# Tiempo de vida (segundos) y número máximo de los símbolos sin datos que se recuerdan, para no volver a pedirlos
+# al proveedor en cada ejecución del script
+TTL_SIN_DATOS_SEGUNDOS = 2 * 60
+MAX_SIN_DATOS = 10_000
+
+
+# Tamaño en memoria de un DataFrame, usado para la expulsión por tamaño
+def _tamano_frame(frame):
+    return int(frame.memory_usage(deep=True).sum())
+
+
+# Caché compartido entre todas las sesiones del proceso: (símbolo, periodo) -> DataFrame OHLCV
+_cache = TTLCache(maxsize=MAX_BYTES_CACHE, ttl=TTL_SEGUNDOS, getsizeof=_tamano_frame)
+# Revisión del almacén de la que salió lo que hay en caché de cada símbolo
+_revisiones = {}
+# Caché negativo: símbolos que no tenían historia ni la devolvió el proveedor
+_sin_datos = TTLCache(maxsize=MAX_SIN_DATOS, ttl=TTL_SIN_DATOS_SEGUNDOS)
+_lock = threading.Lock()
+
+
+# Función para obtener el periodo más amplio de una lista de periodos
+def periodo_mas_amplio(periodos):
+    return max(periodos, key=PERIODOS.index)
+
+
+# Función para recortar un DataFrame con índice de fechas al periodo indicado
+def recortar_periodo(frame, periodo):
+    if frame.empty:
+        return frame
+    inicio = frame.index.max() - DURACION_PERIODOS[periodo]
+    return frame.loc[frame.index >= inicio]
+
+
+# Busca en el caché la entrada de un símbolo que cubra al menos el periodo pedido
+def _buscar_en_cache(simbolo, periodo):
+    for candidato in PERIODOS[PERIODOS.index(periodo):]:
+        frame = _cache.get((simbolo, candidato))
+        if frame is not None:
+            return frame
+    return None
+
+
+# Función para cargar desde el almacén local todos los símbolos que no estén en caché
+def precargar(simbolos, periodo):
+    simbolos = list(dict.fromkeys(simbolos))
+    with _lock:
+        faltantes = [s for s in simbolos if _buscar_en_cache(s, periodo) is None and s not in _sin_datos]
+    trazas.contar("cache_mercado.aciertos", len(simbolos) - len(faltantes))
+    trazas.contar("cache_mercado.fallos", len(faltantes))
+    if not faltantes:
+        return
+
+    # La revisión se toma antes de leer: si el almacén cambia en medio, la siguiente versión lo detecta
+    revisiones = almacen_precios.revisiones(faltantes)
+    with trazas.tramo("almacen.leer", simbolos=len(faltantes)):
+        frames = almacen_precios.leer(faltantes)
+    sin_historia = [s for s in faltantes if s not in frames]
+    if sin_historia:
+        # Símbolos que aún no están en el almacén: se descarga su historia una sola vez
+        almacen_precios.actualizar(sin_historia)
+        revisiones.update(almacen_precios.revisiones(sin_historia))
+        frames.update(almacen_precios.leer(sin_historia))
+
+    with _lock:
+        for simbolo, frame in frames.items():
+            _cache[(simbolo, periodo)] = recortar_periodo(frame, periodo)
+            _revisiones[simbolo] = revisiones.get(simbolo)
+        for simbolo in faltantes:
+            if simbolo not in frames:
+                _sin_datos[simbolo] = True
+
+
+# Función para obtener una matriz de precios (fechas x símbolos) recortada al periodo pedido
+def obtener_precios(simbolos, periodo, campo='Adj Close'):
+    simbolos = list(dict.fromkeys(simbolos))
+    precargar(simbolos, periodo)
+
+    columnas = {}
+    with _lock:
+        for simbolo in simbolos:
+            frame = _buscar_en_cache(simbolo, periodo)
+            if frame is not None and campo in frame.columns:
+                columnas[simbolo] = recortar_periodo(frame, periodo)[campo]
+
+    return pd.DataFrame(columnas, columns=simbolos)
+
+
+# Función para obtener la versión de los datos de mercado de unos símbolos (la revisión de cada uno en caché)
+def version_datos(simbolos, periodo):
+    precargar(simbolos, periodo)
+    with _lock:
+        revisiones = {s: _revisiones[s] for s in simbolos if _revisiones.get(s) and _buscar_en_cache(s, periodo) is not None}
+    return _resumir_revisiones(revisiones)
+
+
+# Función para obtener la versión de los datos en el almacén sin cargar los precios (solo lista los archivos).
+# La versión resume la revisión de cada símbolo (su última fecha y cada reescritura de sus barras), así que cambia
+# en cuanto cualquiera de ellos se actualiza; de paso descarta del caché los símbolos cuya revisión quedó atrás.
+def version_almacen(simbolos):
+    revisiones = almacen_precios.revisiones(simbolos)
+    _descartar_desactualizados(revisiones)
+    return _resumir_revisiones(revisiones)
+
+
+# Resume {símbolo: revisión} en una versión corta e independiente del orden de los símbolos
+def _resumir_revisiones(revisiones):
+    if not revisiones:
+        return ''
+    return hashlib.sha256(json.dumps(sorted(revisiones.items())).encode()).hexdigest()[:16]
+
+
+# Quita del caché los símbolos cargados de una revisión distinta de la vigente en el almacén
+def _descartar_desactualizados(revisiones):
+    with _lock:
+        for simbolo in revisiones:
+            # Un símbolo sin datos que ya tiene historia en el almacén vuelve a cargarse
+            _sin_datos.pop(simbolo, None)
+        desactualizados = {s for s, revision in revisiones.items() if s in _revisiones and _revisiones[s] != revision}
+        for clave in [c for c in _cache.keys() if c[0] in desactualizados]:
+            _cache.pop(clave, None)
+        for simbolo in desactualizados:
+            del _revisiones[simbolo]
+
+
+# Función para vaciar el caché, completo o solo de unos símbolos (útil tras una actualización de datos)
+def limpiar_cache(simbolos=None):
+    with _lock:
+        if simbolos is None:
+            _cache.clear()
+            _revisiones.clear()
+            _sin_datos.clear()
+            return
+        simbolos = set(simbolos)
+        for clave in [c for c in _cache.keys() if c[0] in simbolos]:
+            _cache.pop(clave, None)
+        for simbolo in simbolos:
+            _revisiones.pop(simbolo, None)
+            _sin_datos.pop(simbolo, None)
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+import almacen_precios
+import portafolios_modelo
+import proveedores
+
+# Descargas simultáneas por defecto
+CONCURRENCIA = 4
+
+# Manifiesto de la corrida; el prefijo "_" hace que el dataset de Parquet lo ignore
+ARCHIVO_MANIFIESTO = os.path.join(almacen_precios.RUTA_ALMACEN, "_manifiesto_descarga.json")
+
+# Horas durante las que una corrida interrumpida o con errores puede reanudarse; después se empieza de cero
+HORAS_REANUDACION = 12
+
+
+# Función para cargar el manifiesto de la corrida pendiente con los mismos parámetros, para reanudarla.
+# Una corrida que terminó borra su manifiesto, así que la siguiente siempre vuelve a pedir todos los símbolos;
+# si no hay corrida pendiente (o es de otros parámetros o demasiado vieja) se empieza una nueva.
+def cargar_manifiesto(parametros, archivo=ARCHIVO_MANIFIESTO, reanudar=True, ahora=None):
+    ahora = ahora or datetime.now(timezone.utc)
+    try:
+        with open(archivo, 'r') as f:
+            manifiesto = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifiesto = None
+    vigente = reanudar and manifiesto and manifiesto.get("parametros") == parametros and manifiesto.get("iniciada") and \
+        ahora - datetime.fromisoformat(manifiesto["iniciada"]) < timedelta(hours=HORAS_REANUDACION)
+    if not vigente:
+        manifiesto = {"id_corrida": uuid.uuid4().hex, "parametros": parametros, "iniciada": ahora.isoformat(),
+                      "simbolos": {}}
+    return manifiesto
+
+
+# Función para cerrar una corrida: sin errores se borra su manifiesto y ya no se reanuda
+def terminar_corrida(manifiesto, archivo=ARCHIVO_MANIFIESTO):
+    if all(estado.get("estado") == "completo" for estado in manifiesto["simbolos"].values()):
+        try:
+            os.remove(archivo)
+        except FileNotFoundError:
+            pass
+
+
+# Función para guardar el manifiesto de forma atómica
+def guardar_manifiesto(manifiesto, archivo=ARCHIVO_MANIFIESTO):
+    os.makedirs(os.path.dirname(archivo) or ".", exist_ok=True)
+    temporal = f"{archivo}.tmp"
+    with open(temporal, 'w') as f:
+        json.dump(manifiesto, f, indent=4)
+    os.replace(temporal, archivo)
+
+
+# Descarga un solo símbolo al almacén y devuelve las filas nuevas y el tiempo que tomó.
+# jitter (segundos) agrega una espera aleatoria previa para no saturar al proveedor.
+def _descargar_simbolo(symbol, fecha_inicio, fecha_fin, ruta, jitter=0.0):
+    if jitter:
+        time.sleep(random.uniform(0, jitter))
+    inicio = time.perf_counter()
+    filas = almacen_precios.actualizar([symbol], ruta=ruta, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)[symbol]
+    return filas, time.perf_counter() - inicio
+
+
+# Función para descargar el catálogo completo en paralelo.
+# Es un generador: produce un evento de progreso por símbolo en el hilo que lo consume,
+# de modo que la interfaz (Streamlit o consola) puede mostrarlo en vivo.
+# Reanuda la corrida pendiente con los mismos parámetros, si la hay; nueva_corrida=True la descarta.
+def descargar_catalogo(etfs, fecha_inicio=almacen_precios.FECHA_INICIO, fecha_fin=None, concurrencia=CONCURRENCIA,
+                       ruta=almacen_precios.RUTA_ALMACEN, archivo_manifiesto=ARCHIVO_MANIFIESTO, jitter=0.0,
+                       nueva_corrida=False):
+    parametros = {"inicio": fecha_inicio, "fin": fecha_fin, "ruta": ruta}
+    manifiesto = cargar_manifiesto(parametros, archivo_manifiesto, reanudar=not nueva_corrida)
+    lock = threading.Lock()
+
+    simbolos = [etf["symbol"] for etf in etfs]
+    pendientes = [s for s in simbolos if manifiesto["simbolos"].get(s, {}).get("estado") != "completo"]
+    total = len(simbolos)
+    completados = total - len(pendientes)
+    filas_totales = 0
+    inicio = time.perf_counter()
+
+    # Sin bloque with: si el consumidor abandona el generador (una nueva ejecución de Streamlit lo cierra), la
+    # salida no espera a las descargas en cola; se cancelan y las que ya empezaron terminan en segundo plano
+    executor = ThreadPoolExecutor(max_workers=concurrencia)
+    try:
+        futuros = {executor.submit(_descargar_simbolo, s, fecha_inicio, fecha_fin, ruta, jitter): s for s in pendientes}
+        for futuro in as_completed(futuros):
+            symbol = futuros[futuro]
+            evento = {"simbolo": symbol}
+            try:
+                filas, segundos = futuro.result()
+                estado = {"estado": "completo", "filas": filas,
+                          "terminado": datetime.now(timezone.utc).isoformat()}
+                filas_totales += filas
+                evento.update(estado="completo", filas=filas, segundos=segundos)
+            except Exception as e:
+                estado = {"estado": "error", "error": str(e)}
+                evento.update(estado="error", error=str(e))
+
+            with lock:
+                manifiesto["simbolos"][symbol] = estado
+                guardar_manifiesto(manifiesto, archivo_manifiesto)
+
+            completados += 1
+            transcurrido = time.perf_counter() - inicio
+            evento.update(completados=completados, total=total,
+                          simbolos_por_segundo=completados / transcurrido if transcurrido else 0.0,
+                          filas_por_segundo=filas_totales / transcurrido if transcurrido else 0.0)
+            yield evento
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    terminar_corrida(manifiesto, archivo_manifiesto)
+
+
+# Uso sin navegador (tarea nocturna): python descarga_masiva.py --concurrencia 8
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Descarga o actualiza la historia de precios del catálogo de ETFs.")
+    parser.add_argument("--catalogo", default="valid_etfs.json", help="Archivo JSON con los ETFs a descargar")
+    parser.add_argument("--inicio", default=almacen_precios.FECHA_INICIO, help="Fecha de inicio (AAAA-MM-DD)")
+    parser.add_argument("--fin", default=None, help="Fecha de fin (AAAA-MM-DD); por defecto hoy")
+    parser.add_argument("--concurrencia", type=int, default=CONCURRENCIA, help="Descargas simultáneas")
+    parser.add_argument("--nueva", action="store_true", help="No reanudar la corrida pendiente; descargar todo")
+    parser.add_argument("--sin-portafolios", action="store_true", help="No recalcular los portafolios modelo al terminar")
+    parser.add_argument("--proveedor", choices=proveedores.MODOS, default=None,
+                        help="Proveedor de datos (por defecto, el de PROVEEDOR_DATOS o yahoo)")
+    parser.add_argument("--grabaciones", default=proveedores.RUTA_GRABACIONES,
+                        help="Archivo de grabaciones para los modos grabar y reproducir")
+    args = parser.parse_args(argv)
+
+    if args.proveedor:
+        proveedores.configurar(proveedores.crear(args.proveedor, args.grabaciones))
+
+    with open(args.catalogo, 'r') as f:
+        etfs = json.load(f)
+
+    errores = 0
+    for evento in descargar_catalogo(etfs, args.inicio, args.fin, args.concurrencia, nueva_corrida=args.nueva):
+        if evento["estado"] == "completo":
+            detalle = f"{evento['filas']} filas nuevas en {evento['segundos']:.1f}s"
+        else:
+            errores += 1
+            detalle = f"error: {evento['error']}"
+        print(f"[{evento['completados']}/{evento['total']}] {evento['simbolo']}: {detalle} "
+              f"({evento['simbolos_por_segundo']:.2f} símbolos/s)")
+
+    print("¡Descarga completada!" if not errores else f"Descarga terminada con {errores} errores; vuelve a ejecutar para reanudar.")
+
+    # Recalcular los portafolios modelo con los precios recién actualizados
+    if not args.sin_portafolios:
+        portafolios_modelo.recalcular()
+        print("Portafolios modelo actualizados.")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
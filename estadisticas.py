@@ -0,0 +1,94 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Días hábiles en un año, usados para anualizar
+DIAS_HABILES = 252
+
+
+# Función para calcular los rendimientos diarios de una matriz de precios (fechas x símbolos)
+def rendimientos_diarios(precios):
+    return precios.pct_change(fill_method=None).iloc[1:]
+
+
+# Función para convertir las ponderaciones en % ({símbolo: peso}) a un vector en el orden de los símbolos
+def vector_pesos(ponderaciones, simbolos):
+    return np.array([ponderaciones.get(s, 0) for s in simbolos], dtype=float) / 100
+
+
+# Matriz de covarianza anualizada sobre las fechas en que todos los símbolos con datos tienen rendimiento
+def _covarianza(matriz):
+    n = matriz.shape[1]
+    covarianza = np.zeros((n, n))
+    con_datos = ~np.isnan(matriz).all(axis=0)
+    completas = matriz[~np.isnan(matriz[:, con_datos]).any(axis=1)][:, con_datos]
+    if len(completas) > 1:
+        centradas = completas - completas.mean(axis=0)
+        covarianza[np.ix_(con_datos, con_datos)] = centradas.T @ centradas / (len(completas) - 1) * DIAS_HABILES
+    return covarianza
+
+
+# Función para convertir una matriz de covarianza en matriz de correlación
+def correlacion_desde_covarianza(covarianza):
+    desviaciones = np.sqrt(np.diag(covarianza))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlacion = covarianza / np.outer(desviaciones, desviaciones)
+    return np.nan_to_num(correlacion)
+
+
+# Función para calcular rendimiento, volatilidad y Sharpe anuales de cada símbolo en una sola pasada
+def estadisticas_activos(rendimientos):
+    matriz = rendimientos.to_numpy(dtype=float)
+    with warnings.catch_warnings():
+        # Columnas sin datos producen NaN, que se convierten a 0
+        warnings.simplefilter('ignore', RuntimeWarning)
+        avg_annual_return = np.nanmean(matriz, axis=0) * DIAS_HABILES
+        annual_volatility = np.nanstd(matriz, axis=0, ddof=1) * np.sqrt(DIAS_HABILES)
+    avg_annual_return = np.nan_to_num(avg_annual_return)
+    annual_volatility = np.nan_to_num(annual_volatility)
+    sharpe_ratio = np.divide(avg_annual_return, annual_volatility,
+                             out=np.zeros_like(avg_annual_return), where=annual_volatility != 0)
+    return pd.DataFrame({
+        "avg_annual_return": avg_annual_return,
+        "annual_volatility": annual_volatility,
+        "sharpe_ratio": sharpe_ratio
+    }, index=rendimientos.columns)
+
+
+# Función para calcular las estadísticas de uno o muchos portafolios a la vez.
+# pesos puede ser un vector (n,) o una matriz (k, n) con k portafolios candidatos.
+def estadisticas_portafolio(rendimientos, pesos):
+    matriz = rendimientos.to_numpy(dtype=float)
+    pesos = np.asarray(pesos, dtype=float)
+    un_portafolio = pesos.ndim == 1
+    pesos = np.atleast_2d(pesos)
+
+    with warnings.catch_warnings():
+        # Columnas sin datos producen NaN, que se convierten a 0
+        warnings.simplefilter('ignore', RuntimeWarning)
+        rendimientos_anuales = np.nan_to_num(np.nanmean(matriz, axis=0)) * DIAS_HABILES
+    covarianza = _covarianza(matriz)
+
+    rendimiento = pesos @ rendimientos_anuales
+    volatilidad = np.sqrt(np.maximum(((pesos @ covarianza) * pesos).sum(axis=1), 0))
+    sharpe = np.divide(rendimiento, volatilidad, out=np.zeros_like(rendimiento), where=volatilidad != 0)
+
+    if un_portafolio:
+        rendimiento, volatilidad, sharpe = rendimiento[0], volatilidad[0], sharpe[0]
+
+    simbolos = rendimientos.columns
+    return {
+        "rendimiento": rendimiento,
+        "volatilidad": volatilidad,
+        "sharpe": sharpe,
+        "covarianza": pd.DataFrame(covarianza, index=simbolos, columns=simbolos),
+        "correlacion": pd.DataFrame(correlacion_desde_covarianza(covarianza), index=simbolos, columns=simbolos)
+    }
+
+
+# Función para calcular la matriz de correlación de una matriz de rendimientos
+def matriz_correlacion(rendimientos):
+    covarianza = _covarianza(rendimientos.to_numpy(dtype=float))
+    simbolos = rendimientos.columns
+    return pd.DataFrame(correlacion_desde_covarianza(covarianza), index=simbolos, columns=simbolos)
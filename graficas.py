@@ -0,0 +1,126 @@
+import io
+import threading
+
+import seaborn as sns
+from cachetools import LRUCache
+from matplotlib.figure import Figure
+
+import trazas
+
+# Presupuesto de memoria para las imágenes ya renderizadas (bytes) y resolución de salida
+MAX_BYTES_CACHE = 64 * 1024 * 1024
+DPI = 100
+
+# Imágenes PNG compartidas entre sesiones; se expulsan las menos usadas al exceder el presupuesto
+_cache = LRUCache(maxsize=MAX_BYTES_CACHE, getsizeof=len)
+_lock = threading.Lock()
+
+
+# Función para construir la clave de una gráfica a partir de todo lo que define su contenido
+def clave_grafica(tipo, simbolos, ponderaciones, periodo, version_datos, *extra):
+    return (tipo, tuple(simbolos), tuple(sorted(ponderaciones.items())), periodo, version_datos) + extra
+
+
+# Función para convertir una figura en PNG
+def a_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=DPI, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+# Función para obtener el PNG de una gráfica; solo se renderiza si no está en caché
+def grafica_png(clave, construir):
+    with _lock:
+        png = _cache.get(clave)
+    trazas.contar("graficas.aciertos" if png is not None else "graficas.fallos")
+    if png is None:
+        with trazas.tramo("graficas.render"):
+            png = a_png(construir())
+        with _lock:
+            _cache[clave] = png
+    return png
+
+
+# Gráfica del abanico de proyección Monte Carlo
+def figura_proyeccion(simulacion):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    percentiles = simulacion["percentiles"]
+    ax.fill_between(simulacion["anios"], percentiles[5], percentiles[95], color='#002f6c', alpha=0.15, label="Percentiles 5-95")
+    ax.fill_between(simulacion["anios"], percentiles[25], percentiles[75], color='#002f6c', alpha=0.3, label="Percentiles 25-75")
+    ax.plot(simulacion["anios"], percentiles[50], color='#002f6c', label="Mediana")
+    ax.set_title("Proyección del Valor del Portafolio")
+    ax.set_xlabel("Año")
+    ax.set_ylabel("Valor del Portafolio (USD)")
+    ax.legend()
+    ax.grid(alpha=0.3)
+    return fig
+
+
+# Heatmap de la matriz de correlación
+def figura_correlacion(matriz_correlacion):
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    sns.heatmap(matriz_correlacion, annot=True, cmap="coolwarm", ax=ax, fmt=".2f", linewidths=0.5)
+    ax.set_title("Matriz de Correlación entre ETFs")
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.tick_params(axis='y', labelrotation=0)
+    for etiqueta in ax.get_xticklabels():
+        etiqueta.set_horizontalalignment('right')
+    return fig
+
+
+# Gráfica de puntos de riesgo vs rendimiento, incluyendo el portafolio total
+def figura_riesgo_rendimiento(estadisticas_etfs, rendimiento_portafolio, volatilidad_portafolio):
+    rendimientos = list(estadisticas_etfs["avg_annual_return"] * 100) + [rendimiento_portafolio * 100]
+    volatilidades = list(estadisticas_etfs["annual_volatility"] * 100) + [volatilidad_portafolio * 100]
+    etfs = list(estadisticas_etfs.index) + ["Portafolio Total"]
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.scatter(volatilidades, rendimientos, color='blue', s=100)
+    for i, etf in enumerate(etfs):
+        ax.text(volatilidades[i], rendimientos[i], etf, fontsize=9, ha='right')
+    ax.set_title("Gráfica de Riesgo vs Rendimiento")
+    ax.set_xlabel("Volatilidad Anual (%)")
+    ax.set_ylabel("Rendimiento Promedio Anual (%)")
+    ax.grid(alpha=0.3)
+    return fig
+
+
+# Gráfica de rendimientos acumulados de cada ETF
+def figura_rendimientos_acumulados(rendimientos_acumulados):
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    for ticker in rendimientos_acumulados.columns:
+        ax.plot(rendimientos_acumulados.index, rendimientos_acumulados[ticker], label=ticker)
+    ax.set_title("Rendimientos Acumulados de los ETFs Seleccionados", fontsize=14)
+    ax.set_xlabel("Fecha", fontsize=12)
+    ax.set_ylabel("Rendimiento Acumulado", fontsize=12)
+    ax.legend(title="ETFs", fontsize=10)
+    ax.grid(alpha=0.3)
+    return fig
+
+
+# Función para obtener las gráficas de una proyección (proyeccion.ResultadoProyeccion) como {tipo: (clave, construir)},
+# para renderizarlas por adelantado en un trabajo y luego servirlas desde el caché
+def graficas_proyeccion(resultado):
+    clave = (resultado.simbolos, resultado.ponderaciones, resultado.periodo, resultado.version_datos)
+    return {
+        "proyeccion": (
+            clave_grafica("proyeccion", *clave, resultado.inversion_inicial, resultado.plazo_inversion),
+            lambda: figura_proyeccion(resultado.simulacion)
+        ),
+        "correlacion": (
+            clave_grafica("correlacion", *clave),
+            lambda: figura_correlacion(resultado.matriz_correlacion)
+        ),
+        "riesgo_rendimiento": (
+            clave_grafica("riesgo_rendimiento", *clave),
+            lambda: figura_riesgo_rendimiento(resultado.estadisticas_etfs, resultado.rendimiento, resultado.volatilidad)
+        ),
+        "rendimientos_acumulados": (
+            clave_grafica("rendimientos_acumulados", *clave),
+            lambda: figura_rendimientos_acumulados(resultado.rendimientos_acumulados)
+        ),
+    }
@@ -1,7 +1,8 @@
 import streamlit as st
-import yfinance as yf
 import os
 
+import proveedores
+
 # Función para descargar datos históricos de los ETFs
 def download_etf_data(etf, start_date, end_date):
     symbol = etf['symbol']
@@ -11,7 +12,7 @@ def download_etf_data(etf, start_date, end_date):
     st.write(f"Descargando datos de {name} ({symbol}) - {description}...")
     
     # Descargar datos históricos
-    etf_data = yf.download(symbol, start=start_date, end=end_date)
+    etf_data = proveedores.obtener().descargar(symbol, start=start_date, end=end_date)
     
     # Crear directorio para guardar los archivos si no existe
     if not os.path.exists("etf_data"):
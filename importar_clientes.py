@@ -0,0 +1,121 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import base_datos
+import seguridad
+
+# Filas por transacción
+TAMANO_LOTE = 10_000
+
+# Prefijos de un hash bcrypt; esas contraseñas se importan tal cual
+PREFIJOS_BCRYPT = ('$2a$', '$2b$', '$2y$')
+
+
+# Lee el archivo de entrada por lotes, sin cargarlo completo en memoria
+def _leer_lotes(archivo, tamano_lote):
+    if archivo.endswith('.parquet'):
+        for lote in pq.ParquetFile(archivo).iter_batches(batch_size=tamano_lote):
+            yield lote.to_pandas()
+    else:
+        # Las columnas de usuario se leen como texto tal cual: sin inferir números ("007" no se vuelve 7 ni
+        # "1234" se vuelve "1234.0") y sin convertir vacíos en NaN; solo los datos de cliente aceptan vacíos como nulos
+        yield from pd.read_csv(archivo, chunksize=tamano_lote,
+                               dtype={c: str for c in base_datos.COLUMNAS_USUARIO}, keep_default_na=False,
+                               na_values={c: ['', 'NA', 'NaN', 'nan', 'NULL', 'null'] for c in base_datos.COLUMNAS_CLIENTE})
+
+
+# Convierte un lote de pandas en dicts con None en lugar de NaN
+def _filas(lote):
+    columnas = [c for c in base_datos.COLUMNAS_USUARIO + base_datos.COLUMNAS_CLIENTE if c in lote.columns]
+    lote = lote[columnas].astype(object).where(lote[columnas].notna(), None)
+    return lote.to_dict('records')
+
+
+# Contraseña de una fila, o None si falta o está vacía
+def _password(valor):
+    if valor is None:
+        return None
+    valor = str(valor)
+    return valor if valor.strip() else None
+
+
+# Genera el hash de una contraseña, o la deja igual si ya es un hash bcrypt (None si la fila no trae contraseña)
+def _hashear(password, costo):
+    if password is None:
+        return None
+    if password.startswith(PREFIJOS_BCRYPT):
+        return password
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=costo)).decode('utf-8')
+
+
+# Función para importar un archivo CSV o Parquet con usuarios y datos de cliente (inserta o actualiza por email).
+# Las contraseñas en texto plano se hashean en paralelo; bcrypt libera el GIL, así que los hilos usan todos los núcleos.
+# Una fila sin email se descarta; una sin contraseña conserva la del usuario existente y no crea usuarios nuevos.
+def importar(archivo, ruta=base_datos.RUTA_BD, tamano_lote=TAMANO_LOTE, costo=None, hilos=None):
+    base_datos.migrar(ruta)
+    costo = costo or seguridad.costo_actual()
+    total = 0
+    with ThreadPoolExecutor(max_workers=hilos or os.cpu_count() or 1) as executor:
+        for lote in _leer_lotes(archivo, tamano_lote):
+            filas = [f for f in _filas(lote) if f.get('email') is not None and str(f['email']).strip()]
+            hashes = executor.map(_hashear, [_password(f.get('password')) for f in filas], [costo] * len(filas),
+                                  chunksize=256)
+            for fila, password_hash in zip(filas, hashes):
+                fila['email'] = str(fila['email']).strip()
+                fila['password'] = password_hash
+            total += base_datos.importar_lote(filas, ruta)
+    return total
+
+
+# Función para exportar usuarios y datos de cliente a CSV o Parquet por lotes
+def exportar(archivo, ruta=base_datos.RUTA_BD, tamano_lote=TAMANO_LOTE):
+    base_datos.migrar(ruta)
+    columnas = base_datos.COLUMNAS_USUARIO + base_datos.COLUMNAS_CLIENTE
+    total = 0
+    escritor = None
+    try:
+        for filas in base_datos.exportar_lotes(tamano_lote, ruta):
+            lote = pd.DataFrame(filas, columns=columnas)
+            if archivo.endswith('.parquet'):
+                tabla = pa.Table.from_pandas(lote, preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(archivo, tabla.schema)
+                escritor.write_table(tabla.cast(escritor.schema))
+            else:
+                lote.to_csv(archivo, mode='w' if total == 0 else 'a', header=total == 0, index=False)
+            total += len(lote)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return total
+
+
+# Uso: python importar_clientes.py importar clientes.csv
+#      python importar_clientes.py exportar respaldo.parquet
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Importa o exporta usuarios y datos de cliente en bloque.")
+    parser.add_argument("accion", choices=["importar", "exportar"])
+    parser.add_argument("archivo", help="Archivo .csv o .parquet")
+    parser.add_argument("--bd", default=base_datos.RUTA_BD, help="Ruta de la base de datos SQLite")
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Filas por transacción")
+    parser.add_argument("--costo", type=int, default=None,
+                        help="Costo de bcrypt para contraseñas en texto plano (por defecto el calibrado)")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    if args.accion == "importar":
+        total = importar(args.archivo, args.bd, args.lote, args.costo)
+    else:
+        total = exportar(args.archivo, args.bd, args.lote)
+    print(f"{total} filas procesadas en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import numpy as np
+
+# Iteraciones máximas y tolerancia del descenso de gradiente proyectado (cambio máximo de un peso entre dos pasos;
+# las sugerencias se redondean a múltiplos de 5%, así que no hace falta más precisión)
+ITERACIONES = 500
+TOLERANCIA = 1e-7
+
+# Puntos de la frontera eficiente por defecto
+PUNTOS_FRONTERA = 50
+
+
+# Tamaño máximo (filas · puntos de quiebre · activos) para usar la proyección exacta en vez de la bisección
+MAX_ELEMENTOS_PROYECCION_EXACTA = 2_000_000
+
+
+# Función para proyectar cada fila de V sobre {w : Σw = 1, 0 ≤ w ≤ tope}.
+# La proyección es clip(v − τ, 0, tope) con τ tal que la suma sea 1; esa suma es lineal por tramos en τ.
+def proyectar_simplex_acotado(V, tope=1.0):
+    V = np.atleast_2d(V)
+    k, n = V.shape
+    if k * 2 * n * n > MAX_ELEMENTOS_PROYECCION_EXACTA:
+        return _proyectar_biseccion(V, tope)
+
+    # Evaluar la suma en todos los puntos de quiebre e interpolar en el tramo donde cruza 1
+    quiebres = np.sort(np.concatenate([V, V - tope], axis=1), axis=1)
+    sumas = np.clip(V[:, None, :] - quiebres[:, :, None], 0, tope).sum(axis=2)
+    j = np.minimum((sumas >= 1).sum(axis=1) - 1, 2 * n - 2)
+    filas = np.arange(k)
+    b0, b1 = quiebres[filas, j], quiebres[filas, j + 1]
+    s0, s1 = sumas[filas, j], sumas[filas, j + 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tau = np.where(s0 > s1, b0 + (s0 - 1) * (b1 - b0) / (s0 - s1), b0)
+    return np.clip(V - tau[:, None], 0, tope)
+
+
+# Proyección por bisección sobre τ, para lotes grandes donde la exacta usaría demasiada memoria
+def _proyectar_biseccion(V, tope):
+    inferior = V.min(axis=1) - tope
+    superior = V.max(axis=1)
+    for _ in range(60):
+        tau = (inferior + superior) / 2
+        exceso = np.clip(V - tau[:, None], 0, tope).sum(axis=1) > 1
+        inferior = np.where(exceso, tau, inferior)
+        superior = np.where(exceso, superior, tau)
+    return np.clip(V - ((inferior + superior) / 2)[:, None], 0, tope)
+
+
+# Función para resolver en lote  min wᵀΣw − λ·μᵀw  (una fila por cada λ) con solo posiciones largas y tope por activo.
+# Usa gradiente proyectado acelerado (FISTA) con reinicio adaptativo del momento por fila (cuando el momento apunta
+# cuesta arriba se descarta), que evita las oscilaciones de FISTA y converge en pocas decenas de pasos; cada fila
+# deja de actualizarse al converger. pesos_iniciales permite arrancar desde una solución previa.
+def resolver_media_varianza(media, covarianza, lambdas, tope=1.0, pesos_iniciales=None,
+                            iteraciones=ITERACIONES, tolerancia=TOLERANCIA):
+    media = np.asarray(media, dtype=float)
+    covarianza = np.asarray(covarianza, dtype=float)
+    lambdas = np.atleast_1d(np.asarray(lambdas, dtype=float))
+    n = len(media)
+    if tope * n < 1:
+        raise ValueError("El tope por activo es demasiado bajo para que los pesos sumen 100%")
+
+    if pesos_iniciales is None:
+        W = np.full((len(lambdas), n), 1.0 / n)
+    else:
+        W = np.broadcast_to(np.atleast_2d(pesos_iniciales), (len(lambdas), n)).astype(float)
+    W = proyectar_simplex_acotado(W, tope)
+
+    # Paso 1/L con L la constante de Lipschitz del gradiente (2·λmax(Σ))
+    paso = 1.0 / max(2 * np.linalg.eigvalsh(covarianza)[-1], 1e-12)
+    Y = W.copy()
+    t = np.ones(len(lambdas))
+    activas = np.arange(len(lambdas))
+    for _ in range(iteraciones):
+        Wa, Ya, ta = W[activas], Y[activas], t[activas]
+        gradiente = 2 * Ya @ covarianza - lambdas[activas, None] * media
+        W_nuevo = proyectar_simplex_acotado(Ya - paso * gradiente, tope)
+        # Reinicio adaptativo: si el paso va contra el gradiente del punto extrapolado, el momento vuelve a cero
+        reiniciar = ((Ya - W_nuevo) * (W_nuevo - Wa)).sum(axis=1) > 0
+        ta = np.where(reiniciar, 1.0, ta)
+        t_nuevo = (1 + np.sqrt(1 + 4 * ta * ta)) / 2
+        Y[activas] = W_nuevo + ((ta - 1) / t_nuevo)[:, None] * (W_nuevo - Wa)
+        cambio = np.abs(W_nuevo - Wa).max(axis=1)
+        W[activas], t[activas] = W_nuevo, t_nuevo
+        activas = activas[cambio >= tolerancia]
+        if len(activas) == 0:
+            break
+    return W
+
+
+# Rendimiento, volatilidad y Sharpe de una matriz de pesos (k, n)
+def _metricas(pesos, media, covarianza, tasa_libre_riesgo=0.0):
+    rendimientos = pesos @ media
+    volatilidades = np.sqrt(np.maximum(((pesos @ covarianza) * pesos).sum(axis=1), 0))
+    sharpe = np.divide(rendimientos - tasa_libre_riesgo, volatilidades,
+                       out=np.zeros_like(rendimientos), where=volatilidades > 0)
+    return {"pesos": pesos, "rendimientos": rendimientos, "volatilidades": volatilidades, "sharpe": sharpe}
+
+
+# Función para calcular la frontera eficiente como un lote de portafolios (de mínima varianza a máximo rendimiento)
+def frontera_eficiente(media, covarianza, n_puntos=PUNTOS_FRONTERA, tope=1.0, pesos_iniciales=None,
+                       tasa_libre_riesgo=0.0):
+    media = np.asarray(media, dtype=float)
+    covarianza = np.asarray(covarianza, dtype=float)
+
+    # λ en escala logarítmica entre 0 (mínima varianza) y un valor donde domina el rendimiento
+    escala = 2 * np.trace(covarianza) / max(np.abs(media).max(), 1e-12)
+    lambdas = np.concatenate([[0.0], np.geomspace(escala * 1e-3, escala * 1e2, n_puntos - 1)])
+    pesos = resolver_media_varianza(media, covarianza, lambdas, tope, pesos_iniciales)
+    return {**_metricas(pesos, media, covarianza, tasa_libre_riesgo), "lambdas": lambdas}
+
+
+# Función para obtener el portafolio de mínima varianza
+def minima_varianza(media, covarianza, tope=1.0, pesos_iniciales=None):
+    return resolver_media_varianza(media, covarianza, [0.0], tope, pesos_iniciales)[0]
+
+
+# Función para obtener el portafolio de máximo Sharpe: el mejor punto de una frontera (la que se da, o una nueva)
+# afinado con un lote de λ entre sus dos vecinos, que arranca desde ese punto
+def maximo_sharpe(media, covarianza, tope=1.0, tasa_libre_riesgo=0.0, n_puntos=PUNTOS_FRONTERA, frontera=None,
+                  puntos_refinamiento=16):
+    media = np.asarray(media, dtype=float)
+    covarianza = np.asarray(covarianza, dtype=float)
+    if frontera is None:
+        frontera = frontera_eficiente(media, covarianza, n_puntos, tope, tasa_libre_riesgo=tasa_libre_riesgo)
+    else:
+        frontera = {**_metricas(frontera["pesos"], media, covarianza, tasa_libre_riesgo), "lambdas": frontera["lambdas"]}
+    i = int(np.argmax(frontera["sharpe"]))
+    lambdas = frontera["lambdas"]
+    vecinos = np.linspace(lambdas[max(i - 1, 0)], lambdas[min(i + 1, len(lambdas) - 1)], puntos_refinamiento)
+    refinada = _metricas(resolver_media_varianza(media, covarianza, vecinos, tope, frontera["pesos"][i]),
+                         media, covarianza, tasa_libre_riesgo)
+    j = int(np.argmax(refinada["sharpe"]))
+    return refinada["pesos"][j] if refinada["sharpe"][j] > frontera["sharpe"][i] else frontera["pesos"][i]
+
+
+# Función para obtener el portafolio de mayor rendimiento cuya volatilidad no supera la objetivo.
+# Bisección sobre λ; cada paso arranca desde la solución anterior. Con una frontera ya calculada, la bisección
+# empieza entre los dos puntos que rodean a la volatilidad objetivo.
+def volatilidad_objetivo(media, covarianza, objetivo, tope=1.0, iteraciones=40, frontera=None):
+    media = np.asarray(media, dtype=float)
+    covarianza = np.asarray(covarianza, dtype=float)
+
+    def volatilidad(w):
+        return float(np.sqrt(max(w @ covarianza @ w, 0)))
+
+    inferior, superior = 0.0, 2 * np.trace(covarianza) / max(np.abs(media).max(), 1e-12) * 1e2
+    if frontera is None:
+        mejor = minima_varianza(media, covarianza, tope)
+    else:
+        volatilidades = _metricas(frontera["pesos"], media, covarianza)["volatilidades"]
+        debajo = np.flatnonzero(volatilidades <= objetivo)
+        i = int(debajo[-1]) if len(debajo) else 0
+        mejor = minima_varianza(media, covarianza, tope, frontera["pesos"][0]) if i == 0 else frontera["pesos"][i]
+        inferior = frontera["lambdas"][i]
+        if i + 1 < len(frontera["lambdas"]):
+            superior = frontera["lambdas"][i + 1]
+    if volatilidad(mejor) >= objetivo:
+        return mejor
+
+    pesos = mejor
+    for _ in range(iteraciones):
+        lam = (inferior + superior) / 2
+        pesos = resolver_media_varianza(media, covarianza, [lam], tope, pesos)[0]
+        if volatilidad(pesos) <= objetivo:
+            mejor, inferior = pesos, lam
+        else:
+            superior = lam
+        if superior - inferior <= 1e-6 * superior:
+            break
+    return mejor
+
+
+# Función para convertir pesos a porcentajes múltiplos de `paso` que sumen 100 (método del mayor residuo)
+def redondear_pesos(pesos, paso=5):
+    unidades = np.asarray(pesos, dtype=float) * 100 / paso
+    enteros = np.floor(unidades).astype(int)
+    faltantes = int(round(100 / paso)) - enteros.sum()
+    if faltantes > 0:
+        enteros[np.argsort(-(unidades - enteros))[:faltantes]] += 1
+    return enteros * paso
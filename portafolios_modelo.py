@@ -0,0 +1,124 @@
+import logging
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+import base_datos
+import cache_resultados
+import catalogo
+import datos_mercado
+import estadisticas
+import optimizador
+import simulacion
+
+# Volatilidad anual objetivo de cada nivel de riesgo del cliente
+VOLATILIDAD_POR_NIVEL = {"Bajo": 0.06, "Moderado": 0.12, "Alto": 0.20}
+
+# Plazos (años) que se precalculan; un plazo se redondea hacia abajo al más cercano
+PLAZOS = [5, 10, 15, 20, 25, 30]
+
+# En plazos cortos se reduce la volatilidad objetivo (hay menos tiempo para recuperarse de una caída)
+FACTOR_PLAZO = {5: 0.8, 10: 0.9}
+
+# Peso máximo por ETF, periodo histórico y trayectorias de la simulación
+TOPE_POR_ETF = 0.3
+PERIODO_HISTORICO = '5y'
+N_TRAYECTORIAS = 10_000
+
+# Vigencia de las estadísticas del catálogo en el caché compartido (hasta la siguiente corrida del precalentador)
+TTL_CATALOGO_SEGUNDOS = 4 * 24 * 60 * 60
+
+_lock = threading.Lock()
+_log = logging.getLogger(__name__)
+
+
+# Función para obtener el plazo precalculado que corresponde a un plazo de inversión
+def plazo_precalculado(plazo_inversion):
+    return max([p for p in PLAZOS if p <= plazo_inversion], default=PLAZOS[0])
+
+
+# Función para calcular las estadísticas de todo el catálogo en un periodo: rendimiento, volatilidad y Sharpe de
+# cada símbolo y la matriz de covarianza completa (solo símbolos con datos)
+def estadisticas_catalogo(simbolos, periodo):
+    rendimientos = estadisticas.rendimientos_diarios(datos_mercado.obtener_precios(simbolos, periodo))
+    rendimientos = rendimientos.loc[:, rendimientos.notna().any()]
+    return {
+        "version_datos": datos_mercado.version_datos(list(rendimientos.columns), periodo),
+        "estadisticas": estadisticas.estadisticas_activos(rendimientos),
+        "covarianza": estadisticas.estadisticas_portafolio(rendimientos, np.zeros(rendimientos.shape[1]))["covarianza"]
+    }
+
+
+# Función para obtener las estadísticas del catálogo desde el caché compartido (las deja ahí el precalentador);
+# si no están para la versión vigente del almacén, se calculan y se guardan
+def estadisticas_compartidas(simbolos, periodo=PERIODO_HISTORICO):
+    clave = cache_resultados.clave_canonica("catalogo", simbolos, {}, periodo, datos_mercado.version_almacen(simbolos))
+    return cache_resultados.obtener_o_calcular(
+        clave, lambda: estadisticas_catalogo(simbolos, periodo), ttl=TTL_CATALOGO_SEGUNDOS)
+
+
+# Función para recalcular todos los portafolios modelo y guardarlos en la base de datos.
+# estadisticas_historicas permite reutilizar unas estadisticas_catalogo ya calculadas sobre PERIODO_HISTORICO.
+# Si ningún símbolo tiene precios (almacén vacío o todas las descargas fallaron) no se guarda nada.
+def recalcular(simbolos=None, ruta=base_datos.RUTA_BD, estadisticas_historicas=None):
+    estadisticas_historicas = estadisticas_historicas or \
+        estadisticas_compartidas(simbolos or catalogo.obtener().simbolos)
+    simbolos = list(estadisticas_historicas["covarianza"].columns)
+    version = estadisticas_historicas["version_datos"]
+    if not simbolos:
+        _log.warning("Sin precios en el almacén: no se recalcularon los portafolios modelo")
+        return []
+
+    media = estadisticas_historicas["estadisticas"]["avg_annual_return"].to_numpy()
+    covarianza = estadisticas_historicas["covarianza"].to_numpy()
+    tope = max(TOPE_POR_ETF, 1 / len(simbolos))
+    actualizado = datetime.now(timezone.utc).isoformat()
+
+    portafolios = []
+    for nivel, volatilidad_nivel in VOLATILIDAD_POR_NIVEL.items():
+        for plazo in PLAZOS:
+            objetivo = volatilidad_nivel * FACTOR_PLAZO.get(plazo, 1.0)
+            pesos = optimizador.volatilidad_objetivo(media, covarianza, objetivo, tope)
+            porcentajes = optimizador.redondear_pesos(pesos)
+            pesos = porcentajes / 100
+
+            resultado = simulacion.simular_proyeccion(media, covarianza, pesos, 1.0, plazo,
+                                                      n_trayectorias=N_TRAYECTORIAS, semilla=0, procesos=1)
+            rendimiento = float(pesos @ media)
+            volatilidad = float(np.sqrt(max(pesos @ covarianza @ pesos, 0)))
+            portafolios.append(base_datos.PortafolioModelo(
+                nivel_riesgo=nivel,
+                plazo=plazo,
+                version_datos=version,
+                pesos={s: int(p) for s, p in zip(simbolos, porcentajes) if p > 0},
+                rendimiento=rendimiento,
+                volatilidad=volatilidad,
+                sharpe=rendimiento / volatilidad if volatilidad else 0.0,
+                multiplo_mediano=float(resultado["percentiles"][50][-1]),
+                multiplo_percentil_5=float(resultado["percentiles"][5][-1]),
+                multiplo_percentil_95=float(resultado["percentiles"][95][-1]),
+                drawdown_mediano=float(np.median(resultado["drawdowns_maximos"])),
+                actualizado=actualizado
+            ))
+
+    base_datos.migrar(ruta)
+    base_datos.guardar_portafolios_modelo(portafolios, ruta)
+    return portafolios
+
+
+# Función para recalcular en un hilo de fondo (tras una actualización de precios); ignora llamadas simultáneas.
+# No hace falta limpiar el caché de precios: version_almacen descarta los símbolos cuya revisión cambió.
+def recalcular_en_segundo_plano(simbolos=None, ruta=base_datos.RUTA_BD):
+    if not _lock.acquire(blocking=False):
+        return None
+
+    def tarea():
+        try:
+            recalcular(simbolos, ruta)
+        finally:
+            _lock.release()
+
+    hilo = threading.Thread(target=tarea, name="portafolios_modelo", daemon=True)
+    hilo.start()
+    return hilo
@@ -0,0 +1,88 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import base_datos
+import catalogo
+import datos_mercado
+import descarga_masiva
+import portafolios_modelo
+
+# Hora (del mercado de EE.UU.) a la que se ejecuta cada día hábil, después del cierre
+ZONA_MERCADO = "America/New_York"
+HORA_EJECUCION = "16:30"
+
+# Espera aleatoria máxima antes de cada corrida y antes de cada descarga (segundos), y descargas simultáneas
+JITTER_INICIO_SEGUNDOS = 600
+JITTER_DESCARGA_SEGUNDOS = 2.0
+CONCURRENCIA = 2
+
+
+# Función para calcular la siguiente ejecución (día hábil a HORA_EJECUCION en la zona del mercado)
+def proxima_ejecucion(ahora, hora=HORA_EJECUCION, zona=ZONA_MERCADO):
+    horas, minutos = map(int, hora.split(":"))
+    local = ahora.astimezone(ZoneInfo(zona))
+    candidato = local.replace(hour=horas, minute=minutos, second=0, microsecond=0)
+    if candidato <= local:
+        candidato += timedelta(days=1)
+    while candidato.weekday() >= 5:
+        candidato += timedelta(days=1)
+    return candidato
+
+
+# Función para ejecutar una corrida completa fuera del horario de consultas:
+# actualiza los precios de todo el catálogo, precalcula sus estadísticas históricas (las que leen los portafolios
+# modelo) y los portafolios modelo
+def calentar(etfs, concurrencia=CONCURRENCIA, jitter=JITTER_DESCARGA_SEGUNDOS, ruta_bd=base_datos.RUTA_BD):
+    inicio = time.perf_counter()
+    errores = 0
+    # Corrida nueva: no reanuda una descarga anterior del día, que dejaría fuera las barras publicadas después
+    for evento in descarga_masiva.descargar_catalogo(etfs, concurrencia=concurrencia, jitter=jitter,
+                                                     nueva_corrida=True):
+        if evento["estado"] != "completo":
+            errores += 1
+            print(f"{evento['simbolo']}: error: {evento['error']}")
+    print(f"Precios actualizados en {time.perf_counter() - inicio:.1f}s ({errores} errores)")
+
+    simbolos = [etf["symbol"] for etf in etfs]
+    datos_mercado.limpiar_cache(simbolos)
+    historicas = portafolios_modelo.estadisticas_compartidas(simbolos)
+    print(f"Estadísticas del catálogo ({portafolios_modelo.PERIODO_HISTORICO}) listas")
+
+    portafolios_modelo.recalcular(ruta=ruta_bd, estadisticas_historicas=historicas)
+    print(f"Corrida terminada en {time.perf_counter() - inicio:.1f}s")
+    return errores
+
+
+# Uso como proceso programado: python precalentador.py (o --una-vez desde cron)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precalienta precios y estadísticas del catálogo después del cierre.")
+    parser.add_argument("--catalogo", default="valid_etfs.json", help="Archivo JSON con los ETFs del catálogo")
+    parser.add_argument("--hora", default=HORA_EJECUCION, help=f"Hora de ejecución HH:MM ({ZONA_MERCADO})")
+    parser.add_argument("--concurrencia", type=int, default=CONCURRENCIA, help="Descargas simultáneas")
+    parser.add_argument("--jitter", type=float, default=JITTER_DESCARGA_SEGUNDOS,
+                        help="Espera aleatoria máxima antes de cada descarga (segundos)")
+    parser.add_argument("--jitter-inicio", type=float, default=JITTER_INICIO_SEGUNDOS,
+                        help="Espera aleatoria máxima antes de cada corrida (segundos)")
+    parser.add_argument("--una-vez", action="store_true", help="Ejecutar una corrida inmediata y salir")
+    args = parser.parse_args(argv)
+
+    while True:
+        if not args.una_vez:
+            siguiente = proxima_ejecucion(datetime.now(ZoneInfo(ZONA_MERCADO)), args.hora)
+            espera = (siguiente - datetime.now(ZoneInfo(ZONA_MERCADO))).total_seconds()
+            espera += random.uniform(0, args.jitter_inicio)
+            print(f"Siguiente corrida: {siguiente:%Y-%m-%d %H:%M %Z} (en {espera / 3600:.1f} h)")
+            time.sleep(max(espera, 0))
+
+        # El catálogo se relee en cada corrida por si cambió
+        etfs = catalogo.leer_lista(args.catalogo)
+        errores = calentar(etfs, args.concurrencia, args.jitter)
+        if args.una_vez:
+            return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
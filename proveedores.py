@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import trazas
+
+# Selección del proveedor por variables de entorno:
+#   PROVEEDOR_DATOS=yahoo|grabar|reproducir   (por defecto yahoo)
+#   PROVEEDOR_ARCHIVO=directorio              archivo de grabaciones para grabar y reproducir
+#   PROVEEDOR_LATENCIA=0.2 o 0.1-0.5          espera inyectada (segundos) en cada respuesta reproducida
+VARIABLE_MODO = "PROVEEDOR_DATOS"
+VARIABLE_ARCHIVO = "PROVEEDOR_ARCHIVO"
+VARIABLE_LATENCIA = "PROVEEDOR_LATENCIA"
+
+MODOS = ['yahoo', 'grabar', 'reproducir']
+RUTA_GRABACIONES = "grabaciones_mercado"
+
+# Opciones de yfinance que no cambian los datos y no forman parte de la clave de una grabación
+OPCIONES_IGNORADAS = {'progress', 'timeout', 'threads'}
+
+# Clave de los metadatos de Parquet donde se guarda la solicitud que produjo cada respuesta
+CLAVE_METADATOS = b"solicitud"
+
+_actual = None
+_lock = threading.Lock()
+
+
+class GrabacionNoEncontrada(KeyError):
+    """El archivo de grabaciones no tiene una respuesta para la solicitud."""
+
+
+# Proveedor en vivo: Yahoo Finance (yfinance se importa solo cuando se usa)
+class ProveedorYahoo:
+
+    # Función para descargar barras diarias de uno o varios símbolos (mismos argumentos que yf.download)
+    def descargar(self, simbolos, **opciones):
+        import yfinance as yf
+        trazas.contar("proveedor.llamadas")
+        with trazas.tramo("proveedor.descarga", simbolos=len(simbolos) if isinstance(simbolos, list) else 1):
+            return yf.download(simbolos, **opciones)
+
+    # Función para obtener el historial de un solo símbolo (como yf.Ticker(simbolo).history)
+    def historial(self, simbolo, **opciones):
+        import yfinance as yf
+        trazas.contar("proveedor.llamadas")
+        with trazas.tramo("proveedor.historial"):
+            return yf.Ticker(simbolo).history(**opciones)
+
+
+# Función para describir una solicitud de forma canónica (el orden de los símbolos no importa)
+def describir_solicitud(metodo, simbolos, opciones):
+    simbolos = [simbolos] if isinstance(simbolos, str) else sorted(simbolos)
+    opciones = {k: v for k, v in sorted(opciones.items()) if k not in OPCIONES_IGNORADAS}
+    return {"metodo": metodo, "simbolos": simbolos, "opciones": opciones}
+
+
+# Nombre del archivo de una solicitud dentro del archivo de grabaciones
+def _nombre_archivo(solicitud):
+    contenido = json.dumps(solicitud, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(contenido.encode()).hexdigest()[:32] + ".parquet"
+
+
+# Grabador: reenvía cada solicitud a otro proveedor y guarda la respuesta (Parquet comprimido, una por archivo)
+class Grabador:
+
+    def __init__(self, ruta=RUTA_GRABACIONES, proveedor=None):
+        self.ruta = ruta
+        self.proveedor = proveedor or ProveedorYahoo()
+        os.makedirs(ruta, exist_ok=True)
+
+    def _grabar(self, solicitud, frame):
+        tabla = pa.Table.from_pandas(frame)
+        metadatos = {**(tabla.schema.metadata or {}), CLAVE_METADATOS: json.dumps(solicitud, default=str).encode()}
+        tabla = tabla.replace_schema_metadata(metadatos)
+        # Escritura atómica: un lector concurrente nunca ve un archivo a medias
+        temporal = os.path.join(self.ruta, f"_{uuid.uuid4().hex}.tmp")
+        pq.write_table(tabla, temporal, compression='zstd')
+        os.replace(temporal, os.path.join(self.ruta, _nombre_archivo(solicitud)))
+
+    def descargar(self, simbolos, **opciones):
+        frame = self.proveedor.descargar(simbolos, **opciones)
+        self._grabar(describir_solicitud("descargar", simbolos, opciones), frame)
+        return frame
+
+    def historial(self, simbolo, **opciones):
+        frame = self.proveedor.historial(simbolo, **opciones)
+        self._grabar(describir_solicitud("historial", simbolo, opciones), frame)
+        return frame
+
+
+# Reproductor: sirve las respuestas grabadas sin tocar la red, con una latencia opcional (segundos fijos
+# o un rango (mínimo, máximo)) para simular al proveedor real
+class Reproductor:
+
+    def __init__(self, ruta=RUTA_GRABACIONES, latencia=None, semilla=None):
+        if not os.path.isdir(ruta):
+            raise FileNotFoundError(f"No existe el archivo de grabaciones: {ruta}")
+        self.ruta = ruta
+        self.latencia = (latencia, latencia) if isinstance(latencia, (int, float)) else latencia
+        self._aleatorio = random.Random(semilla)
+
+    def _reproducir(self, solicitud):
+        if self.latencia:
+            time.sleep(self._aleatorio.uniform(*self.latencia))
+        archivo = os.path.join(self.ruta, _nombre_archivo(solicitud))
+        if not os.path.exists(archivo):
+            raise GrabacionNoEncontrada(f"Sin grabación para {solicitud}; grábala con {VARIABLE_MODO}=grabar")
+        trazas.contar("proveedor.reproducciones")
+        return pd.read_parquet(archivo)
+
+    def descargar(self, simbolos, **opciones):
+        return self._reproducir(describir_solicitud("descargar", simbolos, opciones))
+
+    def historial(self, simbolo, **opciones):
+        return self._reproducir(describir_solicitud("historial", simbolo, opciones))
+
+    # Función para listar las solicitudes grabadas (solo lee los metadatos de cada archivo)
+    def solicitudes(self):
+        resultado = []
+        for nombre in sorted(os.listdir(self.ruta)):
+            if nombre.endswith(".parquet"):
+                metadatos = pq.read_schema(os.path.join(self.ruta, nombre)).metadata or {}
+                if CLAVE_METADATOS in metadatos:
+                    resultado.append(json.loads(metadatos[CLAVE_METADATOS]))
+        return resultado
+
+
+# Convierte "0.2" o "0.1-0.5" en un rango de latencia
+def _leer_latencia(texto):
+    if not texto:
+        return None
+    minimo, _, maximo = texto.partition("-")
+    return float(minimo), float(maximo or minimo)
+
+
+# Función para crear un proveedor por nombre de modo
+def crear(modo='yahoo', ruta=RUTA_GRABACIONES, latencia=None):
+    if modo == 'yahoo':
+        return ProveedorYahoo()
+    if modo == 'grabar':
+        return Grabador(ruta)
+    if modo == 'reproducir':
+        return Reproductor(ruta, latencia)
+    raise ValueError(f"Modo de proveedor desconocido: {modo} (opciones: {', '.join(MODOS)})")
+
+
+# Función para obtener el proveedor del proceso (se crea la primera vez según las variables de entorno)
+def obtener():
+    global _actual
+    with _lock:
+        if _actual is None:
+            _actual = crear(os.environ.get(VARIABLE_MODO, 'yahoo'),
+                            os.environ.get(VARIABLE_ARCHIVO, RUTA_GRABACIONES),
+                            _leer_latencia(os.environ.get(VARIABLE_LATENCIA)))
+        return _actual
+
+
+# Función para reemplazar el proveedor del proceso (pruebas, arneses de carga); None vuelve al de entorno
+def configurar(proveedor):
+    global _actual
+    with _lock:
+        _actual = proveedor
@@ -0,0 +1,189 @@
+import pickle
+from typing import NamedTuple
+
+import pandas as pd
+
+import backtest
+import base_datos
+import cache_resultados
+import datos_mercado
+import estadisticas
+import riesgo_movil
+import simulacion
+import trazas
+import valor_riesgo
+
+# Periodo fijo para la matriz de correlación que muestra la vista de Proyección
+PERIODO_CORRELACION = '1y'
+
+# Benchmark para la beta y ventana (días hábiles) de las métricas móviles del portafolio
+BENCHMARK = 'SPY'
+VENTANA_MOVIL = 21
+
+# Costo de transacción (fracción del monto negociado) con el que se compara cada calendario de rebalanceo
+COSTO_TRANSACCION = 0.001
+
+
+class ResultadoProyeccion(NamedTuple):
+    simbolos: list
+    ponderaciones: dict
+    periodo: str
+    inversion_inicial: float
+    plazo_inversion: int
+    estadisticas_etfs: pd.DataFrame
+    rendimiento: float
+    volatilidad: float
+    sharpe: float
+    covarianza: pd.DataFrame
+    matriz_correlacion: pd.DataFrame
+    rendimientos_acumulados: pd.DataFrame
+    simulacion: dict
+    metricas_moviles: pd.DataFrame
+    drawdown_historico: float
+    backtest: dict
+    valor_en_riesgo: pd.DataFrame
+    simbolos_sin_datos: list
+    version_datos: str
+
+
+# Función para calcular la proyección completa de un portafolio, sin dependencias de interfaz ni de gráficas.
+# ponderaciones es {símbolo: porcentaje}, periodo uno de datos_mercado.PERIODOS y plazo_inversion en años.
+# progreso(etapa, fraccion), si se da, se llama al terminar cada etapa (ver trabajos.Trabajo.reportar).
+def proyectar(simbolos, ponderaciones, periodo, inversion_inicial, plazo_inversion,
+              n_trayectorias=10_000, semilla=0, progreso=None):
+    simbolos = list(simbolos)
+    trazas.contar("proyeccion.calculada")
+    etapas = trazas.etapas("proyeccion")
+
+    # Una sola carga de la ventana más amplia que usan todos los cálculos; con progreso, símbolo por símbolo
+    periodo_carga = datos_mercado.periodo_mas_amplio([periodo, PERIODO_CORRELACION])
+    if progreso is None:
+        datos_mercado.precargar(simbolos + [BENCHMARK], periodo_carga)
+    else:
+        por_cargar = list(dict.fromkeys(simbolos + [BENCHMARK]))
+        for i, simbolo in enumerate(por_cargar, start=1):
+            datos_mercado.precargar([simbolo], periodo_carga)
+            progreso(f"Precios de {simbolo} listos", 0.4 * i / len(por_cargar))
+    avisar = progreso or (lambda etapa, fraccion: None)
+    etapas.marcar("precios")
+
+    # Estadísticas de cada ETF y del portafolio sobre el periodo de análisis
+    rendimientos_periodo = estadisticas.rendimientos_diarios(
+        datos_mercado.obtener_precios(simbolos, periodo, campo='Close'))
+    simbolos_sin_datos = [s for s in simbolos if rendimientos_periodo[s].isna().all()]
+    estadisticas_etfs = estadisticas.estadisticas_activos(rendimientos_periodo)
+    pesos = estadisticas.vector_pesos(ponderaciones, simbolos)
+    estadisticas_total = estadisticas.estadisticas_portafolio(rendimientos_periodo, pesos)
+    avisar("Estadísticas listas", 0.5)
+    etapas.marcar("estadisticas")
+
+    # Proyección Monte Carlo con la covarianza histórica
+    resultado_simulacion = simulacion.simular_proyeccion(
+        estadisticas_etfs["avg_annual_return"].to_numpy(),
+        estadisticas_total["covarianza"].to_numpy(),
+        pesos,
+        inversion_inicial,
+        plazo_inversion,
+        n_trayectorias=n_trayectorias,
+        semilla=semilla
+    )
+    avisar("Simulación Monte Carlo lista", 0.65)
+    etapas.marcar("simulacion")
+
+    # Correlación y VaR/CVaR del último año y rendimientos acumulados del periodo (cierre ajustado)
+    rendimientos_anio = estadisticas.rendimientos_diarios(datos_mercado.obtener_precios(simbolos, PERIODO_CORRELACION))
+    matriz_correlacion = estadisticas.matriz_correlacion(rendimientos_anio)
+    riesgo = valor_riesgo.calcular(rendimientos_anio, pesos)
+    avisar("Correlación y VaR listos", 0.75)
+    etapas.marcar("correlacion_var")
+    precios_historicos = datos_mercado.obtener_precios(simbolos, periodo)
+    rendimientos_historicos = precios_historicos.pct_change(fill_method=None)
+    rendimientos_acumulados = (1 + rendimientos_historicos).cumprod()
+
+    # Métricas móviles y drawdown real sobre la serie diaria del portafolio
+    rendimientos_portafolio = (rendimientos_historicos.fillna(0) @ pesos).iloc[1:].rename("Portafolio")
+    rendimientos_benchmark = estadisticas.rendimientos_diarios(
+        datos_mercado.obtener_precios([BENCHMARK], periodo))[BENCHMARK]
+    frames_moviles, _ = riesgo_movil.procesar_historia(rendimientos_portafolio, rendimientos_benchmark, VENTANA_MOVIL)
+    metricas_moviles = pd.DataFrame({nombre: frame["Portafolio"] for nombre, frame in frames_moviles.items()})
+    avisar("Riesgo histórico listo", 0.8)
+    etapas.marcar("riesgo_historico")
+
+    # Desempeño histórico de la mezcla con cada calendario de rebalanceo, en una sola corrida
+    resultado_backtest = backtest.evaluar(precios_historicos, pesos, backtest.REBALANCEOS, COSTO_TRANSACCION,
+                                          inversion_inicial=inversion_inicial, nombres=backtest.REBALANCEOS)
+    avisar("Backtest listo", 0.85)
+    etapas.marcar("backtest")
+
+    return ResultadoProyeccion(
+        simbolos=simbolos,
+        ponderaciones=dict(ponderaciones),
+        periodo=periodo,
+        inversion_inicial=inversion_inicial,
+        plazo_inversion=plazo_inversion,
+        estadisticas_etfs=estadisticas_etfs,
+        rendimiento=float(estadisticas_total["rendimiento"]),
+        volatilidad=float(estadisticas_total["volatilidad"]),
+        sharpe=float(estadisticas_total["sharpe"]),
+        covarianza=estadisticas_total["covarianza"],
+        matriz_correlacion=matriz_correlacion,
+        rendimientos_acumulados=rendimientos_acumulados,
+        simulacion=resultado_simulacion,
+        metricas_moviles=metricas_moviles,
+        drawdown_historico=float(metricas_moviles["drawdown_maximo"].min()) if len(metricas_moviles) else 0.0,
+        backtest=resultado_backtest,
+        valor_en_riesgo=riesgo.drop(columns="portafolio"),
+        simbolos_sin_datos=simbolos_sin_datos,
+        version_datos=datos_mercado.version_datos(simbolos, periodo)
+    )
+
+
+# Función para obtener la versión del almacén de la que depende la proyección de unos símbolos (incluye el benchmark)
+def version_proyeccion(simbolos):
+    return datos_mercado.version_almacen(list(dict.fromkeys(list(simbolos) + [BENCHMARK])))
+
+
+# Función para leer la instantánea guardada de una póliza si se calculó con la versión indicada del almacén
+def instantanea(poliza_id, version, ruta=base_datos.RUTA_BD):
+    guardada = base_datos.obtener_proyeccion(poliza_id, ruta)
+    if guardada is None or guardada.version_datos != version:
+        return None
+    try:
+        resultado = pickle.loads(guardada.resultado)
+    except Exception:
+        # Instantánea de una versión anterior del formato: se recalcula
+        return None
+    if not isinstance(resultado, ResultadoProyeccion):
+        return None
+    trazas.contar("proyeccion.instantanea")
+    return resultado
+
+
+# Función para guardar la instantánea de una póliza con la versión del almacén con que se calculó
+def guardar_instantanea(poliza_id, version, resultado, ruta=base_datos.RUTA_BD):
+    base_datos.guardar_proyeccion(poliza_id, version, pickle.dumps(resultado, protocol=pickle.HIGHEST_PROTOCOL), ruta)
+
+
+# Función para obtener la proyección de un portafolio con una versión del almacén, sin tocar ninguna póliza:
+# otro cliente con el mismo portafolio y los mismos datos pudo haberla calculado ya (caché compartido).
+# version es la de version_proyeccion, que al obtenerse ya descartó del caché los precios viejos.
+def proyectar_version(simbolos, ponderaciones, periodo, inversion_inicial, plazo_inversion, version, progreso=None):
+    clave = cache_resultados.clave_canonica("proyeccion", simbolos, ponderaciones, periodo, version,
+                                            inversion_inicial, plazo_inversion)
+    return cache_resultados.obtener_o_calcular(
+        clave, lambda: proyectar(simbolos, ponderaciones, periodo, inversion_inicial, plazo_inversion, progreso=progreso))
+
+
+# Función para obtener la proyección de una póliza guardada. Usa la instantánea de la base de datos si se calculó
+# con la versión vigente del almacén de precios; si no, la toma del caché compartido o la recalcula, y la guarda.
+def proyectar_poliza(poliza_id, simbolos, ponderaciones, periodo, inversion_inicial, plazo_inversion,
+                     ruta=base_datos.RUTA_BD, progreso=None):
+    version = version_proyeccion(simbolos)
+    resultado = instantanea(poliza_id, version, ruta)
+    if resultado is not None:
+        return resultado
+
+    resultado = proyectar_version(simbolos, ponderaciones, periodo, inversion_inicial, plazo_inversion, version,
+                                  progreso=progreso)
+    guardar_instantanea(poliza_id, version, resultado, ruta)
+    return resultado
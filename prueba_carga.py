@@ -0,0 +1,374 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+import uuid
+import zlib
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import base_datos
+import proveedores
+
+# Archivos que la aplicación lee desde el directorio de trabajo
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+ARCHIVO_APP = os.path.join(DIRECTORIO_APP, "App.py")
+ARCHIVOS_APP = ["valid_etfs.json", "descripciones_etfs.json", "allianz-1.svg"]
+
+# Parámetros por defecto: sesiones simultáneas de cada escenario, recorridos por sesión y tiempo máximo de cada paso
+SESIONES = [1, 5, 20]
+RECORRIDOS_POR_SESION = 1
+TIMEOUT_PASO_SEGUNDOS = 300
+RAMPA_SEGUNDOS = 0.0
+
+# Cada cuánto se vuelve a ejecutar la vista de proyección mientras su trabajo corre (como hace el navegador)
+INTERVALO_SONDEO_SEGUNDOS = 0.5
+
+# Portafolio que configura cada sesión en "Datos de Póliza": {símbolo: ponderación}
+PORTAFOLIO = {"SPY": 60, "AGG": 30, "GLD": 10}
+PERIODO = '1y'
+
+# Fecha final y semilla de los precios sintéticos (fijas para que la versión de los datos sea estable)
+FECHA_FIN_SINTETICA = '2024-12-31'
+SEMILLA = 7
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+# Proveedor sin red con precios sintéticos reproducibles: cada símbolo es una caminata geométrica
+# con su propia semilla, así que la misma solicitud siempre devuelve los mismos datos.
+# latencia (segundos) simula la espera de la red en cada respuesta.
+class ProveedorSintetico:
+
+    def __init__(self, fecha_fin=FECHA_FIN_SINTETICA, semilla=SEMILLA, latencia=0.0):
+        self.fecha_fin = pd.Timestamp(fecha_fin)
+        self.semilla = semilla
+        self.latencia = latencia
+
+    def _barras(self, simbolo, inicio, fin):
+        fechas = pd.bdate_range(end=self.fecha_fin, periods=20 * 252)
+        generador = np.random.default_rng([self.semilla, zlib.crc32(simbolo.encode())])
+        cierre = 100 * np.exp(np.cumsum(generador.normal(0.0003, generador.uniform(0.004, 0.02), len(fechas))))
+        frame = pd.DataFrame({
+            'Open': cierre, 'High': cierre * 1.005, 'Low': cierre * 0.995, 'Close': cierre, 'Adj Close': cierre,
+            'Volume': generador.integers(10_000, 1_000_000, len(fechas)).astype(float)
+        }, index=pd.DatetimeIndex(fechas, name='Date'))
+        if inicio is not None:
+            frame = frame.loc[frame.index >= pd.Timestamp(inicio)]
+        if fin is not None:
+            frame = frame.loc[frame.index < pd.Timestamp(fin)]
+        return frame
+
+    def descargar(self, simbolos, start=None, end=None, **opciones):
+        time.sleep(self.latencia)
+        simbolos = [simbolos] if isinstance(simbolos, str) else list(simbolos)
+        return pd.concat({s: self._barras(s, start, end) for s in simbolos}, axis=1).swaplevel(0, 1, axis=1)
+
+    def historial(self, simbolo, **opciones):
+        time.sleep(self.latencia)
+        return self._barras(simbolo, None, None).tail(1)
+
+
+# Error de un paso: la aplicación lanzó una excepción, mostró un error o no llegó al estado esperado
+class PasoFallido(Exception):
+    pass
+
+
+def _revisar(at, paso):
+    if at.exception:
+        raise PasoFallido(f"{paso}: {at.exception[0].value}")
+    if at.error:
+        raise PasoFallido(f"{paso}: {at.error[0].value}")
+
+
+# Busca un elemento por su etiqueta (los widgets de la aplicación no siempre tienen key)
+def _elemento(elementos, etiqueta):
+    for elemento in elementos:
+        if elemento.label == etiqueta:
+            return elemento
+    raise PasoFallido(f"No se encontró el elemento '{etiqueta}'")
+
+
+def _boton(at, etiqueta):
+    return _elemento(at.button, etiqueta)
+
+
+def _elegir_opcion(at, opcion):
+    at.sidebar.selectbox[0].set_value(opcion).run()
+
+
+# Pasos del recorrido de un asesor; cada uno recibe el AppTest de su sesión y los datos del usuario
+def paso_registro(at, usuario):
+    at.run()
+    # El botón cambia la vista; el formulario aparece en la siguiente ejecución
+    _boton(at, "¿No tienes cuenta? Regístrate aquí").click().run()
+    at.run()
+    at.text_input(key="register_first_name").input(usuario["nombre"])
+    at.text_input(key="register_last_name").input("Carga")
+    at.text_input(key="register_email").input(usuario["email"])
+    at.text_input(key="register_phone").input("5555555555")
+    at.text_input(key="register_password").input(usuario["password"])
+    _boton(at, "Registrarse").click().run()
+    _revisar(at, "registro")
+    if at.session_state.view != "login":
+        raise PasoFallido("registro: no volvió al inicio de sesión")
+    at.run()
+
+
+def paso_inicio_sesion(at, usuario):
+    at.text_input(key="login_email").input(usuario["email"])
+    at.text_input(key="login_password").input(usuario["password"])
+    _boton(at, "Iniciar Sesión").click().run()
+    _revisar(at, "inicio de sesión")
+    if at.session_state.view != "menu":
+        raise PasoFallido("inicio de sesión: credenciales rechazadas")
+    # Siguiente ejecución: ya se muestra el menú
+    at.run()
+    _revisar(at, "menú")
+
+
+def paso_datos_cliente(at, usuario):
+    _elegir_opcion(at, "Datos del Cliente")
+    _elemento(at.number_input, "Edad:").set_value(40)
+    _elemento(at.number_input, "Ingreso Mensual (USD):").set_value(5000.0)
+    _elemento(at.text_input, "Ocupación:").input("Asesor de carga")
+    _elemento(at.text_area, "Objetivo Financiero:").input("Retiro")
+    _elemento(at.selectbox, "Nivel de Riesgo:").set_value("Moderado")
+    _boton(at, "Guardar Datos").click().run()
+    _revisar(at, "datos del cliente")
+
+
+def paso_datos_poliza(at, usuario):
+    _elegir_opcion(at, "Datos de Póliza")
+    _revisar(at, "datos de póliza")
+    etiquetas = {opcion.split(":")[0]: opcion for opcion in at.multiselect(key="seleccion_etfs").options}
+    faltantes = [s for s in PORTAFOLIO if s not in etiquetas]
+    if faltantes:
+        raise PasoFallido(f"datos de póliza: el catálogo no tiene {faltantes}")
+    at.multiselect(key="seleccion_etfs").set_value([etiquetas[s] for s in PORTAFOLIO]).run()
+    # Los campos de ponderación siguen el orden del catálogo (key peso_<i>_<símbolo>)
+    for simbolo, peso in PORTAFOLIO.items():
+        _elemento(at.number_input, f"{etiquetas[simbolo]} (%)").set_value(peso)
+    _elemento(at.selectbox, "Selecciona el período de análisis:").set_value(PERIODO)
+    _boton(at, "Guardar Datos de Póliza").click().run()
+    _revisar(at, "datos de póliza")
+    if "datos_poliza" not in at.session_state:
+        raise PasoFallido("datos de póliza: no se guardó la póliza")
+
+
+def paso_proyeccion(at, usuario):
+    _elegir_opcion(at, "Proyección")
+    # AppTest no dispara el run_every del fragmento de progreso: se vuelve a ejecutar hasta que el trabajo termine
+    limite = time.monotonic() + TIMEOUT_PASO_SEGUNDOS
+    while not at.image and "trabajo_proyeccion" in at.session_state and \
+            not at.session_state["trabajo_proyeccion"].terminado and time.monotonic() < limite:
+        time.sleep(INTERVALO_SONDEO_SEGUNDOS)
+        at.run()
+    if not at.image and "trabajo_proyeccion" in at.session_state:
+        at.run()
+    _revisar(at, "proyección")
+    if not at.image:
+        raise PasoFallido("proyección: no se mostraron las gráficas")
+
+
+PASOS = [
+    ("registro", paso_registro),
+    ("inicio_sesion", paso_inicio_sesion),
+    ("datos_cliente", paso_datos_cliente),
+    ("datos_poliza", paso_datos_poliza),
+    ("proyeccion", paso_proyeccion),
+]
+
+
+# Función para ejecutar un recorrido completo en una sesión nueva; devuelve [(paso, segundos, error o None)].
+# Si un paso falla, el recorrido se detiene ahí.
+def recorrido(id_usuario, timeout=TIMEOUT_PASO_SEGUNDOS):
+    from streamlit.testing.v1 import AppTest
+
+    usuario = {"nombre": f"Asesor {id_usuario}", "email": f"carga_{id_usuario}@prueba.local",
+               "password": f"clave-{id_usuario}"}
+    at = AppTest.from_file(ARCHIVO_APP, default_timeout=timeout)
+    mediciones = []
+    for nombre, paso in PASOS:
+        inicio = time.perf_counter()
+        try:
+            paso(at, usuario)
+            error = None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        mediciones.append((nombre, time.perf_counter() - inicio, error))
+        if error:
+            break
+    return mediciones
+
+
+# Función para resumir las mediciones de un escenario por paso
+def resumir(mediciones):
+    por_paso = defaultdict(list)
+    errores = defaultdict(list)
+    for paso, segundos, error in mediciones:
+        por_paso[paso].append(segundos)
+        if error:
+            errores[paso].append(error)
+    resumen = {}
+    for paso, _ in PASOS:
+        tiempos = np.array(por_paso.get(paso, []))
+        if not len(tiempos):
+            continue
+        resumen[paso] = {
+            "n": int(len(tiempos)),
+            "errores": len(errores[paso]),
+            "tasa_errores": len(errores[paso]) / len(tiempos),
+            **{f"p{p}_s": float(np.percentile(tiempos, p)) for p in PERCENTILES},
+            "maximo_s": float(tiempos.max()),
+            "ejemplos_error": sorted(set(errores[paso]))[:3]
+        }
+    return resumen
+
+
+# Configura un proceso de sesión: mismo directorio de trabajo y proveedor sin red que el proceso principal
+def _iniciar_proceso(directorio, grabaciones, latencia, medir_memoria):
+    os.chdir(directorio)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    if grabaciones:
+        proveedores.configurar(proveedores.Reproductor(grabaciones, latencia=latencia or None))
+    else:
+        proveedores.configurar(ProveedorSintetico(latencia=latencia))
+    if medir_memoria:
+        tracemalloc.start()
+
+
+# Ejecuta los recorridos de una sesión en su proceso y devuelve sus mediciones, tiempos y memoria
+def _sesion(id_sesion, recorridos, retraso, timeout):
+    time.sleep(retraso)
+    inicio = time.time()
+    mediciones = []
+    for j in range(recorridos):
+        mediciones.extend(recorrido(f"{id_sesion}_{j}", timeout))
+    return {
+        "mediciones": mediciones,
+        "inicio": inicio,
+        "fin": time.time(),
+        "memoria_pico_mb": tracemalloc.get_traced_memory()[1] / 2 ** 20 if tracemalloc.is_tracing() else None,
+        "rss_maximo_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+# Función para ejecutar un escenario: n sesiones simultáneas, cada una con sus recorridos.
+# AppTest usa un runtime global de Streamlit y no admite ejecuciones simultáneas en un mismo proceso, así que
+# cada sesión corre en su propio proceso; comparten la base de datos SQLite, el almacén de precios y el caché en disco.
+def escenario(sesiones, directorio, recorridos=RECORRIDOS_POR_SESION, rampa=RAMPA_SEGUNDOS,
+              timeout=TIMEOUT_PASO_SEGUNDOS, grabaciones=None, latencia=0.0, medir_memoria=True):
+    prefijo = uuid.uuid4().hex[:8]
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=sesiones, mp_context=contexto, initializer=_iniciar_proceso,
+                             initargs=(directorio, grabaciones, latencia, medir_memoria)) as executor:
+        futuros = [executor.submit(_sesion, f"{prefijo}_{i}", recorridos, rampa * i / sesiones, timeout)
+                   for i in range(sesiones)]
+        resultados = [futuro.result() for futuro in futuros]
+
+    mediciones = [m for r in resultados for m in r["mediciones"]]
+    # Duración desde que arranca la primera sesión hasta que termina la última (sin contar el arranque de los procesos)
+    duracion = max(r["fin"] for r in resultados) - min(r["inicio"] for r in resultados)
+    completos = sum(1 for paso, _, error in mediciones if paso == PASOS[-1][0] and error is None)
+    fallidos = sum(1 for _, _, error in mediciones if error)
+    memorias = [r["memoria_pico_mb"] for r in resultados if r["memoria_pico_mb"] is not None]
+    return {
+        "sesiones": sesiones,
+        "recorridos": sesiones * recorridos,
+        "recorridos_completos": completos,
+        "duracion_s": duracion,
+        "recorridos_por_segundo": completos / duracion if duracion else 0.0,
+        "pasos_por_segundo": len(mediciones) / duracion if duracion else 0.0,
+        "tasa_errores": fallidos / len(mediciones) if mediciones else 0.0,
+        "memoria_pico_mb": max(memorias) if memorias else None,
+        "rss_maximo_mb": max(r["rss_maximo_mb"] for r in resultados),
+        "rss_total_mb": sum(r["rss_maximo_mb"] for r in resultados),
+        "pasos": resumir(mediciones)
+    }
+
+
+# Prepara un directorio de trabajo aislado (base de datos, almacén de precios y caché propios)
+def preparar_directorio(directorio):
+    os.makedirs(directorio, exist_ok=True)
+    for archivo in ARCHIVOS_APP:
+        origen = os.path.join(DIRECTORIO_APP, archivo)
+        if os.path.exists(origen):
+            shutil.copy(origen, directorio)
+    # El esquema se crea una sola vez aquí y no en cada proceso de sesión a la vez
+    base_datos.migrar(os.path.join(directorio, base_datos.RUTA_BD))
+
+
+def imprimir(resultado):
+    print(f"\n== {resultado['sesiones']} sesiones: {resultado['recorridos_completos']}/{resultado['recorridos']} "
+          f"recorridos completos en {resultado['duracion_s']:.1f}s "
+          f"({resultado['recorridos_por_segundo']:.2f} recorridos/s, {resultado['pasos_por_segundo']:.2f} pasos/s), "
+          f"errores {resultado['tasa_errores'] * 100:.1f}%")
+    memoria = f"{resultado['memoria_pico_mb']:.0f} MB" if resultado["memoria_pico_mb"] is not None else "sin medir"
+    print(f"   memoria pico por sesión (tracemalloc): {memoria}, RSS máximo por sesión: "
+          f"{resultado['rss_maximo_mb']:.0f} MB, RSS total: {resultado['rss_total_mb']:.0f} MB")
+    print(f"   {'paso':<15}{'n':>5}{'err':>5}" + "".join(f"{f'p{p}':>9}" for p in PERCENTILES) + f"{'máx':>9}")
+    for paso, datos in resultado["pasos"].items():
+        print(f"   {paso:<15}{datos['n']:>5}{datos['errores']:>5}"
+              + "".join(f"{datos[f'p{p}_s']:>8.2f}s" for p in PERCENTILES) + f"{datos['maximo_s']:>8.2f}s")
+        for ejemplo in datos["ejemplos_error"]:
+            print(f"      ! {ejemplo}")
+
+
+# Uso: python prueba_carga.py --sesiones 1 10 50 [--grabaciones dir] [--salida carga.json]
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de la aplicación con sesiones simultáneas.")
+    parser.add_argument("--sesiones", type=int, nargs="+", default=SESIONES, help="Sesiones simultáneas por escenario")
+    parser.add_argument("--recorridos", type=int, default=RECORRIDOS_POR_SESION, help="Recorridos por sesión")
+    parser.add_argument("--rampa", type=float, default=RAMPA_SEGUNDOS,
+                        help="Segundos en los que se reparten los arranques de las sesiones")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_PASO_SEGUNDOS, help="Tiempo máximo de cada ejecución")
+    parser.add_argument("--grabaciones", default=None,
+                        help="Reproducir un archivo de grabaciones (proveedores.py) en lugar de precios sintéticos")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Latencia inyectada en cada respuesta del proveedor")
+    parser.add_argument("--directorio", default=None, help="Directorio de trabajo (por defecto, uno temporal)")
+    parser.add_argument("--sin-memoria", action="store_true", help="No medir la memoria con tracemalloc (más rápido)")
+    parser.add_argument("--salida", default=None, help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args(argv)
+
+    grabaciones = os.path.abspath(args.grabaciones) if args.grabaciones else None
+    if grabaciones and not os.path.isdir(grabaciones):
+        parser.error(f"No existe el archivo de grabaciones: {grabaciones}")
+    salida = os.path.abspath(args.salida) if args.salida else None
+
+    temporal = None
+    if args.directorio is None:
+        temporal = args.directorio = tempfile.mkdtemp(prefix="prueba_carga_")
+    directorio = os.path.abspath(args.directorio)
+    # La aplicación usa rutas relativas (users.db, datos_precios, cache_resultados.db): todo queda en este directorio
+    preparar_directorio(directorio)
+    print(f"Directorio de trabajo: {directorio}")
+
+    resultados = []
+    try:
+        for sesiones in args.sesiones:
+            resultado = escenario(sesiones, directorio, args.recorridos, args.rampa, args.timeout, grabaciones,
+                                  args.latencia, not args.sin_memoria)
+            imprimir(resultado)
+            resultados.append(resultado)
+    finally:
+        if temporal:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    if salida:
+        with open(salida, 'w') as f:
+            json.dump({"escenarios": resultados}, f, indent=4)
+    return 1 if any(r["tasa_errores"] for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
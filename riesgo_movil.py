@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+# Días hábiles en un año, usados para anualizar
+DIAS_HABILES = 252
+
+# Ventana por defecto (días hábiles) de las métricas móviles
+VENTANA = 63
+
+# Cada cuántos pasos se recalculan los momentos desde el buffer para evitar acumular error de redondeo
+PASOS_RESINCRONIZACION = 10_000
+
+
+# Métricas de riesgo móviles que se actualizan en O(1) por día para n series a la vez:
+# volatilidad y Sharpe anualizados, beta contra un benchmark (momentos de Welford sobre la ventana)
+# y drawdown desde el máximo histórico (máximo acumulado).
+class MetricasMoviles:
+
+    def __init__(self, n_series, ventana=VENTANA):
+        self.ventana = ventana
+        self.buffer = np.zeros((ventana, n_series))
+        self.buffer_benchmark = np.zeros(ventana)
+        self.posicion = 0
+        self.cuenta = 0
+        self.pasos = 0
+
+        # Momentos de la ventana: medias, sumas de cuadrados centradas y co-momento con el benchmark
+        self.media = np.zeros(n_series)
+        self.m2 = np.zeros(n_series)
+        self.media_benchmark = 0.0
+        self.m2_benchmark = 0.0
+        self.comomento = np.zeros(n_series)
+
+        # Valor acumulado (1 = inicio), máximo histórico y peor drawdown observado
+        self.valor = np.ones(n_series)
+        self.pico = np.ones(n_series)
+        self.drawdown_maximo = np.zeros(n_series)
+
+    # Agrega un día a los momentos de la ventana
+    def _agregar(self, x, y):
+        self.cuenta += 1
+        delta = x - self.media
+        self.media = self.media + delta / self.cuenta
+        self.m2 = self.m2 + delta * (x - self.media)
+        delta_benchmark = y - self.media_benchmark
+        self.media_benchmark += delta_benchmark / self.cuenta
+        self.m2_benchmark += delta_benchmark * (y - self.media_benchmark)
+        self.comomento = self.comomento + delta * (y - self.media_benchmark)
+
+    # Quita de los momentos el día que sale de la ventana (inverso de _agregar)
+    def _quitar(self, x, y):
+        media_benchmark_previa = self.media_benchmark
+        self.cuenta -= 1
+        media_nueva = self.media - (x - self.media) / self.cuenta
+        self.m2 = self.m2 - (x - self.media) * (x - media_nueva)
+        self.media = media_nueva
+        self.media_benchmark -= (y - self.media_benchmark) / self.cuenta
+        self.m2_benchmark -= (y - media_benchmark_previa) * (y - self.media_benchmark)
+        self.comomento = self.comomento - (x - self.media) * (y - media_benchmark_previa)
+
+    # Recalcula los momentos desde el buffer (O(ventana), solo cada PASOS_RESINCRONIZACION pasos)
+    def _resincronizar(self):
+        x = self.buffer[:self.cuenta]
+        y = self.buffer_benchmark[:self.cuenta]
+        self.media = x.mean(axis=0)
+        self.media_benchmark = float(y.mean())
+        self.m2 = ((x - self.media) ** 2).sum(axis=0)
+        self.m2_benchmark = float(((y - self.media_benchmark) ** 2).sum())
+        self.comomento = ((x - self.media) * (y - self.media_benchmark)[:, None]).sum(axis=0)
+
+    # Función para incorporar un nuevo día de rendimientos y obtener las métricas vigentes
+    def actualizar(self, rendimientos, rendimiento_benchmark=0.0):
+        x = np.nan_to_num(np.asarray(rendimientos, dtype=float))
+        y = float(np.nan_to_num(rendimiento_benchmark))
+
+        if self.cuenta == self.ventana:
+            self._quitar(self.buffer[self.posicion], self.buffer_benchmark[self.posicion])
+        self.buffer[self.posicion] = x
+        self.buffer_benchmark[self.posicion] = y
+        self._agregar(x, y)
+        self.posicion = (self.posicion + 1) % self.ventana
+
+        self.pasos += 1
+        if self.pasos % PASOS_RESINCRONIZACION == 0 and self.cuenta == self.ventana:
+            self.buffer = np.roll(self.buffer, -self.posicion, axis=0)
+            self.buffer_benchmark = np.roll(self.buffer_benchmark, -self.posicion)
+            self.posicion = 0
+            self._resincronizar()
+
+        self.valor = self.valor * (1 + x)
+        self.pico = np.maximum(self.pico, self.valor)
+        drawdown = self.valor / self.pico - 1
+        self.drawdown_maximo = np.minimum(self.drawdown_maximo, drawdown)
+
+        return {"drawdown": drawdown, "drawdown_maximo": self.drawdown_maximo.copy(), **self.metricas_ventana()}
+
+    # Función para obtener volatilidad, Sharpe y beta de la ventana actual (NaN hasta llenar la ventana)
+    def metricas_ventana(self):
+        n = len(self.media)
+        if self.cuenta < self.ventana:
+            vacio = np.full(n, np.nan)
+            return {"volatilidad": vacio, "sharpe": vacio.copy(), "beta": vacio.copy()}
+
+        varianza = np.maximum(self.m2, 0) / (self.cuenta - 1)
+        volatilidad = np.sqrt(varianza * DIAS_HABILES)
+        rendimiento = self.media * DIAS_HABILES
+        sharpe = np.divide(rendimiento, volatilidad, out=np.zeros(n), where=volatilidad != 0)
+        beta = self.comomento / self.m2_benchmark if self.m2_benchmark > 0 else np.full(n, np.nan)
+        return {"volatilidad": volatilidad, "sharpe": sharpe, "beta": beta}
+
+
+# Función para recorrer una historia completa de rendimientos diarios (fechas x series) y devolver
+# las métricas móviles de cada día; regresa también el objeto para seguir actualizándolo día a día.
+def procesar_historia(rendimientos, rendimientos_benchmark=None, ventana=VENTANA):
+    if isinstance(rendimientos, pd.Series):
+        rendimientos = rendimientos.to_frame()
+    matriz = rendimientos.to_numpy(dtype=float)
+    if rendimientos_benchmark is None:
+        benchmark = np.zeros(len(rendimientos))
+    else:
+        benchmark = rendimientos_benchmark.reindex(rendimientos.index).to_numpy(dtype=float)
+
+    metricas = MetricasMoviles(matriz.shape[1], ventana)
+    nombres = ["volatilidad", "sharpe", "beta", "drawdown", "drawdown_maximo"]
+    salida = {nombre: np.empty_like(matriz) for nombre in nombres}
+    for i in range(len(matriz)):
+        resultado = metricas.actualizar(matriz[i], benchmark[i])
+        for nombre in nombres:
+            salida[nombre][i] = resultado[nombre]
+
+    frames = {nombre: pd.DataFrame(valores, index=rendimientos.index, columns=rendimientos.columns)
+              for nombre, valores in salida.items()}
+    return frames, metricas
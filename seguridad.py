@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+import trazas
+
+# Costo mínimo de bcrypt (el valor por defecto de la librería); la calibración nunca baja de aquí
+COSTO_MINIMO = 12
+COSTO_MAXIMO = 16
+
+# Latencia objetivo de un hash en milisegundos
+LATENCIA_OBJETIVO_MS = 250
+
+# bcrypt libera el GIL, así que un hilo por núcleo aprovecha toda la CPU
+MAX_WORKERS = os.cpu_count() or 1
+
+# Operaciones en espera permitidas antes de rechazar nuevas (contrapresión)
+MAX_PENDIENTES = MAX_WORKERS * 4
+TIMEOUT_ESPERA_SEGUNDOS = 5
+
+
+class ServicioSaturado(Exception):
+    """Hay demasiadas operaciones de contraseña en espera."""
+
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="bcrypt")
+_cupos = threading.BoundedSemaphore(MAX_PENDIENTES)
+_lock = threading.Lock()
+_costo = None
+
+
+# Función para elegir el mayor costo cuyo hash tarde a lo más la latencia objetivo
+def calibrar_costo(latencia_objetivo_ms=LATENCIA_OBJETIVO_MS, minimo=COSTO_MINIMO, maximo=COSTO_MAXIMO):
+    inicio = time.perf_counter()
+    bcrypt.hashpw(b"calibracion", bcrypt.gensalt(rounds=minimo))
+    milisegundos = (time.perf_counter() - inicio) * 1000
+
+    # Cada punto de costo duplica el tiempo del hash
+    costo = minimo
+    while costo < maximo and milisegundos * 2 <= latencia_objetivo_ms:
+        milisegundos *= 2
+        costo += 1
+    return costo
+
+
+# Función para obtener el costo vigente; se calibra una sola vez por proceso
+def costo_actual():
+    global _costo
+    with _lock:
+        if _costo is None:
+            _costo = calibrar_costo()
+        return _costo
+
+
+# Ejecuta una función en el pool de bcrypt, rechazando el trabajo si la cola está llena
+def _ejecutar(funcion, *args):
+    if not _cupos.acquire(timeout=TIMEOUT_ESPERA_SEGUNDOS):
+        raise ServicioSaturado("Demasiadas operaciones de contraseña en espera")
+    try:
+        futuro = _executor.submit(funcion, *args)
+    except BaseException:
+        _cupos.release()
+        raise
+    futuro.add_done_callback(lambda _: _cupos.release())
+    return futuro
+
+
+# Función para generar el hash de una contraseña fuera del hilo de la interfaz
+def hashear(password):
+    costo = costo_actual()
+    with trazas.tramo("bcrypt.hashear", costo=costo):
+        futuro = _ejecutar(lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=costo)).decode('utf-8'))
+        return futuro.result()
+
+
+# Función para verificar una contraseña contra su hash fuera del hilo de la interfaz
+def verificar(password, password_hash):
+    with trazas.tramo("bcrypt.verificar"):
+        futuro = _ejecutar(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+        return futuro.result()
+
+
+# Indica si un hash guardado usa un costo menor al vigente (formato $2b$<costo>$...)
+def necesita_rehash(password_hash):
+    try:
+        return int(password_hash.split('$')[2]) < costo_actual()
+    except (IndexError, ValueError):
+        return True
+
+
+# Función para actualizar en segundo plano un hash con costo desactualizado tras un inicio de sesión exitoso
+def rehash_en_segundo_plano(password, guardar):
+    costo = costo_actual()
+
+    def tarea():
+        guardar(bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=costo)).decode('utf-8'))
+
+    try:
+        _ejecutar(tarea)
+    except ServicioSaturado:
+        # Se reintentará en el siguiente inicio de sesión
+        pass
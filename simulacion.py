@@ -0,0 +1,76 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Pasos de simulación por año según la frecuencia
+PASOS_POR_ANIO = {'diaria': 252, 'mensual': 12}
+
+# Percentiles que forman las bandas del abanico de proyección
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# Máximo de números aleatorios por bloque (≈32 MB en float64) para acotar la memoria
+MAX_ELEMENTOS_BLOQUE = 4_000_000
+
+# Por debajo de este número de trayectorias no vale la pena abrir procesos
+MIN_TRAYECTORIAS_PARALELO = 20_000
+
+
+# Simula un bloque de trayectorias y devuelve los valores al cierre de cada año y el drawdown máximo de cada una.
+# Con pesos constantes (rebalanceo en cada paso) el rendimiento del portafolio es wᵀr con r ~ N(μ, Σ),
+# es decir N(wᵀμ, wᵀΣw): basta con sortear esa sola variable en lugar de un vector por activo.
+def _simular_bloque(semilla, n_trayectorias, media, desviacion, pasos_por_anio, plazo_anios):
+    rng = np.random.default_rng(semilla)
+    pasos = pasos_por_anio * plazo_anios
+    rendimientos = rng.standard_normal((n_trayectorias, pasos))
+    rendimientos *= desviacion
+    rendimientos += media
+    np.clip(rendimientos, -0.999, None, out=rendimientos)
+
+    # Valor relativo de cada trayectoria (1 = inversión inicial)
+    valores = np.log1p(rendimientos, out=rendimientos)
+    np.cumsum(valores, axis=1, out=valores)
+    np.exp(valores, out=valores)
+
+    picos = np.maximum.accumulate(valores, axis=1)
+    drawdowns_maximos = np.maximum((1 - valores / np.maximum(picos, 1)).max(axis=1), 0)
+    cierres_anuales = valores[:, pasos_por_anio - 1::pasos_por_anio]
+    return cierres_anuales, drawdowns_maximos
+
+
+# Función para proyectar un portafolio con simulación Monte Carlo.
+# media_anual y covarianza_anual son los rendimientos y la covarianza anualizados de los ETFs.
+def simular_proyeccion(media_anual, covarianza_anual, pesos, inversion_inicial, plazo_anios,
+                       n_trayectorias=10_000, frecuencia='mensual', semilla=None, procesos=None):
+    pasos_por_anio = PASOS_POR_ANIO[frecuencia]
+    pesos = np.asarray(pesos, dtype=float)
+    media = float(pesos @ np.asarray(media_anual, dtype=float)) / pasos_por_anio
+    varianza = float(pesos @ np.asarray(covarianza_anual, dtype=float) @ pesos) / pasos_por_anio
+    desviacion = np.sqrt(max(varianza, 0.0))
+
+    # Dividir las trayectorias en bloques de memoria acotada, cada uno con su propia semilla derivada
+    tamano_bloque = max(1, min(n_trayectorias, MAX_ELEMENTOS_BLOQUE // (pasos_por_anio * plazo_anios)))
+    tamanos = [tamano_bloque] * (n_trayectorias // tamano_bloque)
+    if n_trayectorias % tamano_bloque:
+        tamanos.append(n_trayectorias % tamano_bloque)
+    semillas = np.random.SeedSequence(semilla).spawn(len(tamanos))
+    argumentos = [(s, n, media, desviacion, pasos_por_anio, plazo_anios) for s, n in zip(semillas, tamanos)]
+
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+    if procesos > 1 and len(tamanos) > 1 and n_trayectorias >= MIN_TRAYECTORIAS_PARALELO:
+        with ProcessPoolExecutor(max_workers=min(procesos, len(tamanos))) as executor:
+            resultados = list(executor.map(_simular_bloque, *zip(*argumentos)))
+    else:
+        resultados = [_simular_bloque(*a) for a in argumentos]
+
+    cierres_anuales = np.concatenate([r[0] for r in resultados]) * inversion_inicial
+    drawdowns_maximos = np.concatenate([r[1] for r in resultados])
+
+    return {
+        "anios": np.arange(1, plazo_anios + 1),
+        "percentiles": dict(zip(PERCENTILES, np.percentile(cierres_anuales, PERCENTILES, axis=0))),
+        "valores_finales": cierres_anuales[:, -1],
+        "drawdowns_maximos": drawdowns_maximos,
+        "probabilidad_perdida": float((cierres_anuales[:, -1] < inversion_inicial).mean())
+    }
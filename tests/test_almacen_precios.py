@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import almacen_precios
+
+
+# Proveedor falso: sirve las barras de un DataFrame por símbolo con el formato de yf.download
+class ProveedorFalso:
+
+    def __init__(self, barras):
+        self.barras = barras
+        self.solicitudes = []
+
+    def descargar(self, simbolos, start=None, end=None, **opciones):
+        self.solicitudes.append((tuple(simbolos), start))
+        frames = {}
+        for simbolo in simbolos:
+            frame = self.barras[simbolo]
+            frames[simbolo] = frame.loc[frame.index >= pd.Timestamp(start)] if start else frame
+        return pd.concat(frames, axis=1).swaplevel(0, 1, axis=1)
+
+
+def _barras(fechas, cierre):
+    cierre = np.asarray(cierre, dtype=float)
+    return pd.DataFrame({'Open': cierre, 'High': cierre, 'Low': cierre, 'Close': cierre, 'Adj Close': cierre,
+                         'Volume': 1000.0}, index=pd.DatetimeIndex(fechas, name='Date'))
+
+
+def test_actualizar_corrige_la_ultima_barra_revisada(tmp_path):
+    ruta = str(tmp_path / "precios")
+    fechas = pd.bdate_range('2024-01-01', periods=10)
+    proveedor = ProveedorFalso({"AAA": _barras(fechas, np.arange(100, 110))})
+    almacen_precios.actualizar(["AAA"], ruta=ruta, descargar=proveedor.descargar, fecha_inicio='2024-01-01')
+
+    # El proveedor revisa el cierre parcial de la última barra y agrega una nueva
+    revisadas = _barras(pd.bdate_range('2024-01-01', periods=11), list(range(100, 109)) + [120, 121])
+    proveedor.barras["AAA"] = revisadas
+    nuevas = almacen_precios.actualizar(["AAA"], ruta=ruta, descargar=proveedor.descargar)
+
+    guardado = almacen_precios.leer(["AAA"], ruta)["AAA"]
+    assert nuevas == {"AAA": 1}
+    assert proveedor.solicitudes[-1][1] == fechas[-almacen_precios.SOLAPE_BARRAS].strftime('%Y-%m-%d')
+    assert guardado["Close"].tolist() == revisadas["Close"].tolist()
+    # Solo se escribieron las barras del solape y la nueva, en un archivo aparte
+    carpeta = tmp_path / "precios" / "symbol=AAA"
+    archivos = almacen_precios.revisiones(["AAA"], ruta)["AAA"].split(",")
+    filas = sorted(pq.read_metadata(carpeta / nombre).num_rows for nombre in archivos)
+    assert filas == [almacen_precios.SOLAPE_BARRAS + 1, 10]
+
+
+def test_actualizar_reajusta_la_historia_tras_un_dividendo(tmp_path):
+    ruta = str(tmp_path / "precios")
+    fechas = pd.bdate_range('2024-01-01', periods=30)
+    proveedor = ProveedorFalso({"AAA": _barras(fechas, np.full(30, 100.0))})
+    almacen_precios.actualizar(["AAA"], ruta=ruta, descargar=proveedor.descargar, fecha_inicio='2024-01-01')
+
+    # Un dividendo reajusta toda la historia anterior
+    ajustadas = _barras(pd.bdate_range('2024-01-01', periods=31), np.full(31, 100.0))
+    ajustadas.loc[ajustadas.index[:-1], 'Adj Close'] = 98.0
+    proveedor.barras["AAA"] = ajustadas
+    almacen_precios.actualizar(["AAA"], ruta=ruta, descargar=proveedor.descargar, fecha_inicio='2024-01-01')
+
+    guardado = almacen_precios.leer(["AAA"], ruta)["AAA"]
+    assert proveedor.solicitudes[-1][1] == '2024-01-01'
+    assert guardado["Adj Close"].tolist() == ajustadas["Adj Close"].tolist()
+
+
+def test_actualizar_sin_cambios_no_reescribe(tmp_path):
+    ruta = str(tmp_path / "precios")
+    proveedor = ProveedorFalso({"AAA": _barras(pd.bdate_range('2024-01-01', periods=10), np.arange(100, 110))})
+    almacen_precios.actualizar(["AAA"], ruta=ruta, descargar=proveedor.descargar, fecha_inicio='2024-01-01')
+    revision = almacen_precios.revisiones(["AAA"], ruta)
+
+    assert almacen_precios.actualizar(["AAA"], ruta=ruta, descargar=proveedor.descargar) == {"AAA": 0}
+    assert almacen_precios.revisiones(["AAA"], ruta) == revision
+
+
+def test_los_archivos_reemplazados_se_borran_pasada_la_gracia(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "precios")
+    carpeta = tmp_path / "precios" / "symbol=AAA"
+    monkeypatch.setattr(almacen_precios, "MAX_ARCHIVOS_PARTICION", 3)
+    fechas = pd.bdate_range('2024-01-01', periods=6)
+    almacen_precios.guardar("AAA", _barras(fechas[:3], [100, 101, 102]), ruta)
+    for i in range(3, 6):
+        almacen_precios.guardar("AAA", _barras(fechas[i:i + 1], [100 + i]), ruta, fechas[i - 1])
+
+    # La compactación dejó un archivo vigente, pero los reemplazados siguen ahí para las lecturas en curso
+    assert len(list(carpeta.glob("*.parquet"))) == 5
+    assert almacen_precios.leer(["AAA"], ruta)["AAA"]["Close"].tolist() == list(range(100, 106))
+
+    # Pasada la gracia, la siguiente escritura los borra
+    monkeypatch.setattr(almacen_precios, "GRACIA_BORRADO_SEGUNDOS", 0)
+    almacen_precios.guardar("AAA", _barras(pd.bdate_range(fechas[-1], periods=2)[1:], [106]), ruta, fechas[-1])
+    assert len(list(carpeta.glob("*.parquet"))) == 2
+    assert almacen_precios.leer(["AAA"], ruta)["AAA"]["Close"].tolist() == list(range(100, 107))
@@ -0,0 +1,62 @@
+import bcrypt
+import pandas as pd
+
+import base_datos
+import importar_clientes
+
+
+def _importar(tmp_path, filas, nombre):
+    archivo = str(tmp_path / nombre)
+    pd.DataFrame(filas).to_csv(archivo, index=False)
+    return importar_clientes.importar(archivo, ruta=str(tmp_path / "users.db"), costo=4, hilos=2)
+
+
+def test_fila_sin_password_conserva_la_guardada(tmp_path):
+    ruta = str(tmp_path / "users.db")
+    fila = {"first_name": "Ana", "last_name": "Pérez", "email": "ana@ejemplo.com", "phone": "5550000000"}
+    _importar(tmp_path, [{**fila, "password": "secreta"}], "inicial.csv")
+
+    total = _importar(tmp_path, [{**fila, "phone": "5551111111", "password": None}], "sin_password.csv")
+
+    usuario = base_datos.obtener_usuario_por_email("ana@ejemplo.com", ruta)
+    assert total == 1
+    assert usuario.phone == "5551111111"
+    assert bcrypt.checkpw(b"secreta", usuario.password.encode())
+
+
+def test_usuario_nuevo_sin_password_no_se_crea(tmp_path):
+    ruta = str(tmp_path / "users.db")
+    filas = [
+        {"first_name": "Luis", "last_name": "Gómez", "email": "luis@ejemplo.com", "phone": "5552222222",
+         "password": "  "},
+        {"first_name": "Eva", "last_name": "Ruiz", "email": "eva@ejemplo.com", "phone": "5553333333",
+         "password": "clave"},
+    ]
+
+    total = _importar(tmp_path, filas, "nuevos.csv")
+
+    assert total == 1
+    assert base_datos.obtener_usuario_por_email("luis@ejemplo.com", ruta) is None
+    assert base_datos.obtener_usuario_por_email("eva@ejemplo.com", ruta) is not None
+
+
+def test_passwords_numericos_se_importan_como_texto(tmp_path):
+    ruta = str(tmp_path / "users.db")
+    archivo = tmp_path / "numericos.csv"
+    archivo.write_text(
+        "first_name,last_name,email,phone,password,edad\n"
+        "Ana,Pérez,ana@ejemplo.com,5550000000,007,40\n"
+        "Luis,Gómez,luis@ejemplo.com,5551111111,1234,\n"
+        "Eva,Ruiz,eva@ejemplo.com,5552222222,,35\n",
+        encoding="utf-8"
+    )
+
+    total = importar_clientes.importar(str(archivo), ruta=ruta, costo=4, hilos=2)
+
+    assert total == 2
+    assert bcrypt.checkpw(b"007", base_datos.obtener_usuario_por_email("ana@ejemplo.com", ruta).password.encode())
+    assert bcrypt.checkpw(b"1234", base_datos.obtener_usuario_por_email("luis@ejemplo.com", ruta).password.encode())
+    assert base_datos.obtener_usuario_por_email("eva@ejemplo.com", ruta) is None
+    assert base_datos.obtener_usuario_por_email("luis@ejemplo.com", ruta).phone == "5551111111"
+    ana = base_datos.obtener_usuario_por_email("ana@ejemplo.com", ruta)
+    assert base_datos.obtener_cliente(ana.id, ruta).edad == 40
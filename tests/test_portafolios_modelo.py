@@ -0,0 +1,43 @@
+import pandas as pd
+
+import base_datos
+import datos_mercado
+import portafolios_modelo
+import proveedores
+
+
+# Proveedor sin datos: como cuando todas las descargas fallan
+class ProveedorVacio:
+
+    def descargar(self, simbolos, **opciones):
+        return pd.DataFrame()
+
+
+def test_recalcular_sin_precios_no_falla(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ruta = str(tmp_path / "users.db")
+    base_datos.migrar(ruta)
+    datos_mercado.limpiar_cache()
+    proveedores.configurar(ProveedorVacio())
+    try:
+        portafolios = portafolios_modelo.recalcular(["AAA", "BBB"], ruta=ruta)
+    finally:
+        proveedores.configurar(None)
+
+    assert portafolios == []
+    assert base_datos.obtener_portafolio_modelo("Moderado", 10, ruta) is None
+
+
+def test_recalcular_en_segundo_plano_conserva_el_cache_de_otros_simbolos(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ruta = str(tmp_path / "users.db")
+    base_datos.migrar(ruta)
+    datos_mercado.limpiar_cache()
+    datos_mercado._sin_datos["ZZZ"] = True
+    proveedores.configurar(ProveedorVacio())
+    try:
+        portafolios_modelo.recalcular_en_segundo_plano(["AAA", "BBB"], ruta=ruta).join()
+    finally:
+        proveedores.configurar(None)
+
+    assert "ZZZ" in datos_mercado._sin_datos
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+import almacen_precios
+import datos_mercado
+import descarga_masiva
+import precalentador
+import proveedores
+
+
+# Proveedor falso con barras por símbolo; los símbolos en `fallar` lanzan un error
+class ProveedorFalso:
+
+    def __init__(self, barras):
+        self.barras = barras
+        self.fallar = set()
+
+    def descargar(self, simbolos, start=None, end=None, **opciones):
+        if self.fallar.intersection(simbolos):
+            raise RuntimeError("proveedor no disponible")
+        frames = {s: self.barras[s].loc[self.barras[s].index >= pd.Timestamp(start)] for s in simbolos}
+        return pd.concat(frames, axis=1).swaplevel(0, 1, axis=1)
+
+
+def _barras(n, semilla):
+    cierre = 100 * np.exp(np.cumsum(np.random.default_rng(semilla).normal(0, 0.01, n)))
+    return pd.DataFrame({'Open': cierre, 'High': cierre, 'Low': cierre, 'Close': cierre, 'Adj Close': cierre,
+                         'Volume': 1000.0}, index=pd.DatetimeIndex(pd.bdate_range('2024-01-01', periods=n), name='Date'))
+
+
+def test_calentar_descarga_barras_posteriores_a_otra_corrida_del_dia(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    datos_mercado.limpiar_cache()
+    etfs = [{"symbol": "AAA", "name": "A"}, {"symbol": "BBB", "name": "B"}]
+    proveedor = ProveedorFalso({"AAA": _barras(60, 1), "BBB": _barras(60, 2)})
+    proveedores.configurar(proveedor)
+    try:
+        # Corrida anterior del mismo día: AAA completa, BBB falla y la corrida queda pendiente de reanudar
+        proveedor.fallar = {"BBB"}
+        list(descarga_masiva.descargar_catalogo(etfs))
+        proveedor.fallar = set()
+
+        # Después se publica una barra nueva de AAA
+        proveedor.barras["AAA"] = _barras(61, 1)
+        errores = precalentador.calentar(etfs, jitter=0.0, ruta_bd=str(tmp_path / "users.db"))
+    finally:
+        proveedores.configurar(None)
+
+    assert errores == 0
+    assert almacen_precios.ultimas_fechas(["AAA"])["AAA"] == proveedor.barras["AAA"].index[-1]
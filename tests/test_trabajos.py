@@ -0,0 +1,36 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import trabajos
+
+
+# Executor que retiene cada envío hasta que se libera: deja al trabajo publicado pero aún sin futuro
+class ExecutorRetenido(ThreadPoolExecutor):
+
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.liberar = threading.Event()
+
+    def submit(self, *args, **kwargs):
+        self.liberar.wait(5)
+        return super().submit(*args, **kwargs)
+
+
+def test_el_segundo_suscriptor_espera_el_resultado(monkeypatch):
+    executor = ExecutorRetenido()
+    monkeypatch.setattr(trabajos, "_executor", executor)
+    enviado = threading.Thread(target=trabajos.enviar, args=("clave", lambda trabajo: 42))
+    enviado.start()
+    while trabajos.en_curso() == 0:
+        time.sleep(0.01)
+
+    # La segunda sesión recibe el mismo trabajo antes de que exista su futuro
+    trabajo = trabajos.enviar("clave", lambda trabajo: 0)
+    assert trabajo.futuro is None
+    threading.Timer(0.1, executor.liberar.set).start()
+
+    assert trabajo.esperar(5)
+    assert trabajo.resultado == 42
+    enviado.join()
+    executor.shutdown()
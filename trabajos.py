@@ -0,0 +1,122 @@
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Trabajos que pueden ejecutarse a la vez (los cálculos con numpy liberan el GIL)
+MAX_TRABAJADORES = os.cpu_count() or 1
+
+# Estados de un trabajo
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+COMPLETO = "completo"
+ERROR = "error"
+CANCELADO = "cancelado"
+
+_executor = None
+_en_vuelo = {}
+_lock = threading.Lock()
+
+
+class TrabajoCancelado(Exception):
+    pass
+
+
+# Un cálculo en segundo plano compartido por todas las sesiones que lo pidieron.
+# La función del trabajo recibe el objeto y llama a reportar() entre etapas; si el trabajo
+# fue cancelado, reportar() lanza TrabajoCancelado y la función termina ahí.
+class Trabajo:
+
+    def __init__(self, clave):
+        self.clave = clave
+        self.estado = PENDIENTE
+        self.etapa = ""
+        self.progreso = 0.0
+        self.resultado = None
+        self.error = None
+        self.suscriptores = 1
+        self.futuro = None
+        self._cancelar = threading.Event()
+        # Existe desde que el trabajo se publica, así que esperar() funciona aunque el futuro aún no se haya creado
+        self._fin = threading.Event()
+
+    # Función para publicar el avance (fracción de 0 a 1) y revisar si hay que detenerse
+    def reportar(self, etapa, progreso):
+        if self._cancelar.is_set():
+            raise TrabajoCancelado(self.clave)
+        self.etapa = etapa
+        self.progreso = max(self.progreso, min(float(progreso), 1.0))
+
+    @property
+    def terminado(self):
+        return self.estado in (COMPLETO, ERROR, CANCELADO)
+
+    # Espera hasta que el trabajo termine o pase el tiempo indicado; devuelve si terminó
+    def esperar(self, segundos=None):
+        self._fin.wait(segundos)
+        return self.terminado
+
+
+def _obtener_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_TRABAJADORES, thread_name_prefix="trabajo")
+        return _executor
+
+
+# Ejecuta la función del trabajo y registra su resultado o error
+def _ejecutar(trabajo, funcion, args, kwargs):
+    try:
+        trabajo.reportar("Iniciando", 0.0)
+        trabajo.estado = EN_CURSO
+        trabajo.resultado = funcion(trabajo, *args, **kwargs)
+        trabajo.progreso = 1.0
+        trabajo.estado = COMPLETO
+    except TrabajoCancelado:
+        trabajo.estado = CANCELADO
+    except Exception as e:
+        trabajo.error = e
+        trabajo.estado = ERROR
+    finally:
+        with _lock:
+            if _en_vuelo.get(trabajo.clave) is trabajo:
+                del _en_vuelo[trabajo.clave]
+        trabajo._fin.set()
+
+
+# Función para enviar un trabajo identificado por clave. Si ya hay uno igual en curso (de cualquier
+# sesión) se devuelve ese mismo en lugar de calcular dos veces. funcion(trabajo, *args, **kwargs).
+def enviar(clave, funcion, *args, **kwargs):
+    executor = _obtener_executor()
+    with _lock:
+        trabajo = _en_vuelo.get(clave)
+        if trabajo is not None and not trabajo._cancelar.is_set():
+            trabajo.suscriptores += 1
+            return trabajo
+        trabajo = Trabajo(clave)
+        _en_vuelo[clave] = trabajo
+    # El trabajo hereda el contexto de quien lo envió (sesión y solicitud de las trazas)
+    trabajo.futuro = executor.submit(contextvars.copy_context().run, _ejecutar, trabajo, funcion, args, kwargs)
+    return trabajo
+
+
+# Función para que una sesión abandone un trabajo; se cancela cuando ya nadie lo espera
+def cancelar(trabajo):
+    with _lock:
+        trabajo.suscriptores = max(trabajo.suscriptores - 1, 0)
+        if trabajo.suscriptores > 0 or trabajo.terminado:
+            return False
+        trabajo._cancelar.set()
+        if _en_vuelo.get(trabajo.clave) is trabajo:
+            del _en_vuelo[trabajo.clave]
+    if trabajo.futuro is not None and trabajo.futuro.cancel():
+        trabajo.estado = CANCELADO
+        trabajo._fin.set()
+    return True
+
+
+# Función para consultar cuántos trabajos hay en curso
+def en_curso():
+    with _lock:
+        return len(_en_vuelo)
@@ -0,0 +1,324 @@
+import contextlib
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configuración por variables de entorno; sin TRAZAS=1 todo queda apagado y cada tramo cuesta una comparación.
+#   TRAZAS=1                  activa tramos, contadores y la bitácora estructurada
+#   TRAZAS_LOG=ruta           bitácora en líneas JSON (por defecto, la salida de errores)
+#   TRAZAS_METRICAS=ruta      archivo de métricas en formato de texto de Prometheus
+#   TRAZAS_PUERTO=puerto      servidor HTTP con las métricas en /metrics
+#   TRAZAS_PERFIL=directorio  permite capturar con cProfile una ejecución (?perfil=1 en la URL)
+VARIABLE_ACTIVAR = "TRAZAS"
+VARIABLE_LOG = "TRAZAS_LOG"
+VARIABLE_METRICAS = "TRAZAS_METRICAS"
+VARIABLE_PUERTO = "TRAZAS_PUERTO"
+VARIABLE_PERFIL = "TRAZAS_PERFIL"
+
+# Límites (segundos) de los intervalos del histograma de duración de los tramos
+INTERVALOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Tiempo mínimo entre dos escrituras del archivo de métricas (segundos)
+INTERVALO_METRICAS_SEGUNDOS = 10
+
+PREFIJO_METRICAS = "allianz_app"
+
+_activo = False
+_ruta_metricas = None
+_directorio_perfil = None
+_ultima_escritura = 0.0
+_servidor = None
+
+_duraciones = {}
+_contadores = Counter()
+_fuentes = {}
+_lock = threading.Lock()
+
+_bitacora = logging.getLogger("trazas")
+_id_sesion = contextvars.ContextVar("id_sesion", default=None)
+_id_solicitud = contextvars.ContextVar("id_solicitud", default=None)
+_perfilar = contextvars.ContextVar("perfilar", default=False)
+_perfiles_abiertos = {}
+
+_NULO = contextlib.nullcontext()
+
+
+# Histograma acumulado de la duración de un tramo
+class _Duracion:
+
+    def __init__(self):
+        self.cuenta = 0
+        self.suma = 0.0
+        self.maximo = 0.0
+        self.intervalos = [0] * len(INTERVALOS)
+
+    def agregar(self, segundos):
+        self.cuenta += 1
+        self.suma += segundos
+        self.maximo = max(self.maximo, segundos)
+        for i, limite in enumerate(INTERVALOS):
+            if segundos <= limite:
+                self.intervalos[i] += 1
+
+
+# Función para activar las trazas (la llama este módulo al importarse si TRAZAS=1)
+def activar(ruta_log=None, ruta_metricas=None, puerto=None, directorio_perfil=None):
+    global _activo, _ruta_metricas, _directorio_perfil
+    if not _bitacora.handlers:
+        manejador = logging.FileHandler(ruta_log, encoding='utf-8') if ruta_log else logging.StreamHandler()
+        manejador.setFormatter(logging.Formatter('%(message)s'))
+        _bitacora.addHandler(manejador)
+        _bitacora.setLevel(logging.INFO)
+        _bitacora.propagate = False
+    _ruta_metricas = ruta_metricas
+    _directorio_perfil = directorio_perfil
+    if directorio_perfil:
+        os.makedirs(directorio_perfil, exist_ok=True)
+    if puerto:
+        servir_metricas(int(puerto))
+    _activo = True
+
+
+def activo():
+    return _activo
+
+
+# Escribe un evento en la bitácora estructurada con la sesión y la solicitud vigentes
+def _registrar(evento, **campos):
+    registro = {"ts": round(time.time(), 6), "evento": evento,
+                "sesion": _id_sesion.get(), "solicitud": _id_solicitud.get(), **campos}
+    _bitacora.info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+# Tramo medido: registra su duración en el histograma y en la bitácora, con error si lo hubo
+class _Tramo:
+
+    def __init__(self, nombre, atributos):
+        self.nombre = nombre
+        self.atributos = atributos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, error, traza):
+        segundos = time.perf_counter() - self.inicio
+        with _lock:
+            _duraciones.setdefault(self.nombre, _Duracion()).agregar(segundos)
+        campos = {"tramo": self.nombre, "segundos": round(segundos, 6), **self.atributos}
+        if tipo is not None:
+            campos["error"] = tipo.__name__
+        _registrar("tramo", **campos)
+        return False
+
+
+# Función para medir un bloque: with trazas.tramo("bcrypt.verificar"): ...
+def tramo(nombre, **atributos):
+    if not _activo:
+        return _NULO
+    return _Tramo(nombre, atributos)
+
+
+# Tramos consecutivos de un cálculo por etapas: cada marcar(etapa) cierra el tramo "<prefijo>.<etapa>"
+# con el tiempo transcurrido desde la marca anterior
+class Etapas:
+
+    def __init__(self, prefijo):
+        self.prefijo = prefijo
+        self.anterior = time.perf_counter()
+
+    def marcar(self, etapa):
+        ahora = time.perf_counter()
+        nombre = f"{self.prefijo}.{etapa}"
+        segundos = ahora - self.anterior
+        with _lock:
+            _duraciones.setdefault(nombre, _Duracion()).agregar(segundos)
+        _registrar("tramo", tramo=nombre, segundos=round(segundos, 6))
+        self.anterior = ahora
+
+
+class _EtapasNulas:
+
+    def marcar(self, etapa):
+        pass
+
+
+_ETAPAS_NULAS = _EtapasNulas()
+
+
+def etapas(prefijo):
+    return Etapas(prefijo) if _activo else _ETAPAS_NULAS
+
+
+# Función para sumar a un contador (aciertos y fallos de cachés, llamadas al proveedor, ...)
+def contar(nombre, n=1):
+    if not _activo:
+        return
+    with _lock:
+        _contadores[nombre] += n
+
+
+# Función para exportar en las métricas los valores de otro módulo: funcion() -> {métrica: número}
+def registrar_fuente(nombre, funcion):
+    _fuentes[nombre] = funcion
+
+
+# Función para empezar una solicitud (una ejecución del script de Streamlit) de una sesión.
+# Cierra el perfil que haya quedado abierto en la sesión y, si se pide y está permitido, abre uno nuevo.
+def iniciar_solicitud(id_sesion, perfilar=False, **atributos):
+    if not _activo:
+        return None
+    id_solicitud = uuid.uuid4().hex[:12]
+    _id_sesion.set(id_sesion)
+    _id_solicitud.set(id_solicitud)
+    _cerrar_solicitud(id_sesion, completa=False)
+    perfilar = bool(perfilar and _directorio_perfil)
+    _perfilar.set(perfilar)
+    if perfilar:
+        perfil = cProfile.Profile()
+        _perfiles_abiertos[id_sesion] = (id_solicitud, perfil, time.perf_counter())
+        perfil.enable()
+    else:
+        _perfiles_abiertos[id_sesion] = (id_solicitud, None, time.perf_counter())
+    _registrar("inicio_solicitud", **atributos)
+    return id_solicitud
+
+
+# Cierra la solicitud abierta de una sesión y guarda su perfil. Solo las que llegaron al final del script
+# registran su duración; las interrumpidas (st.stop, st.rerun) se cierran al iniciar la siguiente.
+def _cerrar_solicitud(id_sesion, completa):
+    abierto = _perfiles_abiertos.pop(id_sesion, None)
+    if abierto is None:
+        return
+    id_solicitud, perfil, inicio = abierto
+    if perfil is not None:
+        perfil.disable()
+        ruta = os.path.join(_directorio_perfil, f"solicitud_{id_solicitud}.prof")
+        perfil.dump_stats(ruta)
+        _registrar("perfil", solicitud=id_solicitud, archivo=ruta)
+    if completa:
+        segundos = time.perf_counter() - inicio
+        with _lock:
+            _duraciones.setdefault("solicitud", _Duracion()).agregar(segundos)
+        _registrar("fin_solicitud", segundos=round(segundos, 6))
+    else:
+        _registrar("fin_solicitud", solicitud=id_solicitud, interrumpida=True)
+
+
+# Función para terminar la solicitud vigente (al final del script)
+def terminar_solicitud():
+    if not _activo:
+        return
+    _cerrar_solicitud(_id_sesion.get(), completa=True)
+    escribir_metricas()
+
+
+# Función para perfilar un bloque que corre en otro hilo (por ejemplo, un trabajo en segundo plano),
+# solo si la solicitud que lo lanzó pidió perfil
+@contextlib.contextmanager
+def perfil(nombre):
+    if not (_activo and _perfilar.get() and _directorio_perfil):
+        yield
+        return
+    perfil_bloque = cProfile.Profile()
+    perfil_bloque.enable()
+    try:
+        yield
+    finally:
+        perfil_bloque.disable()
+        ruta = os.path.join(_directorio_perfil, f"{nombre}_{_id_solicitud.get()}.prof")
+        perfil_bloque.dump_stats(ruta)
+        _registrar("perfil", archivo=ruta)
+
+
+# Función para obtener las métricas en el formato de texto de Prometheus
+def exportar_prometheus():
+    with _lock:
+        duraciones = {nombre: (d.cuenta, d.suma, d.maximo, list(d.intervalos)) for nombre, d in _duraciones.items()}
+        contadores = dict(_contadores)
+
+    lineas = [f"# TYPE {PREFIJO_METRICAS}_tramo_segundos histogram"]
+    for nombre, (cuenta, suma, maximo, intervalos) in sorted(duraciones.items()):
+        for limite, n in zip(INTERVALOS, intervalos):
+            lineas.append(f'{PREFIJO_METRICAS}_tramo_segundos_bucket{{tramo="{nombre}",le="{limite}"}} {n}')
+        lineas.append(f'{PREFIJO_METRICAS}_tramo_segundos_bucket{{tramo="{nombre}",le="+Inf"}} {cuenta}')
+        lineas.append(f'{PREFIJO_METRICAS}_tramo_segundos_sum{{tramo="{nombre}"}} {suma:.6f}')
+        lineas.append(f'{PREFIJO_METRICAS}_tramo_segundos_count{{tramo="{nombre}"}} {cuenta}')
+    lineas.append(f"# TYPE {PREFIJO_METRICAS}_tramo_segundos_maximo gauge")
+    for nombre, (_, _, maximo, _) in sorted(duraciones.items()):
+        lineas.append(f'{PREFIJO_METRICAS}_tramo_segundos_maximo{{tramo="{nombre}"}} {maximo:.6f}')
+
+    lineas.append(f"# TYPE {PREFIJO_METRICAS}_eventos_total counter")
+    for nombre, n in sorted(contadores.items()):
+        lineas.append(f'{PREFIJO_METRICAS}_eventos_total{{evento="{nombre}"}} {n}')
+
+    for fuente, funcion in sorted(_fuentes.items()):
+        lineas.append(f"# TYPE {PREFIJO_METRICAS}_{fuente} gauge")
+        for metrica, valor in sorted(funcion().items()):
+            lineas.append(f'{PREFIJO_METRICAS}_{fuente}{{metrica="{metrica}"}} {float(valor):g}')
+    return "\n".join(lineas) + "\n"
+
+
+# Función para escribir el archivo de métricas (a lo más cada INTERVALO_METRICAS_SEGUNDOS, salvo forzar=True)
+def escribir_metricas(ruta=None, forzar=False):
+    global _ultima_escritura
+    ruta = ruta or _ruta_metricas
+    if not ruta:
+        return
+    ahora = time.monotonic()
+    with _lock:
+        if not forzar and ahora - _ultima_escritura < INTERVALO_METRICAS_SEGUNDOS:
+            return
+        _ultima_escritura = ahora
+    # Escritura atómica para que el recolector nunca lea un archivo a medias
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(exportar_prometheus())
+    os.replace(temporal, ruta)
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        contenido = exportar_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+# Función para servir las métricas por HTTP en /metrics desde un hilo en segundo plano (una vez por proceso)
+def servir_metricas(puerto, host="127.0.0.1"):
+    global _servidor
+    with _lock:
+        if _servidor is not None:
+            return _servidor
+        _servidor = ThreadingHTTPServer((host, puerto), _ManejadorMetricas)
+    threading.Thread(target=_servidor.serve_forever, name="trazas-metricas", daemon=True).start()
+    return _servidor
+
+
+# Función para vaciar tramos y contadores
+def limpiar():
+    with _lock:
+        _duraciones.clear()
+        _contadores.clear()
+
+
+if os.environ.get(VARIABLE_ACTIVAR, "") not in ("", "0"):
+    activar(os.environ.get(VARIABLE_LOG), os.environ.get(VARIABLE_METRICAS), os.environ.get(VARIABLE_PUERTO),
+            os.environ.get(VARIABLE_PERFIL))
@@ -0,0 +1,119 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+import estadisticas
+
+# Niveles de confianza y horizontes (días hábiles) que se reportan por defecto
+NIVELES_CONFIANZA = [0.95, 0.99]
+HORIZONTES = [1, 10]
+
+# Métodos disponibles
+METODOS = ['historico', 'parametrico', 'monte_carlo']
+
+# Escenarios de la simulación Monte Carlo
+N_ESCENARIOS = 20_000
+
+
+# Función para obtener VaR y CVaR (pérdidas como fracción positiva) de cada columna de una matriz de escenarios
+# (escenarios x portafolios) para varios niveles a la vez. Solo se ordena la cola: una partición deja juntos los
+# peores escenarios y el cuantil (interpolación lineal, como np.quantile) y el promedio se toman de ahí.
+def var_cvar(escenarios, niveles):
+    colas = np.ascontiguousarray(np.asarray(escenarios, dtype=float).T)
+    n = colas.shape[1]
+    posiciones = (n - 1) * (1 - np.asarray(niveles, dtype=float))
+    m = min(int(np.floor(posiciones.max())) + 2, n)
+    if m < n:
+        colas = np.partition(colas, m - 1, axis=1)[:, :m]
+    colas = np.sort(colas, axis=1)
+
+    inferior = np.floor(posiciones).astype(int)
+    superior = np.minimum(inferior + 1, m - 1)
+    fraccion = posiciones - inferior
+    cuantiles = colas[:, inferior] * (1 - fraccion) + colas[:, superior] * fraccion
+    en_cola = colas[:, None, :] <= cuantiles[:, :, None]
+    promedio_cola = (colas[:, None, :] * en_cola).sum(axis=2) / np.maximum(en_cola.sum(axis=2), 1)
+    return -cuantiles.T, -promedio_cola.T
+
+
+# Rendimientos de h días (traslapados y compuestos) de cada portafolio a partir de sus rendimientos diarios
+def _rendimientos_horizonte(diarios, horizonte):
+    if horizonte == 1:
+        return diarios
+    acumulado = np.vstack([np.zeros(diarios.shape[1]), np.cumsum(np.log1p(diarios), axis=0)])
+    return np.expm1(acumulado[horizonte:] - acumulado[:-horizonte])
+
+
+# VaR/CVaR histórico: cuantil empírico de los rendimientos del portafolio (fechas x portafolios)
+def historico(diarios, niveles, horizonte):
+    escenarios = _rendimientos_horizonte(diarios, horizonte)
+    if len(escenarios) == 0:
+        vacio = np.full((len(niveles), diarios.shape[1]), np.nan)
+        return vacio, vacio.copy()
+    return var_cvar(escenarios, niveles)
+
+
+# VaR/CVaR paramétrico (normal): media y volatilidad diarias escaladas por h y √h
+def parametrico(media_diaria, volatilidad_diaria, niveles, horizonte):
+    z = np.array([NormalDist().inv_cdf(1 - nivel) for nivel in niveles])[:, None]
+    densidad = np.array([NormalDist().pdf(valor) for valor in z[:, 0]])[:, None]
+    niveles = np.asarray(niveles, dtype=float)[:, None]
+    media = media_diaria * horizonte
+    volatilidad = volatilidad_diaria * np.sqrt(horizonte)
+    var = -(media + z * volatilidad)
+    cvar = -(media - volatilidad * densidad / (1 - niveles))
+    return var, cvar
+
+
+# Crecimiento de cada activo en h días para escenarios normales multivariados compartidos por todos los portafolios
+def _escenarios_monte_carlo(media_diaria, covarianza_diaria, horizonte, n_escenarios, semilla):
+    generador = np.random.default_rng(semilla)
+    valores, vectores = np.linalg.eigh(covarianza_diaria)
+    factor = vectores * np.sqrt(np.maximum(valores, 0))
+    crecimiento = np.ones((n_escenarios, len(media_diaria)))
+    for _ in range(horizonte):
+        crecimiento *= 1 + media_diaria + generador.standard_normal((n_escenarios, len(media_diaria))) @ factor.T
+    return crecimiento
+
+
+# Función para calcular VaR y CVaR de uno o muchos portafolios a la vez con los métodos pedidos.
+# rendimientos es la matriz diaria (fechas x símbolos) y pesos (n,) o (k, n) en fracciones.
+# Regresa una tabla larga con una fila por portafolio, método, horizonte y nivel; var y cvar son pérdidas positivas.
+def calcular(rendimientos, pesos, niveles=NIVELES_CONFIANZA, horizontes=HORIZONTES, metodos=METODOS,
+             n_escenarios=N_ESCENARIOS, semilla=0, nombres=None):
+    pesos = np.atleast_2d(np.asarray(pesos, dtype=float))
+    nombres = list(nombres) if nombres is not None else list(range(len(pesos)))
+    filas = []
+
+    # Cada método entrega matrices (niveles x portafolios)
+    def agregar(metodo, horizonte, var, cvar):
+        for nivel, var_nivel, cvar_nivel in zip(niveles, var, cvar):
+            for nombre, v, c in zip(nombres, var_nivel, cvar_nivel):
+                filas.append({"portafolio": nombre, "metodo": metodo, "horizonte": horizonte,
+                              "nivel": nivel, "var": float(v), "cvar": float(c)})
+
+    if 'historico' in metodos:
+        diarios = np.nan_to_num(rendimientos.to_numpy(dtype=float)) @ pesos.T
+        for horizonte in horizontes:
+            agregar('historico', horizonte, *historico(diarios, niveles, horizonte))
+
+    if 'parametrico' in metodos or 'monte_carlo' in metodos:
+        estadisticas_total = estadisticas.estadisticas_portafolio(rendimientos, pesos)
+        media_diaria = estadisticas.estadisticas_activos(rendimientos)["avg_annual_return"].to_numpy() \
+            / estadisticas.DIAS_HABILES
+        covarianza_diaria = estadisticas_total["covarianza"].to_numpy() / estadisticas.DIAS_HABILES
+
+    if 'parametrico' in metodos:
+        media_portafolio = estadisticas_total["rendimiento"] / estadisticas.DIAS_HABILES
+        volatilidad_portafolio = estadisticas_total["volatilidad"] / np.sqrt(estadisticas.DIAS_HABILES)
+        for horizonte in horizontes:
+            agregar('parametrico', horizonte, *parametrico(media_portafolio, volatilidad_portafolio, niveles, horizonte))
+
+    if 'monte_carlo' in metodos:
+        for horizonte in horizontes:
+            escenarios = _escenarios_monte_carlo(media_diaria, covarianza_diaria, horizonte, n_escenarios, semilla) \
+                @ pesos.T - 1
+            agregar('monte_carlo', horizonte, *var_cvar(escenarios, niveles))
+
+    return pd.DataFrame(filas, columns=["portafolio", "metodo", "horizonte", "nivel", "var", "cvar"])